@@ -2,18 +2,31 @@
 # Copyright 2026 Sathya Narayanan Annamalai Geetha
 # Licensed under the MIT License.
 
+import asyncio
+import json
 import os
 import vertexai
-import requests
-import google.auth.transport.requests  # <--- NEW
-from google.oauth2 import id_token     # <--- NEW
 from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.genai import types
 from google.adk.tools.api_registry import ApiRegistry
 from vertexai.preview.reasoning_engines import AdkApp
 
 # 0. Set environment variables
 from dotenv import load_dotenv
 
+try:
+    from .tool_client import AsyncToolHttpClient, ToolHttpClient, idempotency_key, token_cache
+    from .rules import PATH_FAST, FastPathResolver, build_tool_params, extract_features, format_summary, parse_event
+    from .decision_cache import ResolutionCache, fingerprint
+    from .prompts import variants as instruction_variants
+except ImportError:  # Loaded as a top-level module (e.g. ModuleAgent deployment)
+    from tool_client import AsyncToolHttpClient, ToolHttpClient, idempotency_key, token_cache
+    from rules import PATH_FAST, FastPathResolver, build_tool_params, extract_features, format_summary, parse_event
+    from decision_cache import ResolutionCache, fingerprint
+    from prompts import variants as instruction_variants
+
 load_dotenv()
 
 PROJECT_ID = os.environ.get("PROJECT_ID")
@@ -21,6 +34,24 @@ LOCATION = os.environ.get("LOCATION")
 BASE_URL = os.environ.get("BASE_URL")
 AGENT_MODEL = os.environ.get("AGENT_MODEL", "gemini-2.5-pro")
 AGENT_NAME = os.environ.get("AGENT_NAME", "supply_chain_control_tower_agent")
+TOOL_HTTP_POOL_SIZE = int(os.environ.get("TOOL_HTTP_POOL_SIZE", 10))
+TOOL_HTTP_MAX_RETRIES = int(os.environ.get("TOOL_HTTP_MAX_RETRIES", 2))
+TOOL_HTTP2 = os.environ.get("TOOL_HTTP2", "false").lower() == "true"
+# "async" registers the non-blocking tool variants so ADK can run independent calls concurrently
+AGENT_TOOL_MODE = os.environ.get("AGENT_TOOL_MODE", "async")
+# Deterministic fast path for routine exceptions (see rules.py)
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_MIN_CONFIDENCE = float(os.environ.get("FAST_PATH_MIN_CONFIDENCE", 0.9))
+# Reuse of LLM decisions for events with the same fingerprint (see decision_cache.py)
+DECISION_CACHE_ENABLED = os.environ.get("DECISION_CACHE_ENABLED", "true").lower() == "true"
+DECISION_CACHE_TTL_SECONDS = int(os.environ.get("DECISION_CACHE_TTL_SECONDS", 3600))
+DECISION_CACHE_MAX_ENTRIES = int(os.environ.get("DECISION_CACHE_MAX_ENTRIES", 2048))
+DECISION_CACHE_MIN_CONFIDENCE = float(os.environ.get("DECISION_CACHE_MIN_CONFIDENCE", 0.9))
+KB_VERSION_POLL_SECONDS = float(os.environ.get("KB_VERSION_POLL_SECONDS", 60))
+# Token budget the tool service compacts search / history results to (0 = full results)
+TOOL_RESULT_MAX_TOKENS = int(os.environ.get("TOOL_RESULT_MAX_TOKENS", 600))
+# "per_vertical" sends only the classified vertical's playbook; "full" sends all five
+PROMPT_MODE = os.environ.get("PROMPT_MODE", "per_vertical")
 
 # ---------------------------------------------------------
 # NEW HELPER FUNCTION TO GENERATE IDENTITY TOKENS
@@ -29,16 +60,39 @@ def get_auth_headers(audience: str) -> dict:  # <--- NEW
     """
     Generates an OIDC Identity Token for secure Cloud Run invocation.
     Required for Service-to-Service authentication in Google Cloud.
+    Tokens are cached per audience and refreshed ahead of expiry
+    (see tool_client.IdTokenCache; fetch metrics via token_cache.stats()).
     """
     try:
-        auth_req = google.auth.transport.requests.Request()  # <--- NEW
-        token = id_token.fetch_id_token(auth_req, audience)  # <--- NEW
-        return {"Authorization": f"Bearer {token}"}          # <--- NEW
+        token = token_cache.get(audience)
+        return {"Authorization": f"Bearer {token}"}
     except Exception as e:
         print(f"Warning: Could not fetch token: {e}")
         return {}
 # ---------------------------------------------------------
 
+# Shared keep-alive client for all tools (auth headers are added per call)
+tool_http = ToolHttpClient(
+    BASE_URL,
+    headers_provider=get_auth_headers,
+    max_retries=TOOL_HTTP_MAX_RETRIES,
+    pool_size=TOOL_HTTP_POOL_SIZE,
+    http2=TOOL_HTTP2,
+)
+async_tool_http = AsyncToolHttpClient(
+    BASE_URL,
+    headers_provider=get_auth_headers,
+    max_retries=TOOL_HTTP_MAX_RETRIES,
+    pool_size=TOOL_HTTP_POOL_SIZE,
+    http2=TOOL_HTTP2,
+)
+
+def budgeted(payload: dict) -> dict:
+    """Adds the result budget to a retrieval tool payload (tool results are re-sent every turn)."""
+    if TOOL_RESULT_MAX_TOKENS > 0:
+        return dict(payload, max_tokens=TOOL_RESULT_MAX_TOKENS)
+    return payload
+
 def session_service_builder():
     """Create a Vertex AI session service for cloud deployment."""
     from google.adk.sessions import VertexAiSessionService
@@ -58,10 +112,7 @@ def search_knowledge_base(query: str):
     Returns:
         dict: {"status": "success", "results": [{"title":..., "content":...}]}
     """
-    headers = get_auth_headers(BASE_URL)
-    response = requests.post(f"{BASE_URL}/search", json={"query": query}, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    return tool_http.post("/search", budgeted({"query": query}), tool="search_knowledge_base", idempotent=True)
 
 # --- TOOL 2: Historical Event Analysis ---
 def get_similar_events(event_type: str, limit: int = 5):
@@ -78,14 +129,12 @@ def get_similar_events(event_type: str, limit: int = 5):
     Returns:
         dict: {"status": "success", "results": [{"action":..., "outcome":...}]}
     """
-    headers = get_auth_headers(BASE_URL)
-    response = requests.post(
-        f"{BASE_URL}/get_similar_events", 
-        json={"event_type": event_type, "limit": limit}, 
-        headers=headers
+    return tool_http.post(
+        "/get_similar_events",
+        budgeted({"event_type": event_type, "limit": limit}),
+        tool="get_similar_events",
+        idempotent=True
     )
-    response.raise_for_status()
-    return response.json()
 
 # --- TOOL 3: Update ETA ---
 def update_shipment_eta(
@@ -110,8 +159,7 @@ def update_shipment_eta(
     Returns:
         dict: Confirmation of the update.
     """
-   
-    headers = get_auth_headers(BASE_URL)
+ 
     payload = {
         "shipment_id": shipment_id, 
         "new_eta": new_eta, 
@@ -119,9 +167,9 @@ def update_shipment_eta(
         "reasoning": reasoning, 
         "metadata": metadata or {}
     }
-    response = requests.post(f"{BASE_URL}/update_eta", json=payload, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    # Setting an ETA to a fixed value is safe to repeat; the key also keeps retries from logging twice
+    return tool_http.post("/update_eta", payload, tool="update_shipment_eta",
+                          idempotency_key=idempotency_key("update_shipment_eta", payload))
 
 # --- TOOL 4: Request Reshipment ---
 def request_reshipment(
@@ -144,17 +192,15 @@ def request_reshipment(
         dict: Details of the created reshipment request.
     """
     
-    headers = get_auth_headers(BASE_URL)  # <--- NEW
-    url = f"{BASE_URL}/request_reshipment"
     payload = {
         "original_shipment_id": original_shipment_id,
         "priority": priority,
         "reasoning": reasoning,
         "metadata": metadata or {}
     }
-    response = requests.post(f"{BASE_URL}/request_reshipment", json=payload, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    # Keyed, so retries after a timeout return the first order instead of creating another
+    return tool_http.post("/request_reshipment", payload, tool="request_reshipment",
+                          idempotency_key=idempotency_key("request_reshipment", payload))
 
 # --- TOOL 5: Escalate to Human ---
 def escalate_to_human(
@@ -178,16 +224,14 @@ def escalate_to_human(
         dict: Ticket ID and status of the escalation.
     """
     
-    headers = get_auth_headers(BASE_URL)  # <--- NEW
     payload = {
         "shipment_id": shipment_id, 
         "reason": reason, 
         "reasoning": reasoning, 
         "metadata": metadata or {}
     }
-    response = requests.post(f"{BASE_URL}/escalate_to_human", json=payload, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    return tool_http.post("/escalate_to_human", payload, tool="escalate_to_human",
+                          idempotency_key=idempotency_key("escalate_to_human", payload))
 
 # --- TOOL 6: Get Dashboard Stats ---
 def get_dashboard_stats(days: int = 7):
@@ -203,10 +247,297 @@ def get_dashboard_stats(days: int = 7):
         dict: Aggregated stats (e.g., on-time performance, total shipments).
     """
     
-    headers = get_auth_headers(BASE_URL)  # <--- NEW
-    response = requests.get(f"{BASE_URL}/dashboard/stats", params={"days": days}, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    return tool_http.get("/dashboard/stats", params={"days": days}, tool="get_dashboard_stats")
+
+# --- ASYNC TOOL VARIANTS ---
+# Same names, arguments and docstrings as the tools above (ADK derives the tool
+# declaration from them), but non-blocking, so when the model requests several
+# tools in one turn ADK can run them concurrently.
+def async_variant_of(sync_tool):
+    def decorator(async_tool):
+        async_tool.__name__ = sync_tool.__name__
+        async_tool.__qualname__ = sync_tool.__qualname__
+        async_tool.__doc__ = sync_tool.__doc__
+        return async_tool
+    return decorator
+
+@async_variant_of(search_knowledge_base)
+async def search_knowledge_base_async(query: str):
+    return await async_tool_http.post("/search", budgeted({"query": query}), tool="search_knowledge_base", idempotent=True)
+
+@async_variant_of(get_similar_events)
+async def get_similar_events_async(event_type: str, limit: int = 5):
+    return await async_tool_http.post(
+        "/get_similar_events",
+        budgeted({"event_type": event_type, "limit": limit}),
+        tool="get_similar_events",
+        idempotent=True
+    )
+
+@async_variant_of(update_shipment_eta)
+async def update_shipment_eta_async(
+    shipment_id: str, 
+    new_eta: str, 
+    reason: str, 
+    reasoning: str = "",
+    metadata: dict = None
+):
+    payload = {
+        "shipment_id": shipment_id, 
+        "new_eta": new_eta, 
+        "reason": reason, 
+        "reasoning": reasoning, 
+        "metadata": metadata or {}
+    }
+    return await async_tool_http.post("/update_eta", payload, tool="update_shipment_eta",
+                                      idempotency_key=idempotency_key("update_shipment_eta", payload))
+
+@async_variant_of(request_reshipment)
+async def request_reshipment_async(
+    original_shipment_id: str, 
+    priority: str, 
+    reasoning: str = "",
+    metadata: dict = None
+):
+    payload = {
+        "original_shipment_id": original_shipment_id,
+        "priority": priority,
+        "reasoning": reasoning,
+        "metadata": metadata or {}
+    }
+    return await async_tool_http.post("/request_reshipment", payload, tool="request_reshipment",
+                                      idempotency_key=idempotency_key("request_reshipment", payload))
+
+@async_variant_of(escalate_to_human)
+async def escalate_to_human_async(
+    shipment_id: str, 
+    reason: str, 
+    reasoning: str = "",
+    metadata: dict = None
+):
+    payload = {
+        "shipment_id": shipment_id, 
+        "reason": reason, 
+        "reasoning": reasoning, 
+        "metadata": metadata or {}
+    }
+    return await async_tool_http.post("/escalate_to_human", payload, tool="escalate_to_human",
+                                      idempotency_key=idempotency_key("escalate_to_human", payload))
+
+@async_variant_of(get_dashboard_stats)
+async def get_dashboard_stats_async(days: int = 7):
+    return await async_tool_http.get("/dashboard/stats", params={"days": days}, tool="get_dashboard_stats")
+
+SYNC_TOOLS = [
+    search_knowledge_base,
+    get_similar_events,
+    update_shipment_eta,
+    request_reshipment,
+    escalate_to_human,
+    get_dashboard_stats
+]
+ASYNC_TOOLS = [
+    search_knowledge_base_async,
+    get_similar_events_async,
+    update_shipment_eta_async,
+    request_reshipment_async,
+    escalate_to_human_async,
+    get_dashboard_stats_async
+]
+
+# --- FAST PATH (ROUTINE EXCEPTIONS) ---
+fast_path = FastPathResolver(min_confidence=FAST_PATH_MIN_CONFIDENCE)
+
+# Async variants: the callbacks run on ADK's event loop, which must not block on HTTP
+FAST_PATH_ACTIONS = {
+    "update_eta": update_shipment_eta_async,
+    "request_reshipment": request_reshipment_async,
+    "escalate_to_human": escalate_to_human_async,
+}
+
+def _user_message(callback_context: CallbackContext) -> str:
+    user_content = callback_context.user_content
+    return "".join(part.text or "" for part in (user_content.parts or [])) if user_content else ""
+
+async def fast_path_callback(callback_context: CallbackContext):
+    """
+    Runs before the LLM. Routine, high-confidence exceptions are resolved
+    directly through the tool endpoints and the agent run ends here; anything
+    ambiguous returns None so the full reasoning loop runs. The path taken is
+    recorded in session state (`resolution_path`) and in the tool metadata.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+
+    decision = fast_path.decide(_user_message(callback_context))
+    callback_context.state["resolution_path"] = decision.path
+    callback_context.state["resolution_path_reason"] = decision.reason
+    if decision.path != PATH_FAST:
+        return None
+
+    try:
+        result = await FAST_PATH_ACTIONS[decision.action](**decision.params)
+    except Exception as e:
+        print(f"Warning: Fast path {decision.rule_id} failed, handing to LLM: {e}")
+        fast_path.record_fallback(decision)
+        callback_context.state["resolution_path"] = "llm"
+        return None
+
+    callback_context.state["fast_path_rule"] = decision.rule_id
+    return types.Content(role="model", parts=[types.Part(text=format_summary(decision, result))])
+
+# --- RESOLUTION CACHE (NEAR-IDENTICAL EXCEPTIONS) ---
+PATH_CACHE = "cache"
+
+# Tool function name -> action name used by the tool service and the rules
+ACTION_TOOLS = {
+    "update_shipment_eta": "update_eta",
+    "request_reshipment": "request_reshipment",
+    "escalate_to_human": "escalate_to_human",
+}
+
+def fetch_kb_version():
+    return tool_http.get("/kb/version", tool="default").get("version")
+
+resolution_cache = ResolutionCache(
+    ttl_seconds=DECISION_CACHE_TTL_SECONDS,
+    max_entries=DECISION_CACHE_MAX_ENTRIES,
+    kb_version_provider=fetch_kb_version,
+    kb_poll_interval=KB_VERSION_POLL_SECONDS,
+)
+
+def format_cached_summary(entry: dict, result: dict) -> str:
+    action_label = {
+        "update_eta": "update the ETA",
+        "request_reshipment": "request a reshipment",
+        "escalate_to_human": "escalate to a human operator",
+    }.get(entry["action"], entry["action"])
+    sops = "\n\n".join(f"> 📚 **{sop.get('title') or sop.get('id')}**" for sop in entry["cited_sops"])
+    precedents = "\n\n".join(f"> ⛁ **{event_id}**" for event_id in entry["precedent_ids"])
+    return (
+        f"♻️ **Cached Resolution** (confidence {entry['confidence']:.2f}): this exception matches "
+        f"**{entry['source_event_id']}**, resolved earlier under the same policies.\n\n"
+        f"> **Knowledge Base Results**:\n\n{sops or '> (none)'}\n\n"
+        f"> **Historical Precedents**:\n\n{precedents or '> (none)'}\n\n"
+        f"> **Tool Result**: `{json.dumps(result)}`\n\n"
+        f"**Reasoning Summary**: I chose to {action_label} because the same decision was made for "
+        f"{entry['source_event_id']} on the same SOPs and precedents."
+    )
+
+async def resolution_cache_callback(callback_context: CallbackContext):
+    """
+    Runs before the LLM when the fast path did not resolve the event. If an
+    event with the same fingerprint was recently resolved by the LLM, the
+    cached action is re-applied to this event and the search, history and
+    reasoning round-trips are skipped. Otherwise the fingerprint is kept in
+    temp state so after_agent_callback can store the LLM's decision.
+    """
+    if not DECISION_CACHE_ENABLED:
+        return None
+
+    event = parse_event(_user_message(callback_context))
+    if event is None:
+        return None
+    key = fingerprint(event, extract_features(event))
+    callback_context.state["temp:fingerprint"] = key
+    callback_context.state["temp:event"] = event
+
+    # get() may poll the tool service for the knowledge-base version; keep that off the loop too
+    entry = await asyncio.to_thread(resolution_cache.get, key)
+    if entry is None:
+        return None
+
+    customer = event.get("customer") or {}
+    sop_labels = [sop.get("title") or sop.get("id") for sop in entry["cited_sops"]]
+    params = build_tool_params(
+        entry["action"],
+        event,
+        reasoning=(
+            f"[Cached resolution from {entry['source_event_id']}] Same fingerprint ({key}); "
+            f"SOPs: {', '.join(sop_labels) or 'none'}; precedents: {', '.join(entry['precedent_ids']) or 'none'}."
+        ),
+        metadata={
+            "event_id": event.get("id"),
+            "customer_tier": customer.get("tier"),
+            "confidence": entry["confidence"],
+            "resolution_path": PATH_CACHE,
+            "cached_from_event": entry["source_event_id"],
+        },
+        priority=entry["params"].get("priority"),
+        reason=entry["params"].get("reason"),
+    )
+    if params is None:
+        return None
+
+    try:
+        result = await FAST_PATH_ACTIONS[entry["action"]](**params)
+    except Exception as e:
+        print(f"Warning: Cached resolution for {key} failed, handing to LLM: {e}")
+        return None
+
+    callback_context.state["resolution_path"] = PATH_CACHE
+    callback_context.state["resolution_path_reason"] = f"cached decision from {entry['source_event_id']}"
+    return types.Content(role="model", parts=[types.Part(text=format_cached_summary(entry, result))])
+
+async def before_agent_callback(callback_context: CallbackContext):
+    """Fast path first, then the resolution cache; None runs the full LLM loop."""
+    event = parse_event(_user_message(callback_context))
+    # Selects the instruction variant (see instruction_provider)
+    callback_context.state["temp:vertical"] = extract_features(event)["vertical"] if event else None
+    return await fast_path_callback(callback_context) or await resolution_cache_callback(callback_context)
+
+def trace_tool_callback(tool, args, tool_context, tool_response):
+    """Records the SOPs, precedents and actions of an LLM run for the resolution cache."""
+    if not DECISION_CACHE_ENABLED:
+        return None
+    trace = dict(tool_context.state.get("temp:decision_trace") or {})
+    results = tool_response.get("results", []) if isinstance(tool_response, dict) else []
+    if tool.name == "search_knowledge_base":
+        trace["cited_sops"] = trace.get("cited_sops", []) + [
+            {"id": doc.get("id"), "title": doc.get("title")} for doc in results if isinstance(doc, dict)
+        ]
+    elif tool.name == "get_similar_events":
+        trace["precedent_ids"] = trace.get("precedent_ids", []) + [
+            str(p.get("event id") or p.get("event_id")) for p in results
+            if isinstance(p, dict) and (p.get("event id") or p.get("event_id"))
+        ]
+    elif tool.name in ACTION_TOOLS:
+        trace["actions"] = trace.get("actions", []) + [
+            {"action": ACTION_TOOLS[tool.name], "args": {k: v for k, v in args.items() if k != "metadata"},
+             "confidence": (args.get("metadata") or {}).get("confidence")}
+        ]
+    tool_context.state["temp:decision_trace"] = trace
+    return None
+
+def store_decision_callback(callback_context: CallbackContext):
+    """After an LLM run: caches the decision if exactly one confident action was taken."""
+    if not DECISION_CACHE_ENABLED or callback_context.state.get("resolution_path") in (PATH_FAST, PATH_CACHE):
+        return None
+    key = callback_context.state.get("temp:fingerprint")
+    trace = callback_context.state.get("temp:decision_trace") or {}
+    actions = trace.get("actions", [])
+    if not key or len(actions) != 1:
+        return None
+    try:
+        confidence = float(actions[0]["confidence"])
+    except (TypeError, ValueError):
+        return None
+    if confidence < DECISION_CACHE_MIN_CONFIDENCE:
+        return None
+
+    event = callback_context.state.get("temp:event") or {}
+    args = actions[0]["args"]
+    resolution_cache.put(
+        key,
+        action=actions[0]["action"],
+        params={"priority": args.get("priority"), "reason": args.get("reason")},
+        cited_sops=trace.get("cited_sops", []),
+        precedent_ids=list(dict.fromkeys(trace.get("precedent_ids", []))),
+        confidence=confidence,
+        source_event_id=event.get("id"),
+    )
+    return None
+
 
 # 3. Create the Agent
 # The model can be defined as a string (e.g., "gemini-2.5-pro")
@@ -214,110 +545,14 @@ def get_dashboard_stats(days: int = 7):
 # ... (Previous imports and tool definitions remain the same) ...
 
 # --- INSTRUCTION DEFINITION ---
-# We define this separately to keep the main Agent code clean and readable.
-SYSTEM_INSTRUCTION = f"""
-You are the **Autonomous Logistics Resolution Engine** (Level 2).
-Your Project ID is: {PROJECT_ID}
-
-### 🧠 YOUR PERSONA
-*   **Role**: You are a Transparent Supply Chain Auditor. You value "Showing Your Work" above all else.
-*   **Tone**: Analytical, precise, and data-heavy.
-*   **Goal**: Solve the problem, but ALWAYS prove your solution with raw data evidence first.
-
-### 🔄 UNIVERSAL EXECUTION LOOP (MANDATORY)
-For EVERY event (Retail, Pharma, Auto, etc.), "Action -> Evidence -> Analysis" pattern and you MUST follow this 5-step strict workflow:
-
-**STEP 1: INTENT & ANALYSIS**
-*   Start by stating clearly: "I am analyzing the [Event Type] for [Customer] ([Tier])..."
-
-**STEP 2: INTELLIGENCE RETRIEVAL (Search)**
-*   **Action**: Call `search_knowledge_base` with a targeted query that **MUST include the Customer Name** (e.g., "[Customer Name] [Event Type] SOP").
-*   * **Output Requirement**: Iterate through **ALL** results returned by the tool. Create a bullet point for every single document found.
-*   * **Formatting**: Insert a BLANK LINE between each bullet point.
-        * *Required Output Format*: 
-            "🕵️ **Intelligence Retrieval**: I am scanning our knowledge base to check for policies that govern this specific exception...
-            > **Knowledge Base Results**:
-
-            > 📚 **[title]**: [Exact Quote or Key Rule found in text]
-
-            > 📚 **[title]**: [Exact Quote or Key Rule found in text]
-
-**STEP 3: PATTERN RECOGNITION (History)**
-*   **Action**: Call `get_similar_events` to find precedents.
-*   * **Output Requirement**: Iterate through **ALL** events returned by the tool. Do not summarize or group them.
-*   * **Formatting**: Insert a BLANK LINE between each bullet point.
-    *   *Output Format*: 
-            "🧠 **Pattern Recognition**: Analyzing past similar cases now find a best path...
-            > **Historical Precedents**:
-            
-            > ⛁ **[Event ID]**: Action: [Action Taken] -> Outcome: [Outcome]
-
-            > ⛁ **[Event ID]**: Action: [Action Taken] -> Outcome: [Outcome]
-
-            > ⛁ **[Event ID]**: Action: [Action Taken] -> Outcome: [Outcome]"
-
-**STEP 4: SYNTHESIS & DECISION**
-*   Synthesize the SOP rules and Historical precedents.
-*   *Output*: "Based on the strict requirements of **[SOP-ID]** and the precedent set by **[Event-ID]**, I have determined the optimal course of action."
-
-**STEP 5: EXECUTION & SUMMARY**
-*   **Action**: Call the appropriate tool (`update_shipment_eta`, `request_reshipment`, or `escalate_to_human`).
-*   **FINAL OUTPUT**: You MUST end with a structured summary block:
-    *   "**Reasoning Summary**: I chose to [Action] because [Reason 1], [Reason 2]."
-
-### 📋 SCENARIO GUIDANCE (Context Graph) - 5 VERTICALS
-You MUST classify the event into one of these 5 verticals and apply the specific logic:
-
-**1. RETAIL & GROCERY (High Volume / Perishable)**
-*   **Keywords**: FreshMarket, Global Mart, Food, Perishables.
-*   **Unique Risk**: Spoilage, Shelf Life.
-*   **Logic**:
-    *   **Non-Perishable**: Update ETA.
-    *   **Perishable (Food)**: If Temp Excursion or Delay > Shelf Life -> **Reship Immediately** (Spoiled). Do NOT just update ETA.
-    *   **Search Context**: Query MUST include "Retail" or "Food Safety".
-
-**2. HIGH TECH & ELECTRONICS (High Value)**
-*   **Keywords**: TechGiant, NVIDIA, Apple, GPU, Server.
-*   **Unique Risk**: Theft, Security, Obsolescence.
-*   **Logic**:
-    *   **High Value (> $50k)**: Any delay/route deviation requires **Escalate to Security**.
-    *   **Standard**: Update ETA if secure.
-    *   **Search Context**: Query MUST include "High Tech" or "Security".
-
-**3. PHARMA & HEALTHCARE (GxP / Critical)**
-*   **Keywords**: HealthPlus, MediLife, Vaccine, Insulin.
-*   **Unique Risk**: Patient Safety, GDP (Good Distribution Practice), Adulteration.
-*   **Logic**:
-    *   **Temperature Excursion**: Strict > 2°C deviation often means **Total Loss**. Reship Immediately.
-    *   **Documentation**: Must cite specific "GDP" or "Cold Chain" SOPs.
-    *   **Search Context**: Query MUST include "Pharma" or "GDP".
-
-**4. AUTOMOTIVE & MANUFACTURING (JIT)**
-*   **Keywords**: Detroit Motors, Tesla, Ford, Brake, Engine.
-*   **Unique Risk**: "Line Down" (Factory Stoppage).
-*   **Logic**:
-    *   **Critical Shortage**: If factory buffer < 4h -> **Escalate to Human** (Need Air Charter/NFO).
-    *   **Standard**: Update ETA.
-    *   **Search Context**: Query MUST include "Automotive" or "JIT".
-
-**5. GENERAL LOGISTICS (Default)**
-*   **Keywords**: Office Supplies, Furniture, Clothing.
-*   **Logic**: Standard SLA. Cost Benefit Analysis (Reship vs Refund).
-
-### 🚨 CRITICAL RULES
-1.  **MANDATORY SEARCH FORMAT**: Your `search_knowledge_base` query **MUST** look like this:
-    *   `"[Customer Name] [Vertical] [Event Type] SOP"`
-    *   *Example*: "FreshMarket Retail Inventory Shortage SOP"
-    *   *Example*: "HealthPlus Pharma Cold Chain SOP"
-2.  **CONFIDENCE & CITATION**: You must explicitly cite the Document Title/ID found.
-3.  **DOUBLE SPACING**: Always insert a blank line between bullet points.
-4.  **COMPLETENESS**: If the tool returns 5 events, you must list all 5. Do not truncate.
-5.  **AUTO-LOGGING**: pass `metadata={{'event_id': '...', 'customer_tier': '...', 'confidence': 0.xx}}` in all tool calls.
-    *   **Confidence Calculation**: 
-        *   1.0 = Perfect SOP match + Historic Precedent.
-        *   0.8 = SOP match but no History.
-        *   0.5 = Heuristic guess (No clean match).
-"""
+# Assembled in prompts.py: the core protocol (a shared prefix, so prompt caching
+# keeps hitting) plus the scenario guidance for the event's vertical only.
+INSTRUCTION_VARIANTS = instruction_variants(PROJECT_ID)
+SYSTEM_INSTRUCTION = INSTRUCTION_VARIANTS["FULL"]
+
+def instruction_provider(context: ReadonlyContext) -> str:
+    """Per-vertical system instruction; unclassified events get all five verticals."""
+    return INSTRUCTION_VARIANTS.get(context.state.get("temp:vertical"), SYSTEM_INSTRUCTION)
 
 # --- AGENT INITIALIZATION ---
 # 1. Create the Agent instance first
@@ -325,15 +560,11 @@ You MUST classify the event into one of these 5 verticals and apply the specific
 my_agent = LlmAgent(
     model=AGENT_MODEL,
     name=AGENT_NAME,
-    instruction=SYSTEM_INSTRUCTION, 
-    tools=[
-        search_knowledge_base,
-        get_similar_events,
-        update_shipment_eta,
-        request_reshipment,
-        escalate_to_human,
-        get_dashboard_stats
-    ],
+    instruction=instruction_provider if PROMPT_MODE == "per_vertical" else SYSTEM_INSTRUCTION,
+    tools=ASYNC_TOOLS if AGENT_TOOL_MODE == "async" else SYNC_TOOLS,
+    before_agent_callback=before_agent_callback,
+    after_tool_callback=trace_tool_callback,
+    after_agent_callback=store_decision_callback,
 )
 
 # 2. Expose the root_agent for ADK Web (REQUIRED)
@@ -0,0 +1,155 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+"""
+Resolution cache for near-identical exceptions.
+
+Events are reduced to a fingerprint (customer, tier, value band and every
+feature the playbook rules decide on: vertical, event type, severity and the
+perishable / temperature / line-down / security flags). When the LLM resolves
+an event, the chosen action, the SOPs it cited and the precedents it used are
+stored under that fingerprint; the next event with the same fingerprint
+reuses the decision and skips the search, history and reasoning round-trips.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Upper bounds of the shipment value bands (the $50k edge matches the high-tech rule)
+VALUE_BANDS = [1000, 10000, 50000, 250000]
+
+
+def value_band(value: float) -> str:
+    lower = 0
+    for upper in VALUE_BANDS:
+        if value <= upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f">{lower}"
+
+
+def fingerprint(event: dict, features: dict) -> str:
+    """
+    Normalized key for an event; `features` comes from rules.extract_features.
+    Every boolean feature is part of the key, so two events only share a
+    fingerprint if the playbook would treat them the same way.
+    """
+    customer = event.get("customer") or {}
+    flags = sorted(name for name, value in features.items() if value is True)
+    return "|".join([
+        str(customer.get("name") or "").strip().lower(),
+        features.get("vertical") or "UNKNOWN",
+        features.get("event_type") or "",
+        features.get("severity") or "",
+        str(customer.get("tier") or "").strip().lower(),
+        value_band(features.get("value") or 0.0),
+        ",".join(flags),
+    ])
+
+
+class ResolutionCache:
+    """
+    Thread-safe TTL + LRU cache of agent decisions keyed by event fingerprint.
+
+    Decisions are only valid for the knowledge base they were made against.
+    `kb_version_provider` (a callable returning the tool service's current
+    knowledge-base version) is polled at most every `kb_poll_interval`
+    seconds from `get()`; when it reports a version this cache has never seen
+    (i.e. the knowledge base was re-imported), every entry is dropped.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_entries=2048, kb_version_provider=None, kb_poll_interval=60.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.kb_version_provider = kb_version_provider
+        self.kb_poll_interval = kb_poll_interval
+        self._entries = OrderedDict()
+        self._seen_kb_versions = set()
+        self._kb_version = None
+        self._last_kb_poll = None
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._invalidations = 0
+
+    def get(self, key: str):
+        self._poll_kb_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: str, action: str, params: dict, cited_sops: list, precedent_ids: list,
+            confidence: float, source_event_id: str = None):
+        with self._lock:
+            self._entries[key] = {
+                "action": action,
+                "params": params,
+                "cited_sops": cited_sops,
+                "precedent_ids": precedent_ids,
+                "confidence": confidence,
+                "source_event_id": source_event_id,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            self._entries.move_to_end(key)
+            self._stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def note_kb_version(self, version: str):
+        """Drops every entry the first time a new knowledge-base version is seen."""
+        if not version:
+            return
+        with self._lock:
+            if version in self._seen_kb_versions:
+                return
+            first_version = not self._seen_kb_versions
+            self._seen_kb_versions.add(version)
+            self._kb_version = version
+            if not first_version:
+                self._entries.clear()
+                self._invalidations += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "invalidations": self._invalidations,
+                "kb_version": self._kb_version,
+            }
+
+    def _poll_kb_version(self):
+        if self.kb_version_provider is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._last_kb_poll is not None and now - self._last_kb_poll < self.kb_poll_interval:
+                return
+            # Claimed before the call so concurrent lookups don't poll too
+            self._last_kb_poll = now
+        try:
+            version = self.kb_version_provider()
+        except Exception as e:
+            print(f"Warning: Could not fetch knowledge base version: {e}")
+            return
+        self.note_kb_version(version)
@@ -0,0 +1,388 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+"""
+Deterministic fast path for routine supply chain exceptions.
+
+The five-vertical playbook from the agent's SYSTEM_INSTRUCTION is encoded
+below as data (VERTICALS and RULES). FastPathResolver classifies an incoming
+event and, when exactly one vertical matches and a rule fires with enough
+confidence, returns a decision the agent can execute directly through the
+tool endpoints. Everything else is handed to the LLM.
+"""
+
+import json
+import re
+import threading
+from dataclasses import dataclass, field
+
+# --- VERTICALS (keywords are matched against customer, items and description) ---
+VERTICALS = [
+    {
+        "name": "RETAIL",
+        "label": "Retail & Grocery",
+        "keywords": ["freshmarket", "global mart", "global retail", "grocery", "food", "perishable", "retail"],
+        "search_context": "Retail",
+    },
+    {
+        "name": "HIGH_TECH",
+        "label": "High Tech & Electronics",
+        "keywords": ["techgiant", "nvidia", "apple", "gpu", "server", "electronics", "semiconductor"],
+        "search_context": "High Tech",
+    },
+    {
+        "name": "PHARMA",
+        "label": "Pharma & Healthcare",
+        "keywords": ["healthplus", "medilife", "vaccine", "insulin", "pharma", "biologic"],
+        "search_context": "Pharma",
+    },
+    {
+        "name": "AUTOMOTIVE",
+        "label": "Automotive & Manufacturing",
+        "keywords": ["detroit motors", "tesla", "ford", "brake", "engine", "automotive"],
+        "search_context": "Automotive",
+    },
+    {
+        "name": "GENERAL",
+        "label": "General Logistics",
+        "keywords": ["office supplies", "furniture", "clothing", "apparel"],
+        "search_context": "General Logistics",
+    },
+]
+
+PERISHABLE_KEYWORDS = ["food", "produce", "dairy", "meat", "seafood", "frozen", "perishable", "fruit", "vegetable"]
+# A temperature excursion needs explicit evidence: merely mentioning temperature,
+# cold chain or a reefer ("Temperature logs normal") is not one
+EXCURSION_PHRASES = ["excursion", "out of range", "out-of-range", "outside the range", "out of spec"]
+TEMPERATURE_EVENT_TYPES = ["TEMPERATURE_EXCURSION", "TEMP_EXCURSION", "COLD_CHAIN_BREACH"]
+# Damage reports only count when they are about temperature
+DAMAGE_EVENT_TYPES = ["DAMAGED_GOODS"]
+TEMPERATURE_MENTIONS = ["temperature", "temp ", "cold chain", "reefer", "refrigerat", "thermal"]
+# SOP cold chain band, in °C
+COLD_CHAIN_BAND = (2.0, 8.0)
+TEMPERATURE_READING = re.compile(
+    r"(above|over|exceed(?:s|ed|ing)?|>|below|under|<)?\s*(-?\d+(?:\.\d+)?)\s*(?:°|deg(?:rees)?\s)\s*c\b"
+)
+LINE_DOWN_KEYWORDS = ["line down", "buffer", "stoppage", "production halt", "critical shortage", "line stop",
+                      "hours of parts", "hours of stock", "hours of inventory", "parts left", "stock left",
+                      "running out", "stockout", "stock-out"]
+# Anything suggesting the shipment is not secure needs the LLM (and usually a human)
+SECURITY_KEYWORDS = ["theft", "stolen", "tamper", "route deviation", "deviation", "hijack", "went missing",
+                     "seal broken", "broken seal", "security", "suspicious", "unauthorized", "unauthorised"]
+DELAY_EVENT_TYPES = ["LATE_SHIPMENT", "WEATHER_DELAY"]
+
+# --- RULES (evaluated in order; the first match wins) ---
+# `when` keys: vertical, event_types, perishable, temperature_excursion,
+# line_down_risk, security_risk, value_gt, value_lte, severity_in
+RULES = [
+    {
+        "id": "PHARMA-TEMP-EXCURSION",
+        "when": {"vertical": "PHARMA", "temperature_excursion": True},
+        "action": "request_reshipment",
+        "priority": "NFO",
+        "confidence": 0.97,
+        "reason": "a pharma temperature excursion renders the product adulterated under GDP cold chain rules",
+    },
+    {
+        "id": "RETAIL-PERISHABLE-TEMP-EXCURSION",
+        "when": {"vertical": "RETAIL", "perishable": True, "temperature_excursion": True},
+        "action": "request_reshipment",
+        "priority": "NFO",
+        "confidence": 0.95,
+        "reason": "perishable goods with a temperature excursion are treated as spoiled",
+    },
+    {
+        "id": "RETAIL-NON-PERISHABLE-DELAY",
+        "when": {"vertical": "RETAIL", "event_types": DELAY_EVENT_TYPES, "perishable": False,
+                 "temperature_excursion": False, "line_down_risk": False, "security_risk": False,
+                 "severity_in": ["LOW", "MEDIUM"]},
+        "action": "update_eta",
+        "confidence": 0.93,
+        "reason": "non-perishable retail delays only require an ETA update",
+    },
+    {
+        "id": "HIGH-TECH-HIGH-VALUE",
+        "when": {"vertical": "HIGH_TECH", "event_types": DELAY_EVENT_TYPES, "value_gt": 50000},
+        "action": "escalate_to_human",
+        "confidence": 0.96,
+        "reason": "any delay on a high-tech shipment over $50k requires a security escalation",
+    },
+    {
+        "id": "HIGH-TECH-STANDARD-DELAY",
+        "when": {"vertical": "HIGH_TECH", "event_types": DELAY_EVENT_TYPES, "value_lte": 50000,
+                 "security_risk": False, "severity_in": ["LOW", "MEDIUM"]},
+        "action": "update_eta",
+        "confidence": 0.9,
+        "reason": "standard-value high-tech delays are handled with an ETA update when the shipment is secure",
+    },
+    {
+        "id": "AUTOMOTIVE-STANDARD-DELAY",
+        "when": {"vertical": "AUTOMOTIVE", "event_types": DELAY_EVENT_TYPES, "line_down_risk": False,
+                 "security_risk": False, "severity_in": ["LOW", "MEDIUM"]},
+        "action": "update_eta",
+        "confidence": 0.9,
+        "reason": "the delay does not threaten the line-side buffer, so an ETA update is sufficient",
+    },
+    {
+        "id": "GENERAL-STANDARD-DELAY",
+        "when": {"vertical": "GENERAL", "event_types": DELAY_EVENT_TYPES, "security_risk": False,
+                 "severity_in": ["LOW", "MEDIUM"]},
+        "action": "update_eta",
+        "confidence": 0.9,
+        "reason": "standard SLA delays in general logistics are resolved with an ETA update",
+    },
+]
+
+PATH_FAST = "fast_path"
+PATH_LLM = "llm"
+
+
+@dataclass
+class FastPathDecision:
+    path: str
+    reason: str
+    vertical: str = None
+    rule_id: str = None
+    action: str = None
+    confidence: float = 0.0
+    params: dict = field(default_factory=dict)
+
+
+def _contains_any(text, keywords):
+    return any(k in text for k in keywords)
+
+
+def _temperature_excursion(event_type: str, description: str) -> bool:
+    """
+    True on explicit evidence of an excursion: a temperature event type (or a
+    damage report about temperature), an excursion phrase, or a reading
+    outside the SOP band.
+    """
+    if event_type in TEMPERATURE_EVENT_TYPES or _contains_any(description, EXCURSION_PHRASES):
+        return True
+    if event_type in DAMAGE_EVENT_TYPES and _contains_any(description, TEMPERATURE_MENTIONS):
+        return True
+    low, high = COLD_CHAIN_BAND
+    for qualifier, reading in TEMPERATURE_READING.findall(description):
+        value = float(reading)
+        if qualifier in ("below", "under", "<"):
+            if value <= low:
+                return True
+        elif qualifier:
+            if value >= high:
+                return True
+        elif not low <= value <= high:
+            return True
+    return False
+
+
+def parse_event(message: str):
+    """
+    Extracts the exception event from an agent message. Accepts a raw JSON
+    event, or the UI's "Handle this Supply Chain Exception: ... Event Data: {...}" text.
+    """
+    if not message:
+        return None
+    candidate = message.strip()
+    marker = candidate.find("Event Data:")
+    if marker != -1:
+        candidate = candidate[marker + len("Event Data:"):].strip()
+    start = candidate.find("{")
+    if start == -1:
+        return None
+    try:
+        event, _ = json.JSONDecoder().raw_decode(candidate[start:])
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) and event.get("shipment") else None
+
+
+def extract_features(event: dict) -> dict:
+    customer = event.get("customer") or {}
+    shipment = event.get("shipment") or {}
+    items = " ".join(str(i) for i in shipment.get("items") or [])
+    description = str(event.get("description") or "")
+    text = " ".join([str(customer.get("name") or ""), items, description]).lower()
+
+    matched = [v["name"] for v in VERTICALS if _contains_any(text, v["keywords"])]
+    # The customer name is the strongest signal; use it to break keyword ties
+    customer_name = str(customer.get("name") or "").lower()
+    by_customer = [v["name"] for v in VERTICALS if _contains_any(customer_name, v["keywords"])]
+    if len(by_customer) == 1:
+        matched = by_customer
+
+    try:
+        value = float(shipment.get("value") or 0)
+    except (TypeError, ValueError):
+        value = 0.0
+
+    return {
+        "verticals": matched,
+        "vertical": matched[0] if len(matched) == 1 else None,
+        "event_type": str(event.get("type") or "").upper(),
+        "severity": str(event.get("severity") or "").upper(),
+        "perishable": _contains_any(items.lower() + " " + description.lower(), PERISHABLE_KEYWORDS),
+        "temperature_excursion": _temperature_excursion(str(event.get("type") or "").upper(), description.lower()),
+        "line_down_risk": _contains_any(description.lower(), LINE_DOWN_KEYWORDS),
+        "security_risk": _contains_any(description.lower(), SECURITY_KEYWORDS),
+        "value": value,
+    }
+
+
+def _matches(when: dict, features: dict) -> bool:
+    for key, expected in when.items():
+        if key == "event_types":
+            if features["event_type"] not in expected:
+                return False
+        elif key == "severity_in":
+            if features["severity"] not in expected:
+                return False
+        elif key == "value_gt":
+            if not features["value"] > expected:
+                return False
+        elif key == "value_lte":
+            if not features["value"] <= expected:
+                return False
+        elif features.get(key) != expected:
+            return False
+    return True
+
+
+class FastPathResolver:
+    """
+    Classifies events and decides between the deterministic fast path and the
+    LLM. Thread-safe; keeps per-path and per-rule counters for reporting.
+    """
+
+    def __init__(self, min_confidence: float = 0.9, rules=None):
+        self.min_confidence = min_confidence
+        self.rules = rules if rules is not None else RULES
+        self._lock = threading.Lock()
+        self._paths = {}
+        self._rules_fired = {}
+
+    def decide(self, message: str) -> FastPathDecision:
+        event = parse_event(message)
+        if event is None:
+            return self._record(FastPathDecision(PATH_LLM, "no structured event in message"))
+
+        features = extract_features(event)
+        if features["vertical"] is None:
+            reason = "vertical is ambiguous" if features["verticals"] else "no vertical matched"
+            return self._record(FastPathDecision(PATH_LLM, reason))
+
+        rule = next((r for r in self.rules if _matches(r["when"], features)), None)
+        if rule is None:
+            return self._record(FastPathDecision(PATH_LLM, "no routine rule matched", vertical=features["vertical"]))
+        if rule["confidence"] < self.min_confidence:
+            return self._record(FastPathDecision(
+                PATH_LLM, f"rule {rule['id']} below confidence threshold",
+                vertical=features["vertical"], rule_id=rule["id"], confidence=rule["confidence"],
+            ))
+
+        params = self._tool_params(rule, event)
+        if params is None:
+            return self._record(FastPathDecision(
+                PATH_LLM, f"rule {rule['id']} is missing required event fields",
+                vertical=features["vertical"], rule_id=rule["id"],
+            ))
+
+        return self._record(FastPathDecision(
+            PATH_FAST, rule["reason"], vertical=features["vertical"], rule_id=rule["id"],
+            action=rule["action"], confidence=rule["confidence"], params=params,
+        ))
+
+    def record_fallback(self, decision: FastPathDecision):
+        """Counts a fast-path decision that failed at execution and went to the LLM instead."""
+        with self._lock:
+            self._paths["fast_path_failed"] = self._paths.get("fast_path_failed", 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(v for k, v in self._paths.items() if k in (PATH_FAST, PATH_LLM))
+            return {
+                "paths": dict(self._paths),
+                "fast_path_rate": round(self._paths.get(PATH_FAST, 0) / total, 4) if total else 0.0,
+                "rules_fired": dict(self._rules_fired),
+            }
+
+    def _record(self, decision: FastPathDecision) -> FastPathDecision:
+        with self._lock:
+            self._paths[decision.path] = self._paths.get(decision.path, 0) + 1
+            if decision.path == PATH_FAST:
+                self._rules_fired[decision.rule_id] = self._rules_fired.get(decision.rule_id, 0) + 1
+        return decision
+
+    @staticmethod
+    def _tool_params(rule: dict, event: dict):
+        customer = event.get("customer") or {}
+        metadata = {
+            "event_id": event.get("id"),
+            "customer_tier": customer.get("tier"),
+            "confidence": rule["confidence"],
+            "resolution_path": PATH_FAST,
+            "rule_id": rule["id"],
+        }
+        return build_tool_params(
+            rule["action"],
+            event,
+            reasoning=f"[Fast path {rule['id']}] {rule['reason'].capitalize()}.",
+            metadata=metadata,
+            priority=rule.get("priority"),
+            reason=rule["reason"].capitalize(),
+        )
+
+
+def build_tool_params(action: str, event: dict, reasoning: str, metadata: dict, priority: str = None,
+                      reason: str = None):
+    """
+    Arguments for the action tool (update_eta / request_reshipment /
+    escalate_to_human) applied to `event`, or None if the event lacks a
+    field the action needs.
+    """
+    shipment = event.get("shipment") or {}
+    shipment_id = shipment.get("id")
+    if not shipment_id:
+        return None
+
+    if action == "update_eta":
+        new_eta = shipment.get("predictedDelivery")
+        if not new_eta:
+            return None
+        return {
+            "shipment_id": shipment_id,
+            "new_eta": new_eta,
+            "reason": str(event.get("type") or "Delay").replace("_", " ").title(),
+            "reasoning": reasoning,
+            "metadata": metadata,
+        }
+    if action == "request_reshipment":
+        return {
+            "original_shipment_id": shipment_id,
+            "priority": priority or "STANDARD",
+            "reasoning": reasoning,
+            "metadata": metadata,
+        }
+    if action == "escalate_to_human":
+        return {
+            "shipment_id": shipment_id,
+            "reason": reason or "Escalated per cached resolution",
+            "reasoning": reasoning,
+            "metadata": metadata,
+        }
+    return None
+
+
+def format_summary(decision: FastPathDecision, result: dict) -> str:
+    """Final agent message for a fast-path resolution, in the agent's summary format."""
+    action_label = {
+        "update_eta": "update the ETA",
+        "request_reshipment": "request a reshipment",
+        "escalate_to_human": "escalate to a human operator",
+    }.get(decision.action, decision.action)
+    return (
+        f"⚡ **Fast-Path Resolution** ({decision.vertical}, rule `{decision.rule_id}`, "
+        f"confidence {decision.confidence:.2f}): this is a routine case handled by the deterministic playbook.\n\n"
+        f"> **Tool Result**: `{json.dumps(result)}`\n\n"
+        f"**Reasoning Summary**: I chose to {action_label} because {decision.reason}."
+    )
@@ -0,0 +1,369 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+import google.auth.transport.requests
+from google.auth import jwt
+from google.oauth2 import id_token
+
+# Tokens are refreshed this many seconds before their `exp` claim.
+REFRESH_MARGIN_SECONDS = 300
+# Used when a token's `exp` claim cannot be read (Google ID tokens last 1 hour).
+DEFAULT_TOKEN_LIFETIME_SECONDS = 3600
+
+# (connect, read) timeouts in seconds per tool; "default" covers anything unlisted.
+DEFAULT_TOOL_TIMEOUTS = {
+    "default": (3.05, 30),
+    "search_knowledge_base": (3.05, 15),
+    "get_similar_events": (3.05, 15),
+    "get_dashboard_stats": (3.05, 30),
+    "update_shipment_eta": (3.05, 20),
+    "request_reshipment": (3.05, 20),
+    "escalate_to_human": (3.05, 20),
+}
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# With an Idempotency-Key, 409 means the first attempt is still running on the tool service
+KEYED_RETRYABLE_STATUS_CODES = RETRYABLE_STATUS_CODES | {409}
+
+
+def idempotency_key(tool, payload):
+    """
+    Idempotency-Key for a side-effecting call: identical calls get the same
+    key, so the tool service answers retries (and exact repeats) from its
+    response store instead of acting twice.
+    """
+    canonical = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(f"{tool}:{canonical}".encode("utf-8")).hexdigest()
+
+
+class IdTokenCache:
+    """
+    Thread-safe, per-audience cache of OIDC identity tokens.
+
+    A cached token is returned until it is within `refresh_margin` seconds
+    of its `exp` claim. Inside that window the cached token is still
+    returned and one background refresh is started, so callers never block
+    on the metadata server except for the very first token (or after the
+    token has actually expired).
+    """
+
+    def __init__(self, refresh_margin=REFRESH_MARGIN_SECONDS):
+        self.refresh_margin = refresh_margin
+        self._tokens = {}        # audience -> (token, expires_at epoch seconds)
+        self._locks = {}         # audience -> lock serialising fetches
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._fetches = 0
+        self._fetch_errors = 0
+        self._background_refreshes = 0
+        self._total_fetch_ms = 0.0
+        self._max_fetch_ms = 0.0
+        self._last_fetch_ms = 0.0
+
+    def get(self, audience: str) -> str:
+        now = time.time()
+        with self._lock:
+            cached = self._tokens.get(audience)
+            if cached and now < cached[1] - self.refresh_margin:
+                self._hits += 1
+                return cached[0]
+            if cached and now < cached[1]:
+                # Still valid: serve it and refresh ahead of expiry
+                self._hits += 1
+                if audience not in self._refreshing:
+                    self._refreshing.add(audience)
+                    self._background_refreshes += 1
+                    threading.Thread(
+                        target=self._background_refresh, args=(audience,), daemon=True
+                    ).start()
+                return cached[0]
+            audience_lock = self._locks.setdefault(audience, threading.Lock())
+
+        # Missing or expired: fetch synchronously, once per audience
+        with audience_lock:
+            with self._lock:
+                cached = self._tokens.get(audience)
+                if cached and time.time() < cached[1] - self.refresh_margin:
+                    self._hits += 1
+                    return cached[0]
+            return self._fetch(audience)
+
+    def invalidate(self, audience: str = None):
+        with self._lock:
+            if audience is None:
+                self._tokens.clear()
+            else:
+                self._tokens.pop(audience, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "audiences": len(self._tokens),
+                "hits": self._hits,
+                "fetches": self._fetches,
+                "fetch_errors": self._fetch_errors,
+                "background_refreshes": self._background_refreshes,
+                "last_fetch_ms": round(self._last_fetch_ms, 1),
+                "max_fetch_ms": round(self._max_fetch_ms, 1),
+                "avg_fetch_ms": round(self._total_fetch_ms / self._fetches, 1) if self._fetches else 0.0,
+            }
+
+    def _fetch(self, audience: str) -> str:
+        start_time = time.time()
+        try:
+            auth_req = google.auth.transport.requests.Request()
+            token = id_token.fetch_id_token(auth_req, audience)
+        except Exception:
+            with self._lock:
+                self._fetch_errors += 1
+            raise
+        elapsed_ms = (time.time() - start_time) * 1000
+
+        with self._lock:
+            self._tokens[audience] = (token, self._expiry(token, start_time))
+            self._fetches += 1
+            self._last_fetch_ms = elapsed_ms
+            self._max_fetch_ms = max(self._max_fetch_ms, elapsed_ms)
+            self._total_fetch_ms += elapsed_ms
+        return token
+
+    def _background_refresh(self, audience: str):
+        try:
+            with self._locks[audience]:
+                self._fetch(audience)
+        except Exception as e:
+            print(f"Warning: Background token refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(audience)
+
+    @staticmethod
+    def _expiry(token: str, issued_at: float) -> float:
+        try:
+            return float(jwt.decode(token, verify=False)["exp"])
+        except Exception:
+            return issued_at + DEFAULT_TOKEN_LIFETIME_SECONDS
+
+
+class _ToolClientBase:
+    """Timeouts, retry policy and counters shared by the sync and async clients."""
+
+    def __init__(self, base_url, headers_provider=None, timeouts=None, max_retries=2,
+                 backoff_base=0.25, backoff_cap=2.0):
+        self.base_url = (base_url or "").rstrip("/")
+        self.headers_provider = headers_provider
+        self.timeouts = dict(DEFAULT_TOOL_TIMEOUTS, **(timeouts or {}))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.http2 = False
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._retries = 0
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self._calls, "retries": self._retries, "http2": self.http2}
+
+    def _attempts(self, idempotent):
+        return 1 + (self.max_retries if idempotent else 0)
+
+    @staticmethod
+    def _retryable_status_codes(key):
+        return KEYED_RETRYABLE_STATUS_CODES if key else RETRYABLE_STATUS_CODES
+
+    def _count_call(self):
+        with self._lock:
+            self._calls += 1
+
+    def _backoff_delay(self, attempt, tool, reason):
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        with self._lock:
+            self._retries += 1
+        print(f"Warning: {tool} call failed ({reason}); retrying in {delay:.2f}s")
+        return delay
+
+    def _httpx_timeout(self, tool):
+        import httpx
+        connect, read = self.timeouts.get(tool, self.timeouts["default"])
+        return httpx.Timeout(read, connect=connect)
+
+
+class ToolHttpClient(_ToolClientBase):
+    """
+    One pooled, keep-alive HTTP client shared by every agent tool.
+
+    Connections to the tool service are reused across calls, so only the
+    first call per connection pays for the TLS handshake. Each call gets its
+    tool's (connect, read) timeout. Idempotent calls are retried on
+    connection errors, timeouts and 429/5xx responses with capped
+    exponential backoff and full jitter; side-effecting calls are sent once
+    unless they carry an `idempotency_key`, which the tool service uses to
+    answer retries without acting twice.
+
+    With `http2=True` the client uses httpx (HTTP/2 multiplexes every call
+    over a single connection); if httpx/h2 is not installed it falls back to
+    requests over HTTP/1.1 keep-alive.
+    """
+
+    def __init__(self, base_url, headers_provider=None, timeouts=None, max_retries=2,
+                 backoff_base=0.25, backoff_cap=2.0, pool_size=10, http2=False):
+        super().__init__(base_url, headers_provider, timeouts, max_retries, backoff_base, backoff_cap)
+
+        if http2:
+            try:
+                import httpx
+                self._session = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                )
+                self.http2 = True
+            except ImportError as e:
+                print(f"Warning: HTTP/2 unavailable ({e}); using HTTP/1.1 keep-alive")
+        if not self.http2:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+    def get(self, path, params=None, tool="default", idempotent=True):
+        return self.request("GET", path, tool=tool, params=params, idempotent=idempotent)
+
+    def post(self, path, payload, tool="default", idempotent=False, idempotency_key=None):
+        return self.request("POST", path, tool=tool, json=payload, idempotent=idempotent,
+                            idempotency_key=idempotency_key)
+
+    def request(self, method, path, tool="default", idempotent=False, idempotency_key=None, **kwargs):
+        """Sends the request and returns the decoded JSON body (raises on HTTP errors)."""
+        url = f"{self.base_url}{path}"
+        timeout = self._timeout(tool)
+        attempts = self._attempts(idempotent or idempotency_key is not None)
+        retryable = self._retryable_status_codes(idempotency_key)
+
+        for attempt in range(attempts):
+            headers = dict(self.headers_provider(self.base_url)) if self.headers_provider else {}
+            if idempotency_key:
+                headers["Idempotency-Key"] = idempotency_key
+            last_attempt = attempt == attempts - 1
+            self._count_call()
+            try:
+                response = self._session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+            except Exception as e:
+                if last_attempt or not self._is_transient(e):
+                    raise
+                time.sleep(self._backoff_delay(attempt, tool, e))
+                continue
+
+            if response.status_code in retryable and not last_attempt:
+                response.close()  # return the connection to the pool
+                time.sleep(self._backoff_delay(attempt, tool, f"HTTP {response.status_code}"))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def _timeout(self, tool):
+        if self.http2:
+            return self._httpx_timeout(tool)
+        return self.timeouts.get(tool, self.timeouts["default"])
+
+    def _is_transient(self, error):
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if self.http2:
+            import httpx
+            # Connect/read timeouts and dropped connections
+            return isinstance(error, httpx.TransportError)
+        return False
+
+
+class AsyncToolHttpClient(_ToolClientBase):
+    """
+    Non-blocking counterpart of ToolHttpClient for async agent tools.
+
+    Uses httpx.AsyncClient so independent tool calls (e.g. knowledge base
+    search and precedent lookup) can run concurrently on the agent's event
+    loop. An AsyncClient is bound to the loop it was created on, so one is
+    kept per running loop. Auth headers come from the same provider (and so
+    the same token cache) as the sync client, resolved off the event loop.
+    """
+
+    def __init__(self, base_url, headers_provider=None, timeouts=None, max_retries=2,
+                 backoff_base=0.25, backoff_cap=2.0, pool_size=10, http2=False):
+        super().__init__(base_url, headers_provider, timeouts, max_retries, backoff_base, backoff_cap)
+        self.pool_size = pool_size
+        self.http2 = http2
+        self._clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+
+    async def get(self, path, params=None, tool="default", idempotent=True):
+        return await self.request("GET", path, tool=tool, params=params, idempotent=idempotent)
+
+    async def post(self, path, payload, tool="default", idempotent=False, idempotency_key=None):
+        return await self.request("POST", path, tool=tool, json=payload, idempotent=idempotent,
+                                  idempotency_key=idempotency_key)
+
+    async def request(self, method, path, tool="default", idempotent=False, idempotency_key=None, **kwargs):
+        """Sends the request and returns the decoded JSON body (raises on HTTP errors)."""
+        import httpx
+
+        client = self._client()
+        url = f"{self.base_url}{path}"
+        timeout = self._httpx_timeout(tool)
+        attempts = self._attempts(idempotent or idempotency_key is not None)
+        retryable = self._retryable_status_codes(idempotency_key)
+
+        for attempt in range(attempts):
+            headers = await asyncio.to_thread(self.headers_provider, self.base_url) if self.headers_provider else {}
+            headers = dict(headers)
+            if idempotency_key:
+                headers["Idempotency-Key"] = idempotency_key
+            last_attempt = attempt == attempts - 1
+            self._count_call()
+            try:
+                response = await client.request(method, url, headers=headers, timeout=timeout, **kwargs)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt, tool, e))
+                continue
+
+            if response.status_code in retryable and not last_attempt:
+                await asyncio.sleep(self._backoff_delay(attempt, tool, f"HTTP {response.status_code}"))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def _client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            try:
+                client = httpx.AsyncClient(
+                    http2=self.http2,
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+            except ImportError as e:
+                print(f"Warning: HTTP/2 unavailable ({e}); using HTTP/1.1 keep-alive")
+                self.http2 = False
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+            self._clients[loop] = client
+        return client
+
+
+# Shared by every tool in the process
+token_cache = IdTokenCache()
@@ -0,0 +1,278 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+"""
+Admission control for agent runs.
+
+At most `max_concurrency` Agent Engine runs execute at once per instance.
+Further requests wait in a priority queue ordered by customer tier, then
+severity (temperature / cold-chain events count as critical), then arrival.
+A waiting request gives up after `queue_deadline` seconds. When the queue is
+full, a new request either displaces the lowest-priority waiter (if it
+outranks it) or is rejected. Both rejections carry a Retry-After estimate so
+the caller can answer 429.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import re
+import threading
+import time
+
+# Lower ranks are served first; unknown tiers and free-text queries go last
+TIER_RANKS = {"PLATINUM": 0, "VIP": 0, "PARTNER": 1, "GOLD": 1, "STANDARD": 2}
+UNKNOWN_TIER_RANK = 3
+SEVERITY_RANKS = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3}
+UNKNOWN_SEVERITY_RANK = 2
+COLD_CHAIN_KEYWORDS = ["temperature", "excursion", "cold chain", "reefer", "°c", "thermal"]
+
+# Queue wait histogram bucket bounds, in milliseconds (last bucket is +Inf)
+WAIT_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_EVENT_DATA = re.compile(r"Event Data:\s*(\{.*\})\s*$", re.DOTALL)
+_CUSTOMER_TIER = re.compile(r"Customer:.*\(([A-Za-z_ ]+)\)")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted. `reason` is queue_full, displaced or deadline."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Agent capacity exhausted ({reason}); retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def to_json(self):
+        return json.dumps({"error": str(self), "type": "Overloaded", "reason": self.reason,
+                           "retry_after": self.retry_after})
+
+
+def event_from_query(query):
+    """Exception event embedded in a /stream query (the UI's "Event Data: {...}" line), else {}."""
+    match = _EVENT_DATA.search(query or "")
+    if match:
+        try:
+            event = json.loads(match.group(1))
+            if isinstance(event, dict):
+                return event
+        except json.JSONDecodeError:
+            pass
+    tier = _CUSTOMER_TIER.search(query or "")
+    return {"customer": {"tier": tier.group(1).strip()}} if tier else {}
+
+
+def priority_of(event):
+    """(priority, label) for an exception event; lower priority values are admitted first."""
+    customer = event.get("customer") or {}
+    tier = str(customer.get("tier") or "").strip().upper()
+    severity = str(event.get("severity") or "").strip().upper()
+    # Tiers can be compound, e.g. "VIP PLATINUM"
+    tier_rank = min((rank for name, rank in TIER_RANKS.items() if name in tier.split()), default=UNKNOWN_TIER_RANK)
+    severity_rank = SEVERITY_RANKS.get(severity, UNKNOWN_SEVERITY_RANK)
+    description = f"{event.get('type') or ''} {event.get('description') or ''}".lower()
+    if any(keyword in description for keyword in COLD_CHAIN_KEYWORDS):
+        severity_rank = SEVERITY_RANKS["CRITICAL"]
+    label = tier if tier_rank != UNKNOWN_TIER_RANK else "UNKNOWN"
+    return tier_rank * len(SEVERITY_RANKS) + severity_rank, label
+
+
+class Ticket:
+    """One request's place in line; pass it to `release()` when the agent run ends."""
+
+    __slots__ = ("priority", "label", "sheddable", "enqueued_at", "admitted_at", "state", "_event", "_loop")
+
+    def __init__(self, priority, label, sheddable, event, loop=None):
+        self.priority = priority
+        self.label = label
+        self.sheddable = sheddable
+        self.enqueued_at = time.monotonic()
+        self.admitted_at = None
+        self.state = "waiting"  # -> admitted | displaced | expired | released
+        self._event = event
+        self._loop = loop
+
+    def _signal(self):
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                pass  # loop already closed
+        else:
+            self._event.set()
+
+
+class AdmissionController:
+    """
+    Concurrency cap plus priority queue in front of Agent Engine runs.
+    `acquire()` blocks a thread, `aacquire()` awaits on an event loop; both
+    return a Ticket or raise AdmissionRejected.
+    """
+
+    def __init__(self, max_concurrency=32, max_queue=200, queue_deadline=30.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_deadline = queue_deadline
+
+        self._heap = []  # (priority, seq, ticket); entries that left the queue are skipped lazily
+        self._seq = itertools.count()
+        self._waiting = 0
+        self._sheddable_waiting = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+        # Moving average of run duration, for Retry-After
+        self._avg_run_seconds = 10.0
+        self._counts = {"admitted": 0, "queue_full": 0, "displaced": 0, "deadline": 0}
+        self._histograms = {}  # label -> {"buckets": [...], "count", "sum_ms"}
+
+    def acquire(self, priority, label="UNKNOWN", deadline=None, shed=True):
+        """
+        Waits for a slot. `deadline` (seconds in queue) defaults to
+        queue_deadline; None with shed=False waits indefinitely and never
+        counts toward max_queue (for internal callers with their own bounds).
+        """
+        ticket = Ticket(priority, label, shed, threading.Event())
+        if self._enqueue(ticket):
+            return ticket
+        ticket._event.wait(self._timeout(deadline, shed))
+        return self._settle(ticket)
+
+    async def aacquire(self, priority, label="UNKNOWN", deadline=None, shed=True):
+        ticket = Ticket(priority, label, shed, asyncio.Event(), asyncio.get_running_loop())
+        if self._enqueue(ticket):
+            return ticket
+        try:
+            await asyncio.wait_for(ticket._event.wait(), self._timeout(deadline, shed))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client went away while queued: give up the place (or the slot, if just granted)
+            if self._settle_quietly(ticket):
+                self.release(ticket)
+            raise
+        return self._settle(ticket)
+
+    def release(self, ticket):
+        with self._lock:
+            if ticket is None or ticket.state != "admitted":
+                return
+            ticket.state = "released"
+            self._active -= 1
+            duration = time.monotonic() - ticket.admitted_at
+            self._avg_run_seconds = 0.9 * self._avg_run_seconds + 0.1 * duration
+            self._grant()
+
+    def retry_after(self):
+        with self._lock:
+            return self._retry_after()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                "queued": self._waiting,
+                "max_queue": self.max_queue,
+                "queue_deadline_seconds": self.queue_deadline,
+                "avg_run_seconds": round(self._avg_run_seconds, 2),
+                **self._counts,
+                "wait_ms": {
+                    label: {
+                        "buckets": {
+                            f"le_{bound}": count
+                            for bound, count in zip([*WAIT_BUCKETS_MS, "inf"], itertools.accumulate(h["buckets"]))
+                        },
+                        "count": h["count"],
+                        "avg": round(h["sum_ms"] / h["count"], 1) if h["count"] else 0.0,
+                    }
+                    for label, h in self._histograms.items()
+                },
+            }
+
+    def _timeout(self, deadline, shed):
+        if deadline is None and not shed:
+            return None
+        return self.queue_deadline if deadline is None else deadline
+
+    def _enqueue(self, ticket):
+        """Admits `ticket` right away (True) or queues it (False); raises AdmissionRejected when full."""
+        with self._lock:
+            if self._active < self.max_concurrency and self._waiting == 0:
+                self._admit(ticket)
+                return True
+            if ticket.sheddable and self._sheddable_waiting >= self.max_queue:
+                worst = max(
+                    (t for _, _, t in self._heap if t.state == "waiting" and t.sheddable),
+                    key=lambda t: t.priority, default=None,
+                )
+                if worst is None or worst.priority <= ticket.priority:
+                    self._counts["queue_full"] += 1
+                    raise AdmissionRejected("queue_full", self._retry_after())
+                self._leave(worst, "displaced")
+                worst._signal()
+            heapq.heappush(self._heap, (ticket.priority, next(self._seq), ticket))
+            self._waiting += 1
+            if ticket.sheddable:
+                self._sheddable_waiting += 1
+            return False
+
+    def _settle(self, ticket):
+        """After waiting: returns the admitted ticket or raises for displaced / expired ones."""
+        with self._lock:
+            if ticket.state == "admitted":
+                return ticket
+            if ticket.state == "waiting":
+                self._leave(ticket, "expired")
+                self._counts["deadline"] += 1
+            reason = "deadline" if ticket.state == "expired" else ticket.state
+            raise AdmissionRejected(reason, self._retry_after())
+
+    def _settle_quietly(self, ticket):
+        """Leaves the queue without raising; True if the ticket had already been admitted."""
+        with self._lock:
+            if ticket.state == "waiting":
+                self._leave(ticket, "expired")
+            return ticket.state == "admitted"
+
+    def _leave(self, ticket, state):
+        """Caller holds self._lock. Takes a waiting ticket out of the queue."""
+        ticket.state = state
+        self._waiting -= 1
+        if ticket.sheddable:
+            self._sheddable_waiting -= 1
+        if state == "displaced":
+            self._counts["displaced"] += 1
+
+    def _grant(self):
+        """Caller holds self._lock. Hands free slots to the best waiting tickets."""
+        while self._active < self.max_concurrency and self._heap:
+            _, _, ticket = heapq.heappop(self._heap)
+            if ticket.state != "waiting":
+                continue
+            self._waiting -= 1
+            if ticket.sheddable:
+                self._sheddable_waiting -= 1
+            self._admit(ticket)
+            ticket._signal()
+
+    def _admit(self, ticket):
+        """Caller holds self._lock."""
+        ticket.state = "admitted"
+        ticket.admitted_at = time.monotonic()
+        self._active += 1
+        self._counts["admitted"] += 1
+        waited_ms = (ticket.admitted_at - ticket.enqueued_at) * 1000
+        histogram = self._histograms.setdefault(
+            ticket.label, {"buckets": [0] * (len(WAIT_BUCKETS_MS) + 1), "count": 0, "sum_ms": 0.0}
+        )
+        bucket = next((i for i, bound in enumerate(WAIT_BUCKETS_MS) if waited_ms <= bound), len(WAIT_BUCKETS_MS))
+        histogram["buckets"][bucket] += 1
+        histogram["count"] += 1
+        histogram["sum_ms"] += waited_ms
+
+    def _retry_after(self):
+        """Caller holds self._lock. Seconds until the current queue has likely drained."""
+        estimate = self._avg_run_seconds * (self._waiting + 1) / max(self.max_concurrency, 1)
+        return min(max(1, math.ceil(estimate)), 120)
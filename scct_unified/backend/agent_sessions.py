@@ -0,0 +1,189 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from vertexai import agent_engines
+
+logger = logging.getLogger(__name__)
+
+
+class AgentHandle:
+    """
+    Process-wide handle to the deployed Agent Engine.
+
+    `agent_engines.get()` is a resource lookup round-trip, so it runs once and
+    the result is shared by every request. `invalidate()` drops it (e.g.
+    after the agent was redeployed) and the next `get()` looks it up again.
+    """
+
+    def __init__(self, agent_id):
+        self.agent_id = agent_id
+        self._agent = None
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._last_lookup_ms = 0
+
+    def get(self):
+        agent = self._agent
+        if agent is not None:
+            return agent
+        with self._lock:
+            if self._agent is None:
+                start_time = time.time()
+                self._agent = agent_engines.get(self.agent_id)
+                self._lookups += 1
+                self._last_lookup_ms = int((time.time() - start_time) * 1000)
+                logger.info(f"Resolved agent {self.agent_id} in {self._last_lookup_ms}ms")
+            return self._agent
+
+    def invalidate(self):
+        with self._lock:
+            self._agent = None
+
+    def stats(self):
+        return {
+            "resolved": self._agent is not None,
+            "lookups": self._lookups,
+            "last_lookup_ms": self._last_lookup_ms,
+        }
+
+
+class SessionRegistry:
+    """
+    Reuses one Agent Engine session per (user, conversation key).
+
+    A follow-up query with the same key continues the existing session
+    instead of creating a new one. A session serves one stream at a time;
+    a concurrent query for a busy key gets a one-off session, which is
+    dropped when that stream is released. Sessions idle for more than
+    `idle_ttl` seconds, or beyond `max_sessions` (least recently used
+    first), are evicted. With `delete_on_evict`, evicted and one-off
+    sessions are deleted from Agent Engine in the background.
+    """
+
+    def __init__(self, agent_handle, idle_ttl=1800.0, max_sessions=5000, delete_on_evict=True,
+                 sweep_interval=60.0):
+        self.agent_handle = agent_handle
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.delete_on_evict = delete_on_evict
+        self.sweep_interval = sweep_interval
+
+        self._sessions = OrderedDict()  # (user_id, key) -> {"id", "busy", "last_used"}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+        self._reused = 0
+        self._created = 0
+        self._one_off = 0
+        self._evicted = 0
+
+    def acquire(self, user_id, key):
+        """Returns (session_id, reused). Call `release()` when the stream ends."""
+        registry_key = (user_id, key)
+        now = time.monotonic()
+        with self._lock:
+            evicted = self._sweep(now)
+            entry = self._sessions.get(registry_key)
+            if entry is not None and not entry["busy"]:
+                entry["busy"] = True
+                entry["last_used"] = now
+                self._sessions.move_to_end(registry_key)
+                self._reused += 1
+                session_id = entry["id"]
+            else:
+                session_id = None
+                busy = entry is not None
+        self._delete_later(evicted)
+        if session_id is not None:
+            return session_id, True
+
+        session_id = self._create_session(user_id)
+        evicted = []
+        with self._lock:
+            if busy or registry_key in self._sessions:
+                # Another stream holds (or just registered) this key's session
+                self._one_off += 1
+            else:
+                self._sessions[registry_key] = {"id": session_id, "busy": True, "last_used": time.monotonic()}
+                self._created += 1
+                evicted = self._trim()
+        self._delete_later(evicted)
+        return session_id, False
+
+    def release(self, user_id, key, session_id):
+        """Frees a keyed session for reuse; a one-off session is deleted in the background."""
+        with self._lock:
+            entry = self._sessions.get((user_id, key))
+            registered = entry is not None and entry["id"] == session_id
+            if registered:
+                entry["busy"] = False
+                entry["last_used"] = time.monotonic()
+        if not registered:
+            self._delete_later([(user_id, session_id)])
+
+    def forget(self, user_id, key, session_id):
+        """Drops a session Agent Engine no longer accepts (e.g. deleted or expired remotely)."""
+        with self._lock:
+            entry = self._sessions.get((user_id, key))
+            if entry is not None and entry["id"] == session_id:
+                del self._sessions[(user_id, key)]
+
+    def stats(self):
+        with self._lock:
+            acquired = self._reused + self._created + self._one_off
+            return {
+                "sessions": len(self._sessions),
+                "busy": sum(1 for entry in self._sessions.values() if entry["busy"]),
+                "reused": self._reused,
+                "created": self._created,
+                "one_off": self._one_off,
+                "evicted": self._evicted,
+                "reuse_rate": round(self._reused / acquired, 4) if acquired else 0.0,
+                "idle_ttl_seconds": self.idle_ttl,
+            }
+
+    def _create_session(self, user_id):
+        session = self.agent_handle.get().create_session(user_id=user_id)
+        return session["id"] if isinstance(session, dict) else session.id
+
+    def _sweep(self, now):
+        """Caller holds self._lock. Removes idle sessions; returns [(user_id, session_id)] evicted."""
+        if now - self._last_sweep < self.sweep_interval:
+            return []
+        self._last_sweep = now
+        evicted = []
+        for registry_key, entry in list(self._sessions.items()):
+            if not entry["busy"] and now - entry["last_used"] > self.idle_ttl:
+                del self._sessions[registry_key]
+                evicted.append((registry_key[0], entry["id"]))
+        self._evicted += len(evicted)
+        return evicted
+
+    def _trim(self):
+        """Caller holds self._lock. Evicts least recently used idle sessions beyond max_sessions."""
+        evicted = []
+        for registry_key, entry in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if not entry["busy"]:
+                del self._sessions[registry_key]
+                evicted.append((registry_key[0], entry["id"]))
+        self._evicted += len(evicted)
+        return evicted
+
+    def _delete_later(self, evicted):
+        if not evicted or not self.delete_on_evict:
+            return
+        threading.Thread(target=self._delete_sessions, args=(evicted,), daemon=True).start()
+
+    def _delete_sessions(self, evicted):
+        for user_id, session_id in evicted:
+            try:
+                self.agent_handle.get().delete_session(user_id=user_id, session_id=session_id)
+            except Exception as e:
+                logger.warning(f"Could not delete idle session {session_id}: {e}")
@@ -3,10 +3,16 @@
 
 import json
 import logging
-from flask import Flask, request, Response, stream_with_context, send_from_directory, jsonify
+import os
+import threading
+from flask import Flask, request, Response, stream_with_context, send_file, jsonify
 from flask_cors import CORS
 import vertexai
-from vertexai import agent_engines
+from admission import AdmissionController, AdmissionRejected, event_from_query, priority_of
+from agent_sessions import AgentHandle, SessionRegistry
+from bulk_ingest import BulkIngestor
+from static_assets import StaticAssets, etag_matches, prepare as prepare_static_assets
+from stream_hub import StreamHub, parse_last_event_id, query_key
 
 # --- CONFIGURATION ---
 from dotenv import load_dotenv
@@ -17,6 +23,35 @@ load_dotenv()
 PROJECT_ID = os.environ.get("PROJECT_ID")
 LOCATION = os.environ.get("LOCATION")
 AGENT_ID = os.environ.get("AGENT_ID")
+# Follow-up queries with the same session key reuse one Agent Engine session
+SESSION_REUSE = os.environ.get("SESSION_REUSE", "true").lower() == "true"
+SESSION_IDLE_TTL_SECONDS = float(os.environ.get("SESSION_IDLE_TTL_SECONDS", 1800))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", 5000))
+# Identical concurrent /stream queries share one agent run (and one set of tool calls)
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "true").lower() == "true"
+# Finished streams stay resumable (Last-Event-ID) for this long
+STREAM_REPLAY_TTL_SECONDS = float(os.environ.get("STREAM_REPLAY_TTL_SECONDS", 300))
+STREAM_REPLAY_MAX_STREAMS = int(os.environ.get("STREAM_REPLAY_MAX_STREAMS", 500))
+STREAM_REPLAY_MAX_FRAMES = int(os.environ.get("STREAM_REPLAY_MAX_FRAMES", 2000))
+# Write missing .gz/.br/WebP variants of the built UI at startup (the Docker build already does)
+STATIC_PREPARE_ON_STARTUP = os.environ.get("STATIC_PREPARE_ON_STARTUP", "true").lower() == "true"
+# Cache lifetime for unhashed files such as logos (0 = always revalidate); hashed bundles are immutable
+STATIC_MAX_AGE_SECONDS = int(os.environ.get("STATIC_MAX_AGE_SECONDS", 0))
+STATIC_LOGO_MAX_PX = int(os.environ.get("STATIC_LOGO_MAX_PX", 256))
+# Admission control: agent runs in flight per instance; beyond that, requests queue by
+# customer tier and severity, for at most the deadline, and get 429 when the queue is full
+ADMISSION_MAX_CONCURRENCY = int(os.environ.get("ADMISSION_MAX_CONCURRENCY", 32))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 200))
+ADMISSION_QUEUE_DEADLINE_SECONDS = float(os.environ.get("ADMISSION_QUEUE_DEADLINE_SECONDS", 30))
+# Bulk ingestion: Agent Engine calls in flight per instance (all jobs), workers per job,
+# validated records buffered per job before the upload is throttled, and quota retries
+BULK_MAX_CONCURRENCY = int(os.environ.get("BULK_MAX_CONCURRENCY", 8))
+BULK_JOB_CONCURRENCY = int(os.environ.get("BULK_JOB_CONCURRENCY", BULK_MAX_CONCURRENCY))
+BULK_MAX_QUEUED = int(os.environ.get("BULK_MAX_QUEUED", 1000))
+BULK_MAX_RETRIES = int(os.environ.get("BULK_MAX_RETRIES", 3))
+# Events for one shipment within the debounce window are merged into one agent run (0 disables)
+BULK_COALESCE_WINDOW_SECONDS = float(os.environ.get("BULK_COALESCE_WINDOW_SECONDS", 5))
+BULK_COALESCE_MAX_WAIT_SECONDS = float(os.environ.get("BULK_COALESCE_MAX_WAIT_SECONDS", 30))
 
 if not PROJECT_ID or not LOCATION or not AGENT_ID:
     # We allow missing env vars in build phase (e.g. CI), but runtime needs them.
@@ -29,6 +64,30 @@ try:
 except Exception as e:
     print(f"Vertex AI Init Failed: {e}")
 
+# Resolved once per process; sessions are kept per (user, session key)
+agent_handle = AgentHandle(AGENT_ID)
+session_registry = SessionRegistry(agent_handle, idle_ttl=SESSION_IDLE_TTL_SECONDS, max_sessions=SESSION_MAX)
+stream_hub = StreamHub(
+    retain_seconds=STREAM_REPLAY_TTL_SECONDS,
+    max_streams=STREAM_REPLAY_MAX_STREAMS,
+    max_frames=STREAM_REPLAY_MAX_FRAMES,
+)
+admission = AdmissionController(
+    max_concurrency=ADMISSION_MAX_CONCURRENCY,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_deadline=ADMISSION_QUEUE_DEADLINE_SECONDS,
+)
+bulk_ingestor = BulkIngestor(
+    agent_handle,
+    admission=admission,
+    max_concurrency=BULK_MAX_CONCURRENCY,
+    job_concurrency=BULK_JOB_CONCURRENCY,
+    max_queued=BULK_MAX_QUEUED,
+    max_retries=BULK_MAX_RETRIES,
+    coalesce_window=BULK_COALESCE_WINDOW_SECONDS,
+    coalesce_max_wait=BULK_COALESCE_MAX_WAIT_SECONDS,
+)
+
 # --- FLASK APP SETUP ---
 # We treat the current directory as the root for static content if configured
 # In our structure: backend/app.py, backend/static/, backend/templates/
@@ -39,49 +98,26 @@ CORS(app) # Enable CORS for all (less critical since we are same-origin mostly)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# --- ROUTES ---
+# Built UI, indexed once: request paths are dict lookups, not filesystem checks
+INDEX_FILE = os.path.join(app.root_path, app.template_folder, 'index.html')
+if STATIC_PREPARE_ON_STARTUP:
+    written = prepare_static_assets(app.static_folder, INDEX_FILE, STATIC_LOGO_MAX_PX)
+    if written:
+        logger.info(f"Prepared {written} static asset variants")
+static_assets = StaticAssets(app.static_folder, INDEX_FILE, max_age=STATIC_MAX_AGE_SECONDS)
+logger.info(f"Static assets: {static_assets.stats()}")
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
+# --- AUTH VERIFICATION (HYBRID / DEMO) ---
+def authenticate(headers, user_id):
     """
-    Serve the React Single Page Application.
-    If a file exists in /static, serve it.
-    Otherwise, serve index.html (Client-side routing).
+    Resolves the caller's user id from the request headers, or None if the
+    caller is not allowed. Shared by the WSGI app and the ASGI server (asgi.py).
     """
-    if path != "" and os.path.exists(app.static_folder + '/' + path):
-        return send_from_directory(app.static_folder, path)
-    else:
-        # Check if assets request
-        if path.startswith('assets/'):
-             return send_from_directory(app.static_folder + '/assets', path.replace('assets/', ''))
-        
-        # Default to index.html for SPA routing
-        if os.path.exists(app.template_folder + '/index.html'):
-            return send_from_directory(app.template_folder, 'index.html')
-        else:
-            return "UI Not Found. Did you run 'npm run build'?", 404
-
-@app.route('/stream', methods=['POST'])
-def stream_agent_response():
-    data = request.json
-    if not data:
-        return Response("Invalid JSON payload", status=400)
-
-    query = data.get('query')
-    user_id = data.get('user_id', 'standard-user')
-
-    if not query:
-        return Response("Missing 'query' field", status=400)
-
-    logger.info(f"Received query: {query} (User: {user_id})")
-
-    # --- AUTH VERIFICATION (HYBRID / DEMO) ---
     # 1. IAP (If behind LB)
     # 2. Bearer Token (If Direct/Dev/Demo)
     
-    iap_jwt = request.headers.get('x-goog-iap-jwt-assertion')
-    auth_header = request.headers.get('Authorization')
+    iap_jwt = headers.get('x-goog-iap-jwt-assertion')
+    auth_header = headers.get('Authorization')
     is_authenticated = False
     
     # 1. IAP Check
@@ -106,6 +142,136 @@ def stream_agent_response():
         is_authenticated = True
         logger.info("Accessing as Public Guest (Unauthenticated)")
 
+    return user_id if is_authenticated else None
+
+# --- SSE FRAMING ---
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream; charset=utf-8',
+    'Cache-Control': 'no-cache, no-transform',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no',
+}
+
+# Sent with 410 when a Last-Event-ID can no longer be resumed (client should re-POST without it)
+STREAM_GONE = json.dumps({"error": "Stream can no longer be resumed.", "type": "StreamGone"})
+
+def sse_event(chunk):
+    """One SSE `data:` frame for an agent chunk (or an error dict)."""
+    chunk_data = chunk.to_dict() if hasattr(chunk, "to_dict") else chunk
+    return f"data: {json.dumps(chunk_data)}\n\n"
+
+# --- STREAMING GENERATOR ---
+def agent_frames(query, user_id, session_key):
+    """SSE frames of one agent run (the session for `session_key`, if given, is reused when enabled)."""
+    logger.info(f"Stream starting for {user_id}")
+    # A reused session Agent Engine no longer accepts is dropped and the query retried once
+    for attempt in range(2):
+        session_id, reused, sent = None, False, False
+        try:
+            agent = agent_handle.get()
+            if SESSION_REUSE and session_key:
+                session_id, reused = session_registry.acquire(user_id, session_key)
+                response = agent.stream_query(message=query, user_id=user_id, session_id=session_id)
+            else:
+                response = agent.stream_query(message=query, user_id=user_id)
+
+            for chunk in response:
+                sent = True
+                try:
+                    yield sse_event(chunk)
+                except Exception as e:
+                    logger.error(f"Serialization error: {e}")
+            return
+
+        except Exception as e:
+            if reused and not sent and attempt == 0:
+                logger.warning(f"Session {session_id} rejected, starting a new one: {e}")
+                session_registry.forget(user_id, session_key, session_id)
+                continue
+            if not sent:
+                # The cached handle may be stale (e.g. agent redeployed)
+                agent_handle.invalidate()
+            logger.error(f"Agent Engine Error: {e}")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            return
+        finally:
+            if session_id:
+                session_registry.release(user_id, session_key, session_id)
+
+def run_producer(broadcast, frames, ticket=None):
+    """Pumps one upstream agent run into its broadcast; runs to completion even if its requester leaves."""
+    try:
+        for frame in frames:
+            broadcast.append(frame)
+    except Exception as e:
+        logger.error(f"Stream producer failed: {e}")
+        broadcast.append(sse_event({'error': str(e)}))
+    finally:
+        admission.release(ticket)
+        stream_hub.finish(broadcast)
+
+def overloaded(broadcast, error):
+    """Ends a stream that was not admitted (subscribers that joined it get the error) and answers 429."""
+    logger.warning(f"Stream {broadcast.id} not admitted: {error.reason}")
+    broadcast.append(sse_event({'error': str(error), 'type': 'Overloaded'}))
+    stream_hub.finish(broadcast)
+    return Response(error.to_json(), status=429, mimetype='application/json',
+                    headers={'Retry-After': str(error.retry_after)})
+
+# --- ROUTES ---
+
+@app.route('/', defaults={'path': ''})
+@app.route('/<path:path>')
+def serve(path):
+    """
+    Serve the React Single Page Application.
+    If a file exists in /static, serve it (precompressed / WebP when accepted).
+    Otherwise, serve index.html (Client-side routing).
+    """
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    accept = request.headers.get('Accept', '')
+    selection = static_assets.resolve(path, accept_encoding, accept)
+    if selection is None:
+        # Missing bundles are real 404s, not SPA routes
+        if path.startswith('assets/'):
+            return "Not Found", 404
+
+        # Default to index.html for SPA routing
+        selection = static_assets.resolve('', accept_encoding, accept)
+        if selection is None:
+            return "UI Not Found. Did you run 'npm run build'?", 404
+    return static_response(selection)
+
+def static_response(selection):
+    headers = {'ETag': selection.etag, 'Cache-Control': selection.cache_control}
+    if selection.vary:
+        headers['Vary'] = selection.vary
+    if etag_matches(request.headers.get('If-None-Match'), selection.etag):
+        return Response(status=304, headers=headers)
+    response = send_file(selection.file_path, mimetype=selection.content_type, conditional=False, etag=False)
+    response.headers.update(headers)
+    if selection.encoding:
+        response.headers['Content-Encoding'] = selection.encoding
+    return response
+
+@app.route('/stream', methods=['POST'])
+def stream_agent_response():
+    data = request.json
+    if not data:
+        return Response("Invalid JSON payload", status=400)
+
+    query = data.get('query')
+    user_id = data.get('user_id', 'standard-user')
+    # Conversation identity (e.g. one per incident); without it the query gets a one-off session
+    session_key = data.get('session_key')
+
+    if not query:
+        return Response("Missing 'query' field", status=400)
+
+    logger.info(f"Received query: {query} (User: {user_id})")
+
+    user_id = authenticate(request.headers, user_id)
+    is_authenticated = user_id is not None
 
     if not is_authenticated:
         # This block is now effectively unreachable unless we add strict checks later
@@ -120,32 +286,93 @@ def stream_agent_response():
             mimetype='application/json'
         )
     
+    # --- RESUME (Last-Event-ID) ---
+    # A client that lost its connection re-POSTs with the last id it saw
+    last_event_id = request.headers.get('Last-Event-ID') or data.get('last_event_id')
+    if last_event_id:
+        return resume_stream(last_event_id, user_id)
+
     # --- STREAMING GENERATOR ---
-    def generate():
-        logger.info(f"Stream starting for {user_id}")
+    # The agent run is a producer feeding a broadcast, so it survives client
+    # reconnects; with SINGLE_FLIGHT, identical in-flight queries share it too
+    # (across callers only when the query is self-contained, see query_key)
+    broadcast, is_leader = stream_hub.join(query_key(query, user_id, session_key), share=SINGLE_FLIGHT)
+    if is_leader:
+        # Waits here (tier / severity order) while the instance is at capacity
         try:
-            agent = agent_engines.get(AGENT_ID)
-            response = agent.stream_query(message=query, user_id=user_id)
-            
-            for chunk in response:
-                try:
-                    chunk_data = chunk.to_dict() if hasattr(chunk, "to_dict") else chunk
-                    json_str = json.dumps(chunk_data)
-                    yield f"data: {json_str}\n\n"
-                except Exception as e:
-                    logger.error(f"Serialization error: {e}")
-                    
-        except Exception as e:
-            logger.error(f"Agent Engine Error: {e}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            ticket = admission.acquire(*priority_of(event_from_query(query)))
+        except AdmissionRejected as e:
+            return overloaded(broadcast, e)
+        threading.Thread(
+            target=run_producer, args=(broadcast, agent_frames(query, user_id, session_key), ticket), daemon=True
+        ).start()
+    else:
+        logger.info(f"Joined in-flight stream {broadcast.id} for {user_id}")
+    return sse_response(broadcast.frames(), broadcast.id)
+
+@app.route('/stream/<stream_id>', methods=['GET'])
+def resume_agent_stream(stream_id):
+    """EventSource-style resume: replays stream `stream_id` after the Last-Event-ID header (or from the start)."""
+    user_id = authenticate(request.headers, 'standard-user')
+    if user_id is None:
+        return Response(json.dumps({"error": "Unauthorized.", "type": "AuthError"}), status=403, mimetype='application/json')
+    last_event_id = request.headers.get('Last-Event-ID') or stream_id
+    if parse_last_event_id(last_event_id) and not last_event_id.startswith(f"{stream_id}:"):
+        return Response(json.dumps({"error": "Last-Event-ID belongs to another stream."}), status=400, mimetype='application/json')
+    return resume_stream(last_event_id, user_id)
+
+def resume_stream(last_event_id, user_id):
+    resumed = stream_hub.resume(last_event_id)
+    if resumed is None:
+        logger.info(f"Cannot resume {last_event_id} for {user_id}")
+        return Response(STREAM_GONE, status=410, mimetype='application/json')
+    broadcast, start = resumed
+    logger.info(f"Resuming stream {broadcast.id} at {start} for {user_id}")
+    return sse_response(broadcast.frames(start), broadcast.id)
+
+def sse_response(frames, stream_id):
+    response = Response(stream_with_context(frames), mimetype='text/event-stream')
+    response.headers.update(SSE_HEADERS)
+    response.headers['X-Stream-Id'] = stream_id
+    return response
+
+@app.route('/stream/stats')
+def stream_stats():
+    return jsonify({
+        "agent": agent_handle.stats(),
+        "sessions": session_registry.stats(),
+        "streams": stream_hub.stats(),
+        "admission": admission.stats(),
+    })
 
-    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
-    response.headers['Content-Type'] = 'text/event-stream; charset=utf-8'
-    response.headers['Cache-Control'] = 'no-cache, no-transform'
-    response.headers['Connection'] = 'keep-alive'
+# --- BULK INGESTION ---
+@app.route('/ingest/bulk', methods=['POST'])
+def ingest_bulk():
+    """
+    NDJSON exception records in (read while still uploading), one NDJSON
+    result line per record out as they resolve, then a summary line.
+    """
+    user_id = authenticate(request.headers, request.args.get('user_id', 'bulk-ingest'))
+    if user_id is None:
+        return Response(json.dumps({"error": "Unauthorized.", "type": "AuthError"}), status=403, mimetype='application/json')
+
+    job = bulk_ingestor.start(request.stream, user_id)
+    response = Response(job.ndjson(), mimetype='application/x-ndjson')
+    response.headers['X-Job-Id'] = job.id
     response.headers['X-Accel-Buffering'] = 'no'
     return response
 
+@app.route('/ingest/bulk', methods=['GET'])
+def ingest_bulk_jobs():
+    return jsonify(bulk_ingestor.stats())
+
+@app.route('/ingest/bulk/<job_id>', methods=['GET'])
+def ingest_bulk_progress(job_id):
+    job = bulk_ingestor.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job.summary())
+
 @app.route('/health')
 def health():
     return jsonify({"status": "ok", "service": "scct-unified"})
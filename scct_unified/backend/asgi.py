@@ -0,0 +1,238 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+"""
+ASGI entry point for the unified backend (SERVER_MODE=asgi).
+
+/stream runs on the event loop, so an open agent stream costs a coroutine
+instead of a gunicorn thread and one instance can hold thousands of them.
+Every other route is the Flask app from app.py, mounted as WSGI. The /stream
+routes, headers and SSE framing are the same as in app.py.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route, request_response
+
+from app import (
+    SESSION_REUSE,
+    SINGLE_FLIGHT,
+    SSE_HEADERS,
+    STREAM_GONE,
+    admission,
+    agent_handle,
+    app as flask_app,
+    authenticate,
+    overloaded,
+    session_registry,
+    sse_event,
+    stream_hub,
+)
+from admission import AdmissionRejected, event_from_query, priority_of
+from stream_hub import parse_last_event_id, query_key
+
+logger = logging.getLogger(__name__)
+
+# Threads for blocking Agent Engine calls (session setup, and streams when the
+# SDK has no async_stream_query). Streams beyond this wait for a free thread.
+STREAM_EXECUTOR_THREADS = int(os.environ.get("STREAM_EXECUTOR_THREADS", 64))
+# Threads serving the mounted Flask routes
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", 16))
+
+executor = ThreadPoolExecutor(max_workers=STREAM_EXECUTOR_THREADS, thread_name_prefix="agent-stream")
+
+_DONE = object()
+# Running single-flight producers (tasks are only weakly referenced by the loop)
+producers = set()
+
+
+async def iterate_in_executor(iterator):
+    """Drives a blocking iterator from the event loop, one next() per executor job."""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next, iterator, _DONE)
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            try:
+                executor.submit(close)
+            except RuntimeError:
+                pass
+
+
+async def open_agent_stream(query, user_id, session_id):
+    """Async iterator of agent chunks, natively async when the SDK supports it."""
+    loop = asyncio.get_running_loop()
+    agent = await loop.run_in_executor(executor, agent_handle.get)
+    kwargs = {"message": query, "user_id": user_id}
+    if session_id:
+        kwargs["session_id"] = session_id
+    if hasattr(agent, "async_stream_query"):
+        return agent.async_stream_query(**kwargs)
+    response = await loop.run_in_executor(executor, lambda: iter(agent.stream_query(**kwargs)))
+    return iterate_in_executor(response)
+
+
+async def agent_frames(query, user_id, session_key):
+    """SSE frames of one agent run; async counterpart of app.agent_frames."""
+    logger.info(f"Stream starting for {user_id}")
+    loop = asyncio.get_running_loop()
+    # A reused session Agent Engine no longer accepts is dropped and the query retried once
+    for attempt in range(2):
+        session_id, reused, sent = None, False, False
+        try:
+            if SESSION_REUSE and session_key:
+                session_id, reused = await loop.run_in_executor(
+                    executor, session_registry.acquire, user_id, session_key
+                )
+            async for chunk in await open_agent_stream(query, user_id, session_id):
+                sent = True
+                try:
+                    yield sse_event(chunk)
+                except Exception as e:
+                    logger.error(f"Serialization error: {e}")
+            return
+
+        except Exception as e:
+            if reused and not sent and attempt == 0:
+                logger.warning(f"Session {session_id} rejected, starting a new one: {e}")
+                session_registry.forget(user_id, session_key, session_id)
+                continue
+            if not sent:
+                # The cached handle may be stale (e.g. agent redeployed)
+                agent_handle.invalidate()
+            logger.error(f"Agent Engine Error: {e}")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            return
+        finally:
+            if session_id:
+                session_registry.release(user_id, session_key, session_id)
+
+
+async def run_producer(broadcast, frames, ticket=None):
+    """Pumps one upstream agent run into its broadcast; runs to completion even if its requester leaves."""
+    try:
+        async for frame in frames:
+            broadcast.append(frame)
+    except Exception as e:
+        logger.error(f"Stream producer failed: {e}")
+        broadcast.append(sse_event({'error': str(e)}))
+    finally:
+        admission.release(ticket)
+        stream_hub.finish(broadcast)
+
+
+async def stream_agent_response(request):
+    if request.method != 'POST':
+        return Response("Method Not Allowed", status_code=405)
+    try:
+        data = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        data = None
+    if not data:
+        return Response("Invalid JSON payload", status_code=400)
+
+    query = data.get('query')
+    user_id = data.get('user_id', 'standard-user')
+    # Conversation identity (e.g. one per incident); without it the query gets a one-off session
+    session_key = data.get('session_key')
+
+    if not query:
+        return Response("Missing 'query' field", status_code=400)
+
+    logger.info(f"Received query: {query} (User: {user_id})")
+
+    user_id = authenticate(request.headers, user_id)
+    if user_id is None:
+        client = request.client.host if request.client else None
+        logger.warning(f"Unauthenticated API Access Attempt from {client}")
+        return Response(
+            json.dumps({"error": "Unauthorized.", "type": "AuthError"}),
+            status_code=403,
+            media_type='application/json',
+        )
+
+    # A client that lost its connection re-POSTs with the last id it saw
+    last_event_id = request.headers.get('Last-Event-ID') or data.get('last_event_id')
+    if last_event_id:
+        return resume_stream(last_event_id, user_id)
+
+    # The agent run is a producer feeding a broadcast, so it survives client
+    # reconnects; with SINGLE_FLIGHT, identical in-flight queries share it too
+    # (across callers only when the query is self-contained, see query_key)
+    broadcast, is_leader = stream_hub.join(query_key(query, user_id, session_key), share=SINGLE_FLIGHT)
+    if is_leader:
+        # Waits here (tier / severity order) while the instance is at capacity
+        try:
+            ticket = await admission.aacquire(*priority_of(event_from_query(query)))
+        except AdmissionRejected as e:
+            return to_starlette(overloaded(broadcast, e))
+        except asyncio.CancelledError:
+            stream_hub.finish(broadcast)
+            raise
+        task = asyncio.create_task(run_producer(broadcast, agent_frames(query, user_id, session_key), ticket))
+        producers.add(task)
+        task.add_done_callback(producers.discard)
+    else:
+        logger.info(f"Joined in-flight stream {broadcast.id} for {user_id}")
+    return sse_response(broadcast.aframes(), broadcast.id)
+
+
+async def resume_agent_stream(request):
+    """EventSource-style resume: replays a stream after the Last-Event-ID header (or from the start)."""
+    stream_id = request.path_params['stream_id']
+    user_id = authenticate(request.headers, 'standard-user')
+    if user_id is None:
+        return Response(json.dumps({"error": "Unauthorized.", "type": "AuthError"}), status_code=403, media_type='application/json')
+    last_event_id = request.headers.get('Last-Event-ID') or stream_id
+    if parse_last_event_id(last_event_id) and not last_event_id.startswith(f"{stream_id}:"):
+        return Response(json.dumps({"error": "Last-Event-ID belongs to another stream."}), status_code=400, media_type='application/json')
+    return resume_stream(last_event_id, user_id)
+
+
+def resume_stream(last_event_id, user_id):
+    resumed = stream_hub.resume(last_event_id)
+    if resumed is None:
+        logger.info(f"Cannot resume {last_event_id} for {user_id}")
+        return Response(STREAM_GONE, status_code=410, media_type='application/json')
+    broadcast, start = resumed
+    logger.info(f"Resuming stream {broadcast.id} at {start} for {user_id}")
+    return sse_response(broadcast.aframes(start), broadcast.id)
+
+
+def to_starlette(response):
+    """Starlette copy of a small (non-streaming) Flask response."""
+    return Response(response.get_data(), status_code=response.status_code, headers=dict(response.headers))
+
+
+def sse_response(frames, stream_id):
+    return StreamingResponse(frames, headers={**SSE_HEADERS, 'X-Stream-Id': stream_id})
+
+
+# CORS for /stream only; the Flask routes keep flask-cors
+stream_endpoint = CORSMiddleware(
+    request_response(stream_agent_response), allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
+)
+
+wsgi_app = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+app = Starlette(routes=[
+    Route('/stream', stream_endpoint),
+    Route('/stream/stats', wsgi_app),  # Flask route; listed so the resume route below doesn't shadow it
+    Route('/stream/{stream_id:str}', resume_agent_stream, methods=['GET']),
+    Mount('/', app=wsgi_app),
+])
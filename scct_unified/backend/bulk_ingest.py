@@ -0,0 +1,405 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+"""
+Bulk exception ingestion: NDJSON in, agent resolutions out.
+
+A job reads exception records (one JSON object per line, the same shape the
+UI sends as "Event Data") while they are still being uploaded. Each record is
+validated, then queued under its customer. With a coalescing window, events
+for the same shipment are first held and merged, so the agent runs once per
+shipment per window (see coalescing.py). Worker threads take records
+round-robin across customers, so one customer's burst cannot starve the
+others. Agent Engine calls are capped by a semaphore shared by every job on
+the instance, and then wait for an admission slot like /stream does (by tier
+and severity, but never rejected). Quota errors (429 / RESOURCE_EXHAUSTED)
+are retried with backoff. Results come back in completion order, one JSON
+line per record, followed by a summary line.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from admission import priority_of
+from coalescing import Coalescer, merge_events, shipment_key
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("id", "type", "description")
+MAX_RECORD_BYTES = 64 * 1024
+# Backoff for quota errors: base * 2^attempt seconds (plus jitter), capped
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 30.0
+
+_END = object()
+
+
+def validate_record(record):
+    """Returns an error message, or None if `record` can be dispatched."""
+    if not isinstance(record, dict):
+        return "record must be a JSON object"
+    missing = [field for field in REQUIRED_FIELDS if not record.get(field)]
+    if missing:
+        return f"missing field(s): {', '.join(missing)}"
+    customer = record.get("customer")
+    if not isinstance(customer, dict) or not (customer.get("id") or customer.get("name")):
+        return "customer must be an object with an id or name"
+    return None
+
+
+def customer_key(record):
+    customer = record.get("customer") or {}
+    return str(customer.get("id") or customer.get("name"))
+
+
+def exception_query(event):
+    """The agent prompt for one exception; same layout as runConnectedAgent in the UI."""
+    customer = event.get("customer") or {}
+    return (
+        "Handle this Supply Chain Exception:\n"
+        f"Event ID: {event.get('id')}\n"
+        f"Customer: {customer.get('name')} ({customer.get('tier')})\n"
+        f"Event Type: {event.get('type')}\n"
+        f"Description: {event.get('description')}\n"
+        f"Event Data: {json.dumps(event)}\n"
+    )
+
+
+def is_quota_error(error):
+    text = f"{type(error).__name__} {error}"
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "ResourceExhausted" in text or "TooManyRequests" in text
+
+
+def resolve_exception(agent, event, user_id):
+    """Runs the agent on one exception to completion. Returns the tools it called and its final text."""
+    actions, texts = [], []
+    for chunk in agent.stream_query(message=exception_query(event), user_id=user_id):
+        chunk = chunk.to_dict() if hasattr(chunk, "to_dict") else chunk
+        for part in (chunk.get("content") or {}).get("parts") or []:
+            if part.get("function_call"):
+                actions.append(part["function_call"].get("name"))
+            elif part.get("text"):
+                texts.append(part["text"])
+    return {"actions": actions, "response": texts[-1] if texts else ""}
+
+
+class FairQueue:
+    """
+    Per-customer FIFO queues of record groups, served round-robin. Size is
+    counted in records, not groups: `put()` blocks while adding the group
+    would exceed `max_items` (a group larger than that is still accepted
+    into an empty queue).
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._queues = OrderedDict()  # customer -> deque of groups
+        self._size = 0  # records in all queued groups
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._size
+
+    def put(self, customer, group):
+        with self._cond:
+            while self._size and self._size + len(group) > self.max_items:
+                self._cond.wait()
+            self._queues.setdefault(customer, deque()).append(group)
+            self._size += len(group)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self):
+        """Next group from the customer whose turn it is, or None once closed and drained."""
+        with self._cond:
+            while not self._queues and not self._closed:
+                self._cond.wait()
+            if not self._queues:
+                return None
+            customer, queue = next(iter(self._queues.items()))
+            group = queue.popleft()
+            # Customer goes to the back of the rotation (or leaves it when empty)
+            del self._queues[customer]
+            if queue:
+                self._queues[customer] = queue
+            self._size -= len(group)
+            self._cond.notify_all()
+            return group
+
+
+class BulkJob:
+    """One NDJSON upload: feeder thread, worker threads, result stream and progress counters."""
+
+    def __init__(self, ingestor, lines, user_id):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.ingestor = ingestor
+        self.started_at = time.time()
+        self.finished_at = None
+
+        self._lines = lines
+        self._queue = FairQueue(ingestor.max_queued)
+        self._results = deque()
+        self._results_cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._customers = {}  # customer -> {"received", "resolved", "failed", "coalesced"}
+        self._counts = {"received": 0, "invalid": 0, "in_flight": 0, "resolved": 0, "failed": 0, "coalesced": 0,
+                        "retries": 0}
+        self._reading = True
+        self._coalescer = None
+        if ingestor.coalesce_window > 0:
+            self._coalescer = Coalescer(
+                self._enqueue_group,
+                window=ingestor.coalesce_window,
+                max_wait=ingestor.coalesce_max_wait,
+                max_pending=ingestor.max_queued,
+            )
+
+    def start(self):
+        threading.Thread(target=self._feed, daemon=True, name=f"bulk-feed-{self.id[:8]}").start()
+        workers = [
+            threading.Thread(target=self._work, daemon=True, name=f"bulk-{self.id[:8]}-{n}")
+            for n in range(self.ingestor.job_concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        threading.Thread(target=self._finish_after, args=(workers,), daemon=True).start()
+        return self
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def _feed(self):
+        line_number = 0
+        try:
+            for raw in self._lines:
+                line_number += 1
+                line = raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw
+                if not line.strip():
+                    continue
+                if len(line) > MAX_RECORD_BYTES:
+                    self._reject(line_number, None, f"record exceeds {MAX_RECORD_BYTES} bytes")
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    self._reject(line_number, None, f"invalid JSON: {e.msg}")
+                    continue
+                error = validate_record(record)
+                if error:
+                    self._reject(line_number, record, error)
+                    continue
+                customer = customer_key(record)
+                with self._lock:
+                    self._counts["received"] += 1
+                    self._customer(customer)["received"] += 1
+                item = (line_number, customer, record)
+                shipment = shipment_key(record) if self._coalescer else None
+                if shipment:
+                    self._coalescer.add((customer, shipment), item)
+                else:
+                    self._queue.put(customer, [item])
+        except Exception as e:
+            logger.error(f"Bulk job {self.id} stopped reading input at line {line_number}: {e}")
+            self._emit({"line": line_number, "status": "invalid", "error": f"input aborted: {e}"})
+        finally:
+            self._reading = False
+            if self._coalescer:
+                # Nothing else can arrive for this upload: release the held groups now
+                self._coalescer.close()
+            self._queue.close()
+
+    def _enqueue_group(self, items):
+        self._queue.put(items[0][1], items)
+
+    def _reject(self, line_number, record, error):
+        with self._lock:
+            self._counts["invalid"] += 1
+        event_id = record.get("id") if isinstance(record, dict) else None
+        self._emit({"line": line_number, "event_id": event_id, "status": "invalid", "error": error})
+
+    def _work(self):
+        while True:
+            group = self._queue.get()
+            if group is None:
+                return
+            record = merge_events([r for _, _, r in group])
+            # The merged event stands for its latest report; the others are reported as coalesced into it
+            line_number, customer, _ = next(item for item in group if item[2].get("id") == record.get("id"))
+            with self._lock:
+                self._counts["in_flight"] += 1
+            start_time = time.time()
+            result, error, attempts = self.ingestor.dispatch(record, self.user_id)
+            with self._lock:
+                self._counts["in_flight"] -= 1
+                self._counts["retries"] += attempts - 1
+                status = "failed" if error else "resolved"
+                self._counts[status] += 1
+                self._customer(customer)[status] += 1
+                self._counts["coalesced"] += len(group) - 1
+                self._customer(customer)["coalesced"] += len(group) - 1
+            line = {
+                "line": line_number,
+                "event_id": record.get("id"),
+                "customer": customer,
+                "status": status,
+                "attempts": attempts,
+                "duration_ms": int((time.time() - start_time) * 1000),
+            }
+            if len(group) > 1:
+                line["coalesced_event_ids"] = record["coalesced_event_ids"]
+            if error:
+                line["error"] = error
+            else:
+                line.update(result)
+            self._emit(line)
+            for other_line, _, other in group:
+                if other_line != line_number:
+                    self._emit({
+                        "line": other_line,
+                        "event_id": other.get("id"),
+                        "customer": customer,
+                        "status": "coalesced",
+                        "coalesced_into": record.get("id"),
+                        "run_status": status,
+                    })
+
+    def _finish_after(self, workers):
+        for worker in workers:
+            worker.join()
+        self.finished_at = time.time()
+        logger.info(f"Bulk job {self.id} finished: {self.summary()}")
+        self._emit(_END)
+
+    def _customer(self, customer):
+        """Caller holds self._lock."""
+        return self._customers.setdefault(customer, {"received": 0, "resolved": 0, "failed": 0, "coalesced": 0})
+
+    def _emit(self, line):
+        with self._results_cond:
+            self._results.append(line)
+            self._results_cond.notify_all()
+
+    def results(self):
+        """Result lines as they complete, then the summary. Can be consumed once."""
+        while True:
+            with self._results_cond:
+                while not self._results:
+                    self._results_cond.wait()
+                line = self._results.popleft()
+            if line is _END:
+                yield {"summary": self.summary()}
+                return
+            yield line
+
+    def ndjson(self):
+        for line in self.results():
+            yield json.dumps(line) + "\n"
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self._counts)
+            customers = {customer: dict(c) for customer, c in self._customers.items()}
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        agent_runs = counts["resolved"] + counts["failed"]
+        completed = agent_runs + counts["coalesced"]
+        return {
+            "job_id": self.id,
+            "state": "done" if self.done else ("reading" if self._reading else "dispatching"),
+            **counts,
+            "queued": len(self._queue),
+            "completed": completed,
+            "agent_runs": agent_runs,
+            "elapsed_seconds": round(elapsed, 1),
+            "throughput_per_minute": round(completed * 60 / elapsed, 1) if elapsed > 0 else 0.0,
+            "customers": customers,
+        }
+
+
+class BulkIngestor:
+    """
+    Runs bulk jobs. `max_concurrency` Agent Engine calls run at once across
+    all jobs on the instance; each job uses up to `job_concurrency` workers
+    and queues up to `max_queued` validated records for dispatch before it
+    stops reading its upload. With an `admission` controller, every call also
+    takes one of its slots. A `coalesce_window` > 0 merges events per shipment
+    (debounce window and `coalesce_max_wait`, in seconds); up to `max_queued`
+    further records may then be held for merging, so a job buffers at most
+    twice `max_queued` records.
+    """
+
+    def __init__(self, agent_handle, admission=None, max_concurrency=8, job_concurrency=8, max_queued=1000,
+                 max_retries=3, retain_jobs=50, coalesce_window=0.0, coalesce_max_wait=30.0):
+        self.agent_handle = agent_handle
+        self.admission = admission
+        self.max_concurrency = max_concurrency
+        self.job_concurrency = job_concurrency
+        self.max_queued = max_queued
+        self.max_retries = max_retries
+        self.retain_jobs = retain_jobs
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_wait = coalesce_max_wait
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._jobs = OrderedDict()  # job id -> BulkJob, oldest first
+        self._lock = threading.Lock()
+        self._quota_errors = 0
+
+    def start(self, lines, user_id):
+        job = BulkJob(self, lines, user_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs beyond retention
+            for job_id, old in list(self._jobs.items()):
+                if len(self._jobs) <= self.retain_jobs:
+                    break
+                if old.done:
+                    del self._jobs[job_id]
+        logger.info(f"Bulk job {job.id} started for {user_id}")
+        return job.start()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def dispatch(self, record, user_id):
+        """Resolves one record, retrying quota errors. Returns (result, error, attempts)."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    ticket = self.admission.acquire(*priority_of(record), shed=False) if self.admission else None
+                    try:
+                        return resolve_exception(self.agent_handle.get(), record, user_id), None, attempt + 1
+                    finally:
+                        if ticket is not None:
+                            self.admission.release(ticket)
+            except Exception as e:
+                if is_quota_error(e) and attempt < self.max_retries:
+                    with self._lock:
+                        self._quota_errors += 1
+                    delay = min(RETRY_BASE_SECONDS * 2 ** attempt, RETRY_MAX_SECONDS)
+                    time.sleep(delay * random.uniform(0.5, 1.0))
+                    continue
+                logger.error(f"Bulk dispatch failed for {record.get('id')}: {e}")
+                return None, str(e), attempt + 1
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            quota_errors = self._quota_errors
+        return {
+            "max_concurrency": self.max_concurrency,
+            "quota_errors": quota_errors,
+            "jobs": [job.summary() for job in jobs],
+        }
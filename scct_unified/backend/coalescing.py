@@ -0,0 +1,138 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+"""
+Per-shipment coalescing of exception events.
+
+Carriers often report the same shipment several times within minutes (late,
+then weather, then an updated late). Each report would become its own agent
+run, and the runs could issue conflicting update_eta / request_reshipment
+calls. The Coalescer holds events per shipment id until none has arrived for
+`window` seconds (or the oldest has waited `max_wait`), then hands the whole
+group over at once. `merge_events()` turns a group into one enriched event
+for a single agent run.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+SEVERITY_ORDER = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+
+
+def shipment_key(record):
+    """Shipment id of an exception event, or None if it has none (it is not coalesced)."""
+    shipment = record.get("shipment")
+    if isinstance(shipment, dict) and shipment.get("id"):
+        return str(shipment["id"])
+    return None
+
+
+def merge_events(events):
+    """
+    One event standing for `events` (same shipment, in arrival order). The
+    latest report is the base; severity is the highest reported, and the
+    description lists the earlier reports so the agent sees the whole history.
+    """
+    if len(events) == 1:
+        return events[0]
+    ordered = sorted(events, key=lambda e: str(e.get("timestamp") or ""))  # stable: arrival order on ties
+    latest = ordered[-1]
+    merged = dict(latest)
+    severities = [str(e.get("severity") or "").upper() for e in ordered]
+    ranked = [s for s in severities if s in SEVERITY_ORDER]
+    if ranked:
+        merged["severity"] = max(ranked, key=SEVERITY_ORDER.index)
+    earlier = "; ".join(
+        f"[{e.get('timestamp') or 'earlier'}] {e.get('type')}: {e.get('description')}" for e in ordered[:-1]
+    )
+    merged["description"] = (
+        f"{latest.get('description')} (Consolidated from {len(ordered)} reports for this shipment. "
+        f"Earlier reports: {earlier}. Resolve once, based on the latest state.)"
+    )
+    merged["coalesced_event_ids"] = [e.get("id") for e in ordered]
+    merged["coalesced_types"] = [e.get("type") for e in ordered]
+    return merged
+
+
+class Coalescer:
+    """
+    Debounces items per key. `add(key, item)` holds the item; `flush(items)`
+    is called from a background thread with every item of a key once the key
+    has been quiet for `window` seconds or its first item has waited
+    `max_wait`. At most `max_pending` items are held, counting groups whose
+    `flush()` has not returned yet: when the limit is reached the oldest group
+    is flushed early and `add()` blocks until there is room again, so a slow
+    `flush()` pushes back on the caller. `close()` flushes everything still
+    held and stops the thread.
+    """
+
+    def __init__(self, flush, window=5.0, max_wait=30.0, max_pending=1000):
+        self.flush = flush
+        self.window = window
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+
+        self._groups = OrderedDict()  # key -> {"items", "first_at", "last_at"}, oldest first
+        self._held = 0      # items in self._groups
+        self._flushing = 0  # items handed to flush() that it has not returned from yet
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="coalescer")
+        self._thread.start()
+
+    def _full(self):
+        return self._held + self._flushing >= self.max_pending
+
+    def add(self, key, item):
+        with self._cond:
+            while self._full() and not self._closed:
+                self._cond.wait()
+            now = time.monotonic()
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = {"items": [], "first_at": now}
+            group["items"].append(item)
+            group["last_at"] = now
+            self._held += 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _due_at(self, group):
+        return min(group["last_at"] + self.window, group["first_at"] + self.max_wait)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [
+                        key for key, group in self._groups.items()
+                        if self._closed or self._due_at(group) <= now
+                    ]
+                    if not due and self._groups and self._full():
+                        # At capacity: make room by releasing the oldest group early
+                        due = [next(iter(self._groups))]
+                    if due or self._closed:
+                        break
+                    next_due = min((self._due_at(group) for group in self._groups.values()), default=None)
+                    self._cond.wait(None if next_due is None else next_due - now)
+                groups = [self._groups.pop(key)["items"] for key in due]
+                released = sum(len(items) for items in groups)
+                self._held -= released
+                self._flushing += released
+                closed = self._closed
+            for items in groups:
+                try:
+                    self.flush(items)
+                finally:
+                    with self._cond:
+                        self._flushing -= len(items)
+                        self._cond.notify_all()
+            if closed and not groups:
+                return
@@ -0,0 +1,235 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+"""
+Static asset layer for the built UI.
+
+`prepare()` writes the precompressed and resized variants next to the build
+output: `app.js.gz` / `app.js.br` for every compressible file, and a WebP
+copy of each logo (`logos/x.png` -> `logos/x.webp`), downscaled to
+`logo_max_px`. The Docker build runs it once; at startup it only fills in
+what is missing or stale.
+
+`StaticAssets` indexes the build once, so serving a file is a dict lookup
+(no filesystem probing per request). Each file gets a strong ETag from its
+content. Hashed Vite bundles (`assets/index-B1x2y3z4.js`) are cached as
+immutable; everything else (index.html, logos) is revalidated with the ETag.
+
+    python static_assets.py static templates/index.html
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import sys
+from collections import namedtuple
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # logos are served as built
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".ico", ".webmanifest"}
+# Smaller files are not worth a compressed variant
+COMPRESS_MIN_BYTES = 1024
+# Raster images under these directories get a WebP variant
+IMAGE_DIRS = ("logos",)
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+# Content-hashed file names emitted by Vite, e.g. assets/index-B1x2y3z4.js
+HASHED_NAME = re.compile(r"^assets/.+[-.][A-Za-z0-9_-]{8,}\.\w+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+Selection = namedtuple("Selection", "file_path content_type encoding etag cache_control vary")
+
+
+def _is_stale(source, target):
+    return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+
+def _write_variant(source, target, encode):
+    with open(source, "rb") as f:
+        data = encode(f.read())
+    tmp = f"{target}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, target)
+
+
+def _webp(source, target, max_px):
+    with Image.open(source) as image:
+        image.thumbnail((max_px, max_px))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        image.save(target, "WEBP", quality=85, method=6)
+
+
+def prepare(static_dir, index_file=None, logo_max_px=256):
+    """Writes missing or stale .gz/.br and WebP variants. Returns the number of files written."""
+    written = 0
+    for path in _walk(static_dir, index_file):
+        relative = os.path.relpath(path, static_dir).replace(os.sep, "/")
+        base, ext = os.path.splitext(path)
+        ext = ext.lower()
+        try:
+            if ext in COMPRESSIBLE_EXTENSIONS and os.path.getsize(path) >= COMPRESS_MIN_BYTES:
+                if _is_stale(path, path + ".gz"):
+                    _write_variant(path, path + ".gz", lambda data: gzip.compress(data, 9, mtime=0))
+                    written += 1
+                if brotli is not None and _is_stale(path, path + ".br"):
+                    _write_variant(path, path + ".br", lambda data: brotli.compress(data, quality=11))
+                    written += 1
+            elif (Image is not None and ext in IMAGE_EXTENSIONS
+                  and relative.split("/", 1)[0] in IMAGE_DIRS and _is_stale(path, base + ".webp")):
+                _webp(path, base + ".webp", logo_max_px)
+                written += 1
+        except Exception as e:
+            logger.warning(f"Could not prepare variants for {relative}: {e}")
+    if brotli is None:
+        logger.info("brotli not installed; serving gzip variants only")
+    if Image is None:
+        logger.info("Pillow not installed; logos are served without WebP variants")
+    return written
+
+
+def _walk(static_dir, index_file=None):
+    """Source files of the build (variants excluded), plus index_file."""
+    if os.path.isdir(static_dir):
+        for directory, _, files in os.walk(static_dir):
+            for name in files:
+                if not name.endswith((".gz", ".br", ".tmp")):
+                    yield os.path.join(directory, name)
+    if index_file and os.path.isfile(index_file):
+        yield index_file
+
+
+def _etag(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return f'"{digest.hexdigest()[:20]}"'
+
+
+def _accepted(header):
+    """Lower-cased tokens of an Accept / Accept-Encoding header, without q=0 entries."""
+    tokens = set()
+    for part in (header or "").lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if token and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            tokens.add(token.strip())
+    return tokens
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header matches `etag` (weak comparison, as RFC 9110 requires)."""
+    for candidate in (if_none_match or "").split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class StaticAssets:
+    """
+    In-memory index of the built UI: URL path -> file, content type, ETag and
+    the precompressed / WebP variants that exist on disk.
+    """
+
+    def __init__(self, static_dir, index_file=None, max_age=0):
+        self.static_dir = static_dir
+        self.max_age = max_age
+        self._files = {}
+        self._index = None
+
+        for path in _walk(static_dir):
+            relative = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            self._files[relative] = self._entry(path, relative)
+        if index_file and os.path.isfile(index_file):
+            self._index = self._entry(index_file, "index.html")
+        # Served in place of the original image when the client accepts WebP
+        for relative, entry in self._files.items():
+            base, ext = os.path.splitext(relative)
+            if ext.lower() in IMAGE_EXTENSIONS and base + ".webp" in self._files:
+                entry["webp"] = self._files[base + ".webp"]
+
+    def _entry(self, path, relative):
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+            content_type += "; charset=utf-8"
+        return {
+            "path": path,
+            "content_type": content_type,
+            "etag": _etag(path),
+            "immutable": bool(HASHED_NAME.match(relative)),
+            "encodings": {
+                encoding: (path + suffix, _etag(path + suffix))
+                for encoding, suffix in ENCODINGS
+                if os.path.isfile(path + suffix)
+            },
+            "webp": None,
+        }
+
+    @property
+    def has_index(self):
+        return self._index is not None
+
+    def resolve(self, url_path, accept_encoding="", accept=""):
+        """
+        Selection for `url_path`, negotiated against the request's
+        Accept-Encoding and Accept headers. An empty path means index.html.
+        Returns None for files that are not in the build.
+        """
+        entry = self._files.get(url_path) if url_path else self._index
+        if entry is None:
+            return None
+
+        vary = ["Accept-Encoding"] if entry["encodings"] else []
+        if entry["webp"] is not None:
+            vary.append("Accept")
+            if "image/webp" in _accepted(accept):
+                entry = entry["webp"]
+
+        if entry["immutable"]:
+            cache_control = IMMUTABLE
+        elif self.max_age and entry is not self._index:
+            cache_control = f"public, max-age={self.max_age}"
+        else:
+            cache_control = "no-cache"
+
+        encodings = _accepted(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in entry["encodings"] and encoding in encodings:
+                file_path, etag = entry["encodings"][encoding]
+                return Selection(file_path, entry["content_type"], encoding, etag, cache_control, ", ".join(vary))
+        return Selection(entry["path"], entry["content_type"], None, entry["etag"], cache_control, ", ".join(vary))
+
+    def stats(self):
+        return {
+            "files": len(self._files),
+            "immutable": sum(1 for entry in self._files.values() if entry["immutable"]),
+            "precompressed": sum(1 for entry in self._files.values() if entry["encodings"]),
+            "webp": sum(1 for entry in self._files.values() if entry["webp"] is not None),
+            "index": self.has_index,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        print("usage: python static_assets.py <static dir> [index.html]")
+        sys.exit(1)
+    count = prepare(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None,
+                    int(os.environ.get("STATIC_LOGO_MAX_PX", 256)))
+    print(f"Wrote {count} static asset variants")
@@ -0,0 +1,239 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+import uuid
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def parse_last_event_id(value):
+    """Splits a Last-Event-ID ("<stream id>:<seq>") into (stream_id, seq), or None if malformed."""
+    stream_id, _, seq = (value or "").strip().partition(":")
+    if not stream_id or not seq.isdigit():
+        return None
+    return stream_id, int(seq)
+
+
+def query_key(query, user_id=None, session_key=None):
+    """
+    Single-flight key: queries that differ only in case or whitespace share one
+    agent run. A self-contained query (an embedded "Event Data" payload)
+    carries everything the agent needs, so it is shared across callers
+    whatever their session key, e.g. two operators opening the same incident.
+    Anything else may be answered from the caller's conversation, so it is
+    only shared with the same user and session key.
+    """
+    normalized = _WHITESPACE.sub(" ", (query or "").strip().lower())
+    if "event data:" in normalized:
+        scope = ""
+    else:
+        scope = f"{user_id or ''}\x00{session_key or ''}"
+    return hashlib.sha256(f"{scope}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class Broadcast:
+    """
+    The SSE frames of one upstream agent stream, fanned out to any number of
+    subscribers.
+
+    The producer calls `append()` for every frame and `finish()` at the end.
+    Frames are numbered and kept (the newest `max_frames` of them), so a
+    subscriber that joins late, or reconnects with Last-Event-ID, first gets
+    the frames it has not seen and then the live tail. Each frame goes out
+    with an `id: <stream id>:<seq>` line. Subscribers can read from threads
+    (`frames()`) or from an event loop (`aframes()`); the producer may run
+    on either.
+    """
+
+    def __init__(self, key, max_frames=2000):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.max_frames = max_frames
+        self.created_at = time.time()
+        self.finished_at = None
+        self.subscribers = 0
+
+        self._frames = []
+        self._base = 0  # seq of self._frames[0]; older frames were dropped
+        self._done = False
+        self._cond = threading.Condition()
+        self._async_waiters = set()  # (loop, asyncio.Event)
+
+    @property
+    def done(self):
+        return self._done
+
+    def append(self, frame):
+        with self._cond:
+            self._frames.append(frame)
+            overflow = len(self._frames) - self.max_frames
+            if overflow > 0:
+                del self._frames[:overflow]
+                self._base += overflow
+            self._notify()
+
+    def can_resume(self, seq):
+        """True if every frame after `seq` is still buffered."""
+        with self._cond:
+            return self._base <= seq + 1 <= self._base + len(self._frames)
+
+    def finish(self):
+        with self._cond:
+            self._done = True
+            self.finished_at = time.time()
+            self._notify()
+
+    def frames(self, start=0):
+        """Blocking iterator over frames from seq `start`, then the live tail until finish()."""
+        seq = start
+        while True:
+            with self._cond:
+                while seq >= self._base + len(self._frames) and not self._done:
+                    self._cond.wait()
+                seq, pending = self._pending(seq)
+                done = self._done
+            for frame in pending:
+                yield f"id: {self.id}:{seq}\n{frame}"
+                seq += 1
+            if done and not pending:
+                return
+
+    async def aframes(self, start=0):
+        """Async iterator over frames from seq `start`, then the live tail until finish()."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            self._async_waiters.add(waiter)
+        seq = start
+        try:
+            while True:
+                waiter[1].clear()
+                with self._cond:
+                    seq, pending = self._pending(seq)
+                    done = self._done
+                for frame in pending:
+                    yield f"id: {self.id}:{seq}\n{frame}"
+                    seq += 1
+                if pending:
+                    continue
+                if done:
+                    return
+                await waiter[1].wait()
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+    def _pending(self, seq):
+        """Caller holds self._cond. Returns (first seq, frames) still buffered from `seq` on."""
+        seq = max(seq, self._base)
+        return seq, self._frames[seq - self._base:]
+
+    def _notify(self):
+        """Caller holds self._cond."""
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+
+class StreamHub:
+    """
+    Registry of agent streams, for single-flight sharing and for resuming.
+
+    `join(key)` returns the running Broadcast for `key` if there is one, so
+    identical concurrent queries share one Agent Engine execution (and one
+    set of tool calls). Otherwise it registers a new Broadcast and tells the
+    caller to start the producer, which must call `finish(broadcast)`.
+
+    Broadcasts stay reachable by id (`resume()`) while running and for
+    `retain_seconds` after they finish, up to `max_streams` in total, so a
+    client that lost its connection can pick up where it left off.
+    """
+
+    def __init__(self, retain_seconds=300.0, max_streams=500, max_frames=2000):
+        self.retain_seconds = retain_seconds
+        self.max_streams = max_streams
+        self.max_frames = max_frames
+
+        self._inflight = {}  # key -> running Broadcast
+        self._by_id = {}     # stream id -> Broadcast (running or retained), oldest first
+        self._lock = threading.Lock()
+        self._started = 0
+        self._joined = 0
+        self._resumed = 0
+        self._resume_misses = 0
+
+    def join(self, key, share=True):
+        """Returns (broadcast, is_leader). With share=False every call starts a new run."""
+        with self._lock:
+            self._sweep()
+            broadcast = self._inflight.get(key) if share else None
+            if broadcast is not None and not broadcast.done:
+                broadcast.subscribers += 1
+                self._joined += 1
+                return broadcast, False
+            broadcast = Broadcast(key, max_frames=self.max_frames)
+            broadcast.subscribers = 1
+            if share:
+                self._inflight[key] = broadcast
+            self._by_id[broadcast.id] = broadcast
+            self._started += 1
+            return broadcast, True
+
+    def resume(self, last_event_id):
+        """
+        Returns (broadcast, next seq) for a Last-Event-ID, or None if the
+        stream is unknown, expired, or no longer holds every frame after it.
+        A bare stream id (no seq) resumes from the first frame.
+        """
+        parsed = parse_last_event_id(last_event_id)
+        if parsed is None and last_event_id and ":" not in last_event_id:
+            parsed = (last_event_id.strip(), -1)
+        with self._lock:
+            self._sweep()
+            broadcast = self._by_id.get(parsed[0]) if parsed else None
+            if broadcast is None or not broadcast.can_resume(parsed[1]):
+                self._resume_misses += 1
+                return None
+            broadcast.subscribers += 1
+            self._resumed += 1
+            return broadcast, parsed[1] + 1
+
+    def finish(self, broadcast):
+        broadcast.finish()
+        with self._lock:
+            if self._inflight.get(broadcast.key) is broadcast:
+                del self._inflight[broadcast.key]
+
+    def stats(self):
+        with self._lock:
+            requests = self._started + self._joined
+            return {
+                "in_flight": sum(1 for b in self._by_id.values() if not b.done),
+                "retained": len(self._by_id),
+                "upstream_runs": self._started,
+                "joined": self._joined,
+                "dedup_rate": round(self._joined / requests, 4) if requests else 0.0,
+                "resumed": self._resumed,
+                "resume_misses": self._resume_misses,
+            }
+
+    def _sweep(self):
+        """Caller holds self._lock. Drops finished streams past retention, then the oldest beyond max_streams."""
+        now = time.time()
+        for stream_id, broadcast in list(self._by_id.items()):
+            if broadcast.done and now - broadcast.finished_at > self.retain_seconds:
+                del self._by_id[stream_id]
+        excess = len(self._by_id) - self.max_streams
+        for stream_id, broadcast in list(self._by_id.items()):
+            if excess <= 0:
+                break
+            if broadcast.done:
+                del self._by_id[stream_id]
+                excess -= 1
@@ -126,13 +126,19 @@ const formatToolName = (name: string): string => {
   return name.split('_').map(w => w.charAt(0).toUpperCase() + w.slice(1)).join(' ');
 };
 
+// Identifies this browser tab, so session keys from different users never collide
+const CLIENT_ID = `ui-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+
 /**
  * Calls the REAL Vertex AI Agent (Reasoning Engine) via Streaming (Unified Backend)
+ * Queries with the same sessionKey continue one agent session; an event defaults
+ * to one session per incident, free text without a key gets a one-off session.
  */
 export const runConnectedAgent = async (
   input: string | ExceptionEvent,
   config: VertexAgentConfig,
-  onLog?: (msg: string) => void
+  onLog?: (msg: string) => void,
+  sessionKey?: string
 ): Promise<ResolutionResult> => {
   // Convert input to string if it's an event object
   const textInput = typeof input === 'string' ? input : `
@@ -158,10 +164,14 @@ export const runConnectedAgent = async (
   }
 
   // Simplified Payload for Unified Backend
-  const payload = {
+  const payload: Record<string, string> = {
     query: textInput,
     user_id: `ui-user-${Date.now()}`
   };
+  const conversation = sessionKey ?? (typeof input === 'string' ? undefined : `incident-${input.id}`);
+  if (conversation) {
+    payload.session_key = `${CLIENT_ID}:${conversation}`;
+  }
 
   // Get Auth Token
   const token = await getAuthToken();
@@ -189,10 +199,15 @@ export const runConnectedAgent = async (
 
     // Connection established. Reading stream...
 
-    const reader = response.body?.getReader();
+    let reader = response.body?.getReader();
     const decoder = new TextDecoder();
 
     let streamBuffer = ""; // Buffer for split lines across chunks
+    // Resume support: the backend tags every SSE frame with "id: <stream>:<seq>"
+    let pendingEventId = "";
+    let lastEventId = "";
+    let reconnects = 0;
+    const MAX_RECONNECTS = 3;
     let action = "AGENT_ACTION";
     let toolUsed = undefined;
     let fullReasoning = "";
@@ -201,7 +216,27 @@ export const runConnectedAgent = async (
 
     if (reader) {
       while (true) {
-        const { done, value } = await reader.read();
+        let readResult;
+        try {
+          readResult = await reader.read();
+        } catch (readError) {
+          // Connection dropped mid-stream: resume after the last complete frame
+          // instead of re-running the agent
+          if (!lastEventId || reconnects >= MAX_RECONNECTS) throw readError;
+          reconnects++;
+          if (onLog) onLog(`📶 Connection lost. Resuming stream (attempt ${reconnects}/${MAX_RECONNECTS})...`);
+          await new Promise(resolve => setTimeout(resolve, 1000 * reconnects));
+          const resumed = await fetch(endpoint, {
+            method: 'POST',
+            headers: { ...headers, 'Last-Event-ID': lastEventId },
+            body: JSON.stringify(payload)
+          });
+          if (!resumed.ok || !resumed.body) throw readError;
+          reader = resumed.body.getReader();
+          streamBuffer = "";
+          continue;
+        }
+        const { done, value } = readResult;
 
         // Process any final data in buffer on done
         if (done) {
@@ -230,9 +265,16 @@ export const runConnectedAgent = async (
           const trimmedLine = line.trim();
           if (!trimmedLine) continue;
 
+          if (trimmedLine.startsWith('id:')) {
+            pendingEventId = trimmedLine.substring(3).trim();
+            continue;
+          }
+
           let jsonStr = trimmedLine;
           if (trimmedLine.startsWith('data: ')) {
             jsonStr = trimmedLine.substring(6).trim();
+            // This frame is now complete, so a resume can start after it
+            lastEventId = pendingEventId || lastEventId;
           }
 
           try {
@@ -0,0 +1,140 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+"""
+Budgeted compaction of tool results before they are returned to the agent.
+
+Tool outputs are re-sent to the model on every turn of the agent loop, so a
+caller can ask for a size budget with `max_tokens` or `max_chars` in the
+request body. Long text fields are split into sentences; near-identical
+sentences (across all results) are dropped, and the sentences that best
+match the query are kept, in their original order, until the budget is
+spent. Every compacted response carries a `compaction` block describing
+what was removed.
+"""
+import json
+import re
+
+from kb_index import tokenize
+
+# Rough characters-per-token ratio (matches the agent's prompt token estimate)
+CHARS_PER_TOKEN = 4
+# Word-set Jaccard similarity at which two sentences count as duplicates
+DUPLICATE_SIMILARITY = 0.8
+# Shortest budget a caller can ask for, in characters
+MIN_BUDGET_CHARS = 200
+ELLIPSIS = " … "
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*|\s*\.\.\.\s*")
+
+
+def parse_budget(data, default_max_tokens=0):
+    """
+    Character budget requested in a tool call body, or None for no compaction.
+
+    `max_chars` wins over `max_tokens`; `"compact": true` without either uses
+    `default_max_tokens`. Raises ValueError for non-integer or negative values.
+    """
+    if data.get("max_chars") is not None:
+        max_chars = int(data["max_chars"])
+    elif data.get("max_tokens") is not None:
+        max_chars = int(data["max_tokens"]) * CHARS_PER_TOKEN
+    elif data.get("compact") and default_max_tokens:
+        max_chars = int(default_max_tokens) * CHARS_PER_TOKEN
+    else:
+        return None
+    if max_chars < 0:
+        raise ValueError("max_chars / max_tokens must not be negative")
+    return max(max_chars, MIN_BUDGET_CHARS)
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_BREAK.split(text or "") if s and s.strip()]
+
+
+def _json_len(text):
+    """Length of `text` once JSON-encoded (non-ASCII characters are escaped)."""
+    return len(json.dumps(text)) - 2
+
+
+def _similar(a, b):
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= DUPLICATE_SIMILARITY
+
+
+def compact_results(results, query, max_chars, text_field):
+    """
+    Shrinks `results` (a list of dicts) to about `max_chars` of JSON by
+    compacting each item's `text_field`. Returns (results, metadata).
+    """
+    original_chars = len(json.dumps(results))
+    query_terms = set(tokenize(query or ""))
+
+    # 1. Sentences per item, scored by query overlap; near-duplicates dropped
+    items = []
+    seen = []
+    duplicates = 0
+    for index, result in enumerate(results):
+        sentences = []
+        for position, sentence in enumerate(split_sentences(result.get(text_field, ""))):
+            words = set(tokenize(sentence))
+            if any(_similar(words, other) for other in seen):
+                duplicates += 1
+                continue
+            seen.append(words)
+            # Query matches first; earlier sentences break ties
+            score = len(words & query_terms) + 1.0 / (position + 2)
+            sentences.append({"index": index, "position": position, "text": sentence, "score": score})
+        # Fixed fields, plus room for the "truncated" flag
+        overhead = len(json.dumps(dict(result, **{text_field: "", "truncated": True})))
+        items.append({"result": result, "sentences": sentences, "overhead": overhead, "kept": []})
+
+    # 2. Items in rank order while their fixed fields fit; each gets its best sentence first
+    remaining = max_chars - 2
+    included = []
+    for item in items:
+        if item["overhead"] + 2 > remaining:
+            break
+        remaining -= item["overhead"] + 2
+        included.append(item)
+
+    for item in included:
+        if item["sentences"]:
+            best = max(item["sentences"], key=lambda s: s["score"])
+            cost = _json_len(best["text"])
+            if cost <= remaining:
+                item["kept"].append(best)
+                remaining -= cost
+
+    # 3. Fill the rest of the budget with the highest-scoring sentences overall
+    candidates = [s for item in included for s in item["sentences"] if s not in item["kept"]]
+    for sentence in sorted(candidates, key=lambda s: s["score"], reverse=True):
+        cost = _json_len(ELLIPSIS + sentence["text"])
+        if cost <= remaining:
+            items[sentence["index"]]["kept"].append(sentence)
+            remaining -= cost
+
+    compacted = []
+    sentences_dropped = 0
+    for item in included:
+        kept = sorted(item["kept"], key=lambda s: s["position"])
+        sentences_dropped += len(item["sentences"]) - len(kept)
+        result = dict(item["result"])
+        result[text_field] = ELLIPSIS.join(s["text"] for s in kept)
+        if len(kept) < len(item["sentences"]):
+            result["truncated"] = True
+        compacted.append(result)
+
+    returned_chars = len(json.dumps(compacted))
+    metadata = {
+        "budget_chars": max_chars,
+        "original_chars": original_chars,
+        "returned_chars": returned_chars,
+        "original_tokens_est": original_chars // CHARS_PER_TOKEN,
+        "returned_tokens_est": returned_chars // CHARS_PER_TOKEN,
+        "duplicates_removed": duplicates,
+        "sentences_dropped": sentences_dropped,
+        "results_dropped": len(results) - len(compacted),
+        "truncated": duplicates > 0 or sentences_dropped > 0 or len(compacted) < len(results),
+    }
+    return compacted, metadata
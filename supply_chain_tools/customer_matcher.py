@@ -0,0 +1,90 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CUSTOMERS = ["HealthPlus", "TechGiant", "Global Mart", "Global Retail", "FreshMarket", "Detroit Motors", "MediLife"]
+
+
+def _trie_pattern(names):
+    """
+    Builds a regex whose alternation is shaped like a trie of `names`, so
+    names sharing a prefix share a branch and the regex engine never tries
+    more than one alternative per character. Longer names win over their
+    prefixes ("global mart" before "global").
+    """
+    trie = {}
+    for name in names:
+        node = trie
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        terminal = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if terminal else body
+
+    return build(trie)
+
+
+class CustomerMatcher:
+    """
+    Finds every registered customer name in a text in a single regex pass.
+
+    Matching is case-insensitive and on word boundaries, so "Ford" does not
+    match "affordable". Compile once at startup and share across requests.
+    """
+
+    def __init__(self, names):
+        self.canonical = {}
+        for name in names:
+            key = name.strip().lower()
+            if key:
+                self.canonical.setdefault(key, name.strip())
+        if self.canonical:
+            body = _trie_pattern(sorted(self.canonical))
+            self._pattern = re.compile(rf"(?<![a-z0-9])(?:{body})(?![a-z0-9])")
+        else:
+            self._pattern = None
+
+    def __len__(self):
+        return len(self.canonical)
+
+    @classmethod
+    def from_file(cls, path):
+        """Loads a registry file: a JSON list of names, or one name per line."""
+        with open(path, encoding="utf-8") as handle:
+            text = handle.read()
+        if path.lower().endswith(".json"):
+            names = json.loads(text)
+        else:
+            names = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+        logger.info(f"Loaded {len(names)} customer name(s) from {path}")
+        return cls(names)
+
+    def find_all(self, text):
+        """Returns the set of canonical customer names that appear in `text`."""
+        if not self._pattern or not text:
+            return set()
+        return {self.canonical[m.group(0)] for m in self._pattern.finditer(text.lower())}
+
+    def detect(self, text):
+        """Returns the first customer mentioned in `text`, or None."""
+        if not self._pattern or not text:
+            return None
+        match = self._pattern.search(text.lower())
+        return self.canonical[match.group(0)] if match else None
+
+    def mentions_other(self, text, customer):
+        """True if `text` names any registered customer other than `customer`."""
+        own = (customer or "").lower()
+        if not self._pattern or not text:
+            return False
+        return any(m.group(0) != own for m in self._pattern.finditer(text.lower()))
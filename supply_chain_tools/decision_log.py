@@ -0,0 +1,266 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DecisionLogWriter:
+    """
+    Background writer for the agent decision trail.
+
+    Tool routes enqueue rows and return immediately; a single daemon thread
+    groups them into batches and flushes each batch with one
+    insert_rows_json call. A batch is flushed when it reaches
+    `max_batch_size` rows or when `flush_interval` seconds have passed since
+    its first row was queued, whichever comes first.
+
+    If a `spool` is given, batches that fail with a transport error are
+    written to it instead of being dropped, and replayed in order (with
+    exponential backoff between attempts) once BigQuery is reachable again.
+    While the spool holds a backlog, new batches are appended behind it so
+    rows reach the table in the order they were logged.
+
+    Rows queued together with `enqueue_batch()` stay together: they are
+    written in the same insert (split only if they exceed `max_batch_size`).
+    """
+
+    def __init__(self, client, table_id, max_batch_size=500, flush_interval=1.0, max_queue_size=10000,
+                 spool=None, replay_interval=5.0, max_replay_interval=300.0):
+        self.client = client
+        self.table_id = table_id
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.spool = spool
+        self.replay_interval = replay_interval
+        self.max_replay_interval = max_replay_interval
+        self._replay_backoff = replay_interval
+        self._next_replay_at = 0.0
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self._rows_enqueued = 0
+        self._rows_written = 0
+        self._rows_failed = 0
+        self._rows_dropped = 0
+        self._rows_spooled = 0
+        self._batches_flushed = 0
+        self._last_flush_latency_ms = 0.0
+        self._max_flush_latency_ms = 0.0
+        self._total_flush_latency_ms = 0.0
+
+    def start(self):
+        """Starts the flush thread once per process (safe to call repeatedly)."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="decision-log-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, row):
+        """
+        Queues a single row for insertion. Never blocks the caller.
+        Returns False if the queue is full and the row was dropped.
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self._rows_dropped += 1
+            logger.warning(f"Decision log queue full ({self._queue.maxsize}). Dropping row {row.get('log_id')}")
+            return False
+        with self._stats_lock:
+            self._rows_enqueued += 1
+        return True
+
+    def enqueue_batch(self, rows):
+        """
+        Queues `rows` as one unit, so they are flushed in the same insert.
+        Never blocks the caller. Returns False if the queue is full and the
+        rows were dropped.
+        """
+        if not rows:
+            return True
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(list(rows))
+        except queue.Full:
+            with self._stats_lock:
+                self._rows_dropped += len(rows)
+            logger.warning(f"Decision log queue full ({self._queue.maxsize}). Dropping batch of {len(rows)} rows")
+            return False
+        with self._stats_lock:
+            self._rows_enqueued += len(rows)
+        return True
+
+    def close(self, timeout=10.0):
+        """Stops the flush thread and drains whatever is still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Anything left (e.g. thread never started or join timed out) is flushed inline
+        while True:
+            remaining = self._drain(self.max_batch_size)
+            if not remaining:
+                break
+            self._flush_chunks(remaining)
+        if self.spool is not None:
+            self.spool.close()
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches_flushed
+            stats = {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "rows_enqueued": self._rows_enqueued,
+                "rows_written": self._rows_written,
+                "rows_failed": self._rows_failed,
+                "rows_dropped": self._rows_dropped,
+                "rows_spooled": self._rows_spooled,
+                "batches_flushed": batches,
+                "last_flush_latency_ms": round(self._last_flush_latency_ms, 2),
+                "max_flush_latency_ms": round(self._max_flush_latency_ms, 2),
+                "avg_flush_latency_ms": round(self._total_flush_latency_ms / batches, 2) if batches else 0.0,
+            }
+        if self.spool is not None:
+            stats["spool"] = self.spool.stats()
+        return stats
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                _extend(rows, self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._maybe_replay()
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = _extend([], first)
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    break
+                try:
+                    _extend(batch, self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush_chunks(batch)
+
+        # Drain on shutdown
+        while True:
+            batch = self._drain(self.max_batch_size)
+            if not batch:
+                break
+            self._flush_chunks(batch)
+
+    def _flush_chunks(self, rows):
+        """A batch group can push `rows` past max_batch_size; flush it in chunks of at most that."""
+        for start in range(0, len(rows), self.max_batch_size):
+            self._flush(rows[start:start + self.max_batch_size])
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        if self.spool is not None and self.spool.has_pending():
+            # Keep ordering: queue behind the backlog and try to clear it
+            self._spool(rows)
+            self._maybe_replay()
+            return
+
+        start_time = time.monotonic()
+        try:
+            errors = self.client.insert_rows_json(self.table_id, rows)
+        except Exception as bq_error:
+            errors = None
+            logger.warning(f"BigQuery Insert Failed for batch of {len(rows)}: {bq_error}")
+        latency_ms = (time.monotonic() - start_time) * 1000
+
+        if errors == []:
+            failed = 0
+            logger.info(f"Flushed {len(rows)} decision log rows to BigQuery in {latency_ms:.0f}ms.")
+        elif errors is None:
+            failed = len(rows)
+        else:
+            failed = len(errors)
+            logger.error(f"Encountered errors while inserting rows: {errors}")
+
+        with self._stats_lock:
+            self._batches_flushed += 1
+            self._last_flush_latency_ms = latency_ms
+            self._max_flush_latency_ms = max(self._max_flush_latency_ms, latency_ms)
+            self._total_flush_latency_ms += latency_ms
+            if errors is not None or self.spool is None:
+                self._rows_written += len(rows) - failed
+                self._rows_failed += failed
+
+        if errors is None and self.spool is not None:
+            self._spool(rows)
+            self._schedule_replay(failed=True)
+
+    def _spool(self, rows):
+        accepted = self.spool.append(rows)
+        with self._stats_lock:
+            self._rows_spooled += accepted
+            self._rows_dropped += len(rows) - accepted
+
+    def _insert_or_raise(self, rows):
+        """Insert used for spool replay: transport errors propagate so replay stops in place."""
+        errors = self.client.insert_rows_json(self.table_id, rows)
+        with self._stats_lock:
+            self._rows_written += len(rows) - len(errors)
+            self._rows_failed += len(errors)
+        if errors:
+            # Row-level errors (bad schema/values) will never succeed on retry
+            logger.error(f"Encountered errors while replaying spooled rows: {errors}")
+
+    def _schedule_replay(self, failed):
+        if failed:
+            self._next_replay_at = time.monotonic() + self._replay_backoff
+            self._replay_backoff = min(self._replay_backoff * 2, self.max_replay_interval)
+        else:
+            self._replay_backoff = self.replay_interval
+            self._next_replay_at = 0.0
+
+    def _maybe_replay(self):
+        if self.spool is None or time.monotonic() < self._next_replay_at:
+            return
+        if not self.spool.has_pending():
+            return
+        try:
+            replayed = self.spool.replay(self._insert_or_raise, batch_size=self.max_batch_size)
+            if replayed:
+                logger.info(f"Replayed {replayed} spooled decision log rows to BigQuery.")
+            self._schedule_replay(failed=False)
+        except Exception as bq_error:
+            logger.warning(f"Decision log spool replay deferred: {bq_error}")
+            self._schedule_replay(failed=True)
+
+
+def _extend(rows, item):
+    """Appends a queued item (one row, or a list of rows from enqueue_batch) to `rows`."""
+    if isinstance(item, list):
+        rows.extend(item)
+    else:
+        rows.append(item)
+    return rows
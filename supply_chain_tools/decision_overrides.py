@@ -0,0 +1,65 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+import threading
+from collections import OrderedDict
+
+# Agent actions a human is expected to follow up on, so a different human action is not an override
+HANDOFF_ACTIONS = frozenset({"escalate_to_human"})
+
+
+class OverrideTracker:
+    """
+    Counts how often agent decisions are later overridden by a human.
+
+    Every agent action logged by this service is remembered per event id
+    together with the resolution path that produced it (`llm`, `fast_path`,
+    `cache`, from the tool call's metadata). When `resolve_human_task` closes
+    the same event with a different action, the decision counts as
+    overridden for its path. Only the most recent `max_events` events are
+    remembered, and counts are per instance.
+    """
+
+    def __init__(self, max_events=10000):
+        self.max_events = max_events
+        self._decisions = OrderedDict()  # event id -> (resolution path, action)
+        self._paths = {}                 # resolution path -> counters
+        self._lock = threading.Lock()
+
+    def record_decision(self, event_id, action, resolution_path):
+        if not event_id or not action:
+            return
+        path = resolution_path or "llm"
+        with self._lock:
+            self._decisions[event_id] = (path, action)
+            self._decisions.move_to_end(event_id)
+            while len(self._decisions) > self.max_events:
+                self._decisions.popitem(last=False)
+            self._counters(path)["decisions"] += 1
+
+    def record_human_resolution(self, event_id, action):
+        """Returns True if `action` overrides the agent's decision for `event_id`."""
+        with self._lock:
+            decision = self._decisions.get(event_id)
+            if decision is None:
+                return False
+            path, agent_action = decision
+            counters = self._counters(path)
+            counters["reviewed"] += 1
+            overridden = agent_action not in HANDOFF_ACTIONS and action != agent_action
+            if overridden:
+                counters["overridden"] += 1
+            return overridden
+
+    def stats(self):
+        with self._lock:
+            return {
+                path: dict(
+                    counters,
+                    override_rate=round(counters["overridden"] / counters["decisions"], 4) if counters["decisions"] else 0.0,
+                )
+                for path, counters in self._paths.items()
+            }
+
+    def _counters(self, path):
+        """Caller holds self._lock."""
+        return self._paths.setdefault(path, {"decisions": 0, "reviewed": 0, "overridden": 0})
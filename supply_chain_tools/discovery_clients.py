@@ -0,0 +1,148 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+import itertools
+import logging
+import os
+import threading
+import time
+
+import google.auth
+import grpc
+from google.cloud import discoveryengine
+from google.cloud.discoveryengine_v1.services.document_service.transports import DocumentServiceGrpcTransport
+from google.cloud.discoveryengine_v1.services.search_service.transports import SearchServiceGrpcTransport
+
+logger = logging.getLogger(__name__)
+
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+
+class DiscoveryClientPool:
+    """
+    Long-lived Discovery Engine clients shared by every request in a worker.
+
+    Credentials are resolved once and reused by every channel. Search traffic
+    is spread round-robin over `pool_size` SearchServiceClients, each on its
+    own gRPC channel (a local subchannel pool forces separate connections, so
+    concurrent searches are not multiplexed onto a single HTTP/2 stream limit).
+    Document admin calls are rare and share one DocumentServiceClient.
+
+    Clients are created lazily and rebuilt if the process forks, so the pool
+    is safe to construct at import time under gunicorn.
+    """
+
+    def __init__(self, project_id, data_store_id, location="global", pool_size=2):
+        self.project_id = project_id
+        self.data_store_id = data_store_id
+        self.location = location
+        self.pool_size = max(1, pool_size)
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._search_clients = []
+        self._search_cycle = None
+        self._document_client = None
+        self._serving_config = None
+        self._branch = None
+        self._warmed_up = False
+        self._warmup_ms = None
+
+    # --- PUBLIC API ---
+
+    def search_client(self):
+        self._ensure_built()
+        with self._lock:
+            return next(self._search_cycle)
+
+    def document_client(self):
+        self._ensure_built()
+        return self._document_client
+
+    @property
+    def serving_config(self):
+        self._ensure_built()
+        return self._serving_config
+
+    @property
+    def branch(self):
+        self._ensure_built()
+        return self._branch
+
+    def warm_up(self, timeout=5.0):
+        """
+        Builds the clients, resolves resource paths and waits for every gRPC
+        channel to connect, so the first request does not pay for it.
+        Failures are logged; requests will still connect lazily.
+        """
+        start_time = time.time()
+        try:
+            self._ensure_built()
+            transports = [c.transport for c in self._search_clients] + [self._document_client.transport]
+            for transport in transports:
+                grpc.channel_ready_future(transport.grpc_channel).result(timeout=timeout)
+            self._warmed_up = True
+            self._warmup_ms = int((time.time() - start_time) * 1000)
+            logger.info(f"Discovery Engine pool warmed up: {len(transports)} channel(s) in {self._warmup_ms}ms")
+        except Exception as e:
+            logger.warning(f"Discovery Engine warm-up incomplete: {e}")
+
+    def stats(self):
+        return {
+            "pool_size": self.pool_size,
+            "built": self._pid == os.getpid(),
+            "warmed_up": self._warmed_up,
+            "warmup_ms": self._warmup_ms,
+            "serving_config": self._serving_config,
+        }
+
+    # --- INTERNALS ---
+
+    def _ensure_built(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            credentials, _ = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])
+
+            self._search_clients = []
+            for _ in range(self.pool_size):
+                channel = SearchServiceGrpcTransport.create_channel(
+                    credentials=credentials,
+                    options=self._channel_options(),
+                )
+                transport = SearchServiceGrpcTransport(channel=channel)
+                self._search_clients.append(discoveryengine.SearchServiceClient(transport=transport))
+            self._search_cycle = itertools.cycle(self._search_clients)
+
+            channel = DocumentServiceGrpcTransport.create_channel(
+                credentials=credentials,
+                options=self._channel_options(),
+            )
+            self._document_client = discoveryengine.DocumentServiceClient(
+                transport=DocumentServiceGrpcTransport(channel=channel)
+            )
+
+            self._serving_config = self._search_clients[0].serving_config_path(
+                project=self.project_id,
+                location=self.location,
+                data_store=self.data_store_id,
+                serving_config="default_search",
+            )
+            self._branch = self._document_client.branch_path(
+                project=self.project_id,
+                location=self.location,
+                data_store=self.data_store_id,
+                branch="default_branch",
+            )
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _channel_options():
+        return [
+            ("grpc.max_send_message_length", -1),
+            ("grpc.max_receive_message_length", -1),
+            ("grpc.use_local_subchannel_pool", 1),
+            ("grpc.keepalive_time_ms", 30000),
+        ]
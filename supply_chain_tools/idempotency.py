@@ -0,0 +1,123 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Outcomes of IdempotencyStore.claim()
+OWNER = "owner"              # first request with this key: run it, then complete() or abandon()
+REPLAY = "replay"            # already completed: answer with the stored response
+CONFLICT = "conflict"        # key reused with a different request body
+IN_PROGRESS = "in_progress"  # still running after wait_timeout
+
+
+def fingerprint(body):
+    return hashlib.sha256(body or b"").hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Completed responses of side-effecting routes, keyed by Idempotency-Key.
+
+    The first request with a key claims it and runs; its response is stored
+    for `ttl_seconds` (at most `max_entries`, oldest evicted first), and
+    repeats are answered from the store without running again. A repeat that
+    arrives while the first request is still running waits up to
+    `wait_timeout` seconds for its response. If the first request fails
+    (exception or 5xx) the key is released, so a retry runs for real. A key
+    reused with a different body is a conflict. Entries are per process.
+    """
+
+    def __init__(self, ttl_seconds=86400.0, max_entries=10000, wait_timeout=15.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+
+        self._entries = OrderedDict()  # key -> {"fingerprint", "done", "response", "expires_at"}
+        self._lock = threading.Lock()
+        self._counts = {"claimed": 0, "replayed": 0, "waited": 0, "conflicts": 0, "in_progress": 0, "abandoned": 0}
+
+    def claim(self, key, body_fingerprint):
+        """Returns (outcome, stored response); the response is set for REPLAY only."""
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            with self._lock:
+                self._expire()
+                entry = self._entries.get(key)
+                if entry is None:
+                    self._entries[key] = {
+                        "fingerprint": body_fingerprint, "done": threading.Event(), "response": None,
+                        "expires_at": None,
+                    }
+                    self._counts["claimed"] += 1
+                    self._trim()
+                    return OWNER, None
+                if entry["fingerprint"] != body_fingerprint:
+                    self._counts["conflicts"] += 1
+                    return CONFLICT, None
+                if entry["response"] is not None:
+                    self._counts["replayed"] += 1
+                    if waited:
+                        self._counts["waited"] += 1
+                    return REPLAY, entry["response"]
+                done = entry["done"]
+
+            # In flight: wait for its response (or for it to be abandoned, then claim again)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not done.wait(remaining):
+                with self._lock:
+                    self._counts["in_progress"] += 1
+                return IN_PROGRESS, None
+            waited = True
+
+    def complete(self, key, response):
+        """Stores the owner's response and wakes the repeats waiting for it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["response"] = response
+            entry["expires_at"] = time.monotonic() + self.ttl_seconds
+            entry["done"].set()
+
+    def abandon(self, key):
+        """Releases a claimed key without a response; waiting repeats then retry the claim."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._counts["abandoned"] += 1
+                entry["done"].set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_flight": sum(1 for entry in self._entries.values() if entry["response"] is None),
+                "ttl_seconds": self.ttl_seconds,
+                **self._counts,
+            }
+
+    def _expire(self):
+        """Caller holds self._lock. Entries are in claim order, so expiry stops at the first live one."""
+        now = time.monotonic()
+        expired = []
+        for key, entry in self._entries.items():
+            if entry["expires_at"] is None:
+                continue  # still running
+            if entry["expires_at"] > now:
+                break
+            expired.append(key)
+        for key in expired:
+            del self._entries[key]
+
+    def _trim(self):
+        """Caller holds self._lock. Evicts the oldest completed entries beyond max_entries."""
+        excess = len(self._entries) - self.max_entries
+        for key, entry in list(self._entries.items()):
+            if excess <= 0:
+                break
+            if entry["response"] is not None:
+                del self._entries[key]
+                excess -= 1
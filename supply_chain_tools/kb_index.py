@@ -0,0 +1,190 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+"""
+Embedded BM25 index over the policy / SOP documents.
+
+Build from a directory of .txt / .md / .json documents, or load a snapshot
+written by a previous build:
+
+    python kb_index.py build ./policies ./kb_index.json
+"""
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import sys
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".json")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or that the this to was were will with sop".split()
+)
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring.
+
+    Postings and IDF are computed at build time, so a query only touches the
+    posting lists of its own terms. Each document keeps its paragraphs so the
+    result `content` can be built from the passages that matched, in the same
+    "snippet\\n...\\nsnippet" form Discovery Engine returns.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = []          # [{"id", "title", "uri", "paragraphs"}]
+        self.postings = {}      # term -> [[doc_idx, tf], ...]
+        self.idf = {}
+        self.doc_len = []
+        self.avgdl = 0.0
+        self._paragraph_terms = []
+
+    def __len__(self):
+        return len(self.docs)
+
+    # --- BUILD ---
+
+    def add_document(self, doc_id, title, text, uri=""):
+        paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(text) if p.strip()]
+        self.docs.append({"id": doc_id, "title": title, "uri": uri, "paragraphs": paragraphs})
+
+    def build(self):
+        self.postings = {}
+        self.doc_len = []
+        for doc_idx, doc in enumerate(self.docs):
+            terms = Counter(tokenize(doc["title"] + "\n" + "\n".join(doc["paragraphs"])))
+            self.doc_len.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings.setdefault(term, []).append([doc_idx, tf])
+        self._finalize()
+        return self
+
+    def _finalize(self):
+        n = len(self.docs)
+        self.avgdl = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+        self._paragraph_terms = [[set(tokenize(p)) for p in doc["paragraphs"]] for doc in self.docs]
+
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        index = cls(**kwargs)
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if not name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    index._load_file(path)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping knowledge base document {path}: {e}")
+        logger.info(f"Built BM25 index over {len(index.docs)} document(s) from {directory}")
+        return index.build()
+
+    def _load_file(self, path):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as handle:
+            if path.lower().endswith(".json"):
+                record = json.load(handle)
+                self.add_document(
+                    record.get("id", stem),
+                    record.get("title", stem),
+                    record.get("content", ""),
+                    uri=record.get("uri", path),
+                )
+            else:
+                text = handle.read()
+                first_line = next((line.strip("# ").strip() for line in text.splitlines() if line.strip()), stem)
+                self.add_document(stem, first_line or stem, text, uri=path)
+
+    # --- SNAPSHOT ---
+
+    def save(self, path):
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "docs": self.docs,
+            "postings": self.postings,
+            "doc_len": self.doc_len,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(snapshot, handle, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as handle:
+            snapshot = json.load(handle)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported index snapshot version: {snapshot.get('version')}")
+        index = cls(k1=snapshot["k1"], b=snapshot["b"])
+        index.docs = snapshot["docs"]
+        index.postings = snapshot["postings"]
+        index.doc_len = snapshot["doc_len"]
+        index._finalize()
+        logger.info(f"Loaded BM25 index snapshot with {len(index.docs)} document(s) from {path}")
+        return index
+
+    # --- QUERY ---
+
+    def search(self, query, limit=5, max_snippets=3):
+        query_terms = set(tokenize(query))
+        scores = {}
+        for term in query_terms:
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for doc_idx, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_idx] / self.avgdl)
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        results = []
+        for doc_idx, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1]):
+            doc = self.docs[doc_idx]
+            results.append({
+                "id": doc["id"],
+                "title": doc["title"],
+                "content": self._snippet(doc_idx, query_terms, max_snippets),
+                "url": doc["uri"],
+                "uri": doc["uri"],
+                "score": round(score, 4),
+            })
+        return results
+
+    def _snippet(self, doc_idx, query_terms, max_snippets):
+        paragraphs = self.docs[doc_idx]["paragraphs"]
+        overlaps = [
+            (len(terms & query_terms), i)
+            for i, terms in enumerate(self._paragraph_terms[doc_idx])
+        ]
+        best = sorted(i for overlap, i in heapq.nlargest(max_snippets, overlaps) if overlap)
+        if not best:
+            best = [0] if paragraphs else []
+        return "\n...\n".join(paragraphs[i] for i in best) or "No content snippet."
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("Usage: python kb_index.py build <documents_dir> <snapshot_path>")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    BM25Index.from_directory(sys.argv[2]).save(sys.argv[3])
@@ -6,11 +6,24 @@ import uuid
 import datetime
 import time
 import random
-from flask import Flask, request, jsonify
+import atexit
+import functools
+from flask import Flask, Response, request, jsonify, make_response
 from google.cloud import discoveryengine
 from google.cloud import bigquery
 from google.api_core import client_options
 from dotenv import load_dotenv
+from decision_log import DecisionLogWriter
+from spool import DecisionLogSpool
+from discovery_clients import DiscoveryClientPool
+from search_cache import SearchResultCache
+from search_backends import SimulationBackend, build_search_backend
+from customer_matcher import CustomerMatcher, DEFAULT_CUSTOMERS
+from precedent_store import PrecedentStore
+from stats_rollup import DashboardRollup
+from decision_overrides import OverrideTracker
+from compaction import compact_results, parse_budget
+from idempotency import CONFLICT, IN_PROGRESS, REPLAY, IdempotencyStore, fingerprint
 
 # Load environment variables
 load_dotenv()
@@ -31,19 +44,160 @@ BQ_SHIPMENTS_TABLE = os.environ.get("BQ_SHIPMENTS_TABLE")
 BQ_EXCEPTIONS_TABLE = os.environ.get("BQ_EXCEPTIONS_TABLE")
 BQ_RESOLUTIONS_TABLE = os.environ.get("BQ_RESOLUTIONS_TABLE")
 
+# Decision log batching (rows are flushed on whichever threshold is hit first)
+DECISION_LOG_BATCH_SIZE = int(os.environ.get("DECISION_LOG_BATCH_SIZE", 500))
+DECISION_LOG_FLUSH_INTERVAL_SECONDS = float(os.environ.get("DECISION_LOG_FLUSH_INTERVAL_SECONDS", 1.0))
+DECISION_LOG_QUEUE_SIZE = int(os.environ.get("DECISION_LOG_QUEUE_SIZE", 10000))
+
+# Local spool for rows BigQuery could not accept (replayed in order once it recovers)
+DECISION_LOG_SPOOL_DIR = os.environ.get("DECISION_LOG_SPOOL_DIR", "/tmp/decision_log_spool")
+DECISION_LOG_SPOOL_MAX_MB = int(os.environ.get("DECISION_LOG_SPOOL_MAX_MB", 256))
+DECISION_LOG_SPOOL_OVERFLOW = os.environ.get("DECISION_LOG_SPOOL_OVERFLOW", "drop_oldest")
+
+# Discovery Engine channel pool (one set of clients per worker process)
+DISCOVERY_CHANNEL_POOL_SIZE = int(os.environ.get("DISCOVERY_CHANNEL_POOL_SIZE", 2))
+DISCOVERY_WARMUP = os.environ.get("DISCOVERY_WARMUP", "true").lower() == "true"
+
+# /search result cache (stores post-filtered results)
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 1024))
+SEARCH_CACHE_TTL_SECONDS = int(os.environ.get("SEARCH_CACHE_TTL_SECONDS", 300))
+
+# Search backend: "discovery", "bm25" (embedded index), or "discovery+bm25" (fallback)
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "discovery")
+KB_DOCS_DIR = os.environ.get("KB_DOCS_DIR", "policies")
+KB_INDEX_SNAPSHOT = os.environ.get("KB_INDEX_SNAPSHOT")
+SEARCH_FALLBACK_TIMEOUT_SECONDS = float(os.environ.get("SEARCH_FALLBACK_TIMEOUT_SECONDS", 1.5))
+
+# Customer registry used for the competitor filter (JSON list or one name per line)
+CUSTOMER_REGISTRY_FILE = os.environ.get("CUSTOMER_REGISTRY_FILE")
+
+# In-memory precedent store for /get_similar_events (falls back to the live query when stale)
+PRECEDENT_STORE_ENABLED = os.environ.get("PRECEDENT_STORE_ENABLED", "true").lower() == "true"
+PRECEDENTS_PER_TYPE = int(os.environ.get("PRECEDENTS_PER_TYPE", 50))
+PRECEDENT_REFRESH_SECONDS = float(os.environ.get("PRECEDENT_REFRESH_SECONDS", 30))
+PRECEDENT_MAX_STALENESS_SECONDS = float(os.environ.get("PRECEDENT_MAX_STALENESS_SECONDS", 300))
+# Rows landing this long after their timestamp (batched writes, spool replay) are still picked up
+PRECEDENT_LOOKBACK_SECONDS = float(os.environ.get("PRECEDENT_LOOKBACK_SECONDS", 3600))
+
+# Daily per-action rollups for /dashboard/stats
+DASHBOARD_MAX_DAYS = int(os.environ.get("DASHBOARD_MAX_DAYS", 365))
+DASHBOARD_ROLLUP_RETENTION_DAYS = int(os.environ.get("DASHBOARD_ROLLUP_RETENTION_DAYS", 90))
+DASHBOARD_ROLLUP_RESYNC_SECONDS = float(os.environ.get("DASHBOARD_ROLLUP_RESYNC_SECONDS", 300))
+
+# Knowledge base version reported to agents (their decision caches reset when it changes)
+KB_VERSION = os.environ.get("KB_VERSION", "initial")
+OVERRIDE_TRACKER_MAX_EVENTS = int(os.environ.get("OVERRIDE_TRACKER_MAX_EVENTS", 10000))
+
+# Batch endpoint: most operations accepted in one /batch request
+BATCH_MAX_OPERATIONS = int(os.environ.get("BATCH_MAX_OPERATIONS", 500))
+
+# Idempotency-Key support for side-effecting routes: how long completed responses are
+# replayed, how many are kept, and how long a repeat waits for a request still running
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 86400))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 10000))
+# Keep below the agent's 20s read timeout for action tools (controltower/tool_client.py), so a
+# retry waiting on an in-flight first attempt gets its 409 before the agent gives up on it
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", 15))
+
+# Budget used when a tool call sends "compact": true without max_tokens / max_chars
+COMPACTION_DEFAULT_MAX_TOKENS = int(os.environ.get("COMPACTION_DEFAULT_MAX_TOKENS", 600))
+
 if not all([GCP_PROJECT_ID, VERTEX_SEARCH_DATA_STORE_ID, BQ_AGENT_DECISIONS_TABLE]):
     logger.warning("Missing critical environment variables. Ensure .env is configured.")
 
 # Initialize BigQuery Client
 bq_client = bigquery.Client()
 
+# Background writer so tool routes never wait on a BigQuery round-trip
+decision_log_spool = DecisionLogSpool(
+    DECISION_LOG_SPOOL_DIR,
+    max_bytes=DECISION_LOG_SPOOL_MAX_MB * 1024 * 1024,
+    overflow_policy=DECISION_LOG_SPOOL_OVERFLOW,
+)
+decision_log_writer = DecisionLogWriter(
+    bq_client,
+    BQ_AGENT_DECISIONS_TABLE,
+    max_batch_size=DECISION_LOG_BATCH_SIZE,
+    flush_interval=DECISION_LOG_FLUSH_INTERVAL_SECONDS,
+    max_queue_size=DECISION_LOG_QUEUE_SIZE,
+    spool=decision_log_spool,
+)
+atexit.register(decision_log_writer.close)
+
+dashboard_rollup = DashboardRollup(
+    bq_client,
+    BQ_AGENT_DECISIONS_TABLE,
+    retention_days=DASHBOARD_ROLLUP_RETENTION_DAYS,
+    resync_interval=DASHBOARD_ROLLUP_RESYNC_SECONDS,
+)
+
+# Shared Discovery Engine clients, warmed up before the first request
+discovery_pool = DiscoveryClientPool(
+    GCP_PROJECT_ID,
+    VERTEX_SEARCH_DATA_STORE_ID,
+    pool_size=DISCOVERY_CHANNEL_POOL_SIZE,
+)
+if DISCOVERY_WARMUP and SEARCH_BACKEND != "bm25" and GCP_PROJECT_ID and VERTEX_SEARCH_DATA_STORE_ID:
+    discovery_pool.warm_up()
+
+search_backend = build_search_backend(
+    SEARCH_BACKEND,
+    discovery_pool,
+    docs_dir=KB_DOCS_DIR,
+    snapshot_path=KB_INDEX_SNAPSHOT,
+    fallback_timeout=SEARCH_FALLBACK_TIMEOUT_SECONDS,
+)
+simulation_backend = SimulationBackend()
+
+# Compiled once: detects the active customer and competitor names in one pass
+customer_matcher = (
+    CustomerMatcher.from_file(CUSTOMER_REGISTRY_FILE) if CUSTOMER_REGISTRY_FILE
+    else CustomerMatcher(DEFAULT_CUSTOMERS)
+)
+
+precedent_store = None
+if PRECEDENT_STORE_ENABLED and BQ_RESOLUTIONS_TABLE and BQ_EXCEPTIONS_TABLE:
+    precedent_store = PrecedentStore(
+        bq_client,
+        BQ_RESOLUTIONS_TABLE,
+        BQ_EXCEPTIONS_TABLE,
+        per_type=PRECEDENTS_PER_TYPE,
+        refresh_interval=PRECEDENT_REFRESH_SECONDS,
+        max_staleness=PRECEDENT_MAX_STALENESS_SECONDS,
+        lookback=PRECEDENT_LOOKBACK_SECONDS,
+    )
+    precedent_store.start()
+
+search_cache = SearchResultCache(
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    ttl_seconds=SEARCH_CACHE_TTL_SECONDS,
+)
+
+# Replaced by the import operation name whenever /import_documents runs
+kb_version = KB_VERSION
+
+# Which agent decisions (by resolution path) humans later overrode
+override_tracker = OverrideTracker(max_events=OVERRIDE_TRACKER_MAX_EVENTS)
+
+# Responses of side-effecting routes, replayed for retries with the same Idempotency-Key
+idempotency_store = IdempotencyStore(
+    ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+    max_entries=IDEMPOTENCY_MAX_ENTRIES,
+    wait_timeout=IDEMPOTENCY_WAIT_SECONDS,
+)
+
 def log_to_bigquery(event_data):
     """
     Persists the agent's decision trail to BigQuery for observability.
+    The row is queued and written asynchronously by decision_log_writer.
     """
+    log_batch_to_bigquery([event_data])
+
+def log_batch_to_bigquery(events):
+    """Like log_to_bigquery, for several decisions at once; their rows are written in one insert."""
     # SIMULATION MODE CHECK
     if request and request.headers.get('X-Simulation-Mode') == 'true':
-        logger.info(f"SIMULATION MODE: Skipping BigQuery insert. Data: {event_data}")
+        logger.info(f"SIMULATION MODE: Skipping BigQuery insert. Data: {events}")
         return
 
     try:
@@ -60,30 +214,128 @@ def log_to_bigquery(event_data):
             "tool_parameters": str(event_data.get('params', {})), 
             "execution_status": event_data.get('status', 'SUCCESS'),
             "execution_latency_ms": event_data.get('latency', 0)
-        }]
-        
-        try:
-            errors = bq_client.insert_rows_json(BQ_AGENT_DECISIONS_TABLE, rows_to_insert)
-            if errors == []:
-                logger.info("New rows have been added to BigQuery.")
-            else:
-                logger.error(f"Encountered errors while inserting rows: {errors}")
-        except Exception as bq_error:
-             logger.warning(f"BigQuery Insert Failed: {bq_error}")
-            
+        } for event_data in events]
+
+        if len(rows_to_insert) == 1:
+            decision_log_writer.enqueue(rows_to_insert[0])
+        else:
+            decision_log_writer.enqueue_batch(rows_to_insert)
+        for row in rows_to_insert:
+            dashboard_rollup.record(row)
+
+        for event_data in events:
+            if event_data.get('trigger_type') != "HUMAN_RESOLUTION":
+                metadata = (event_data.get('params') or {}).get('metadata') or {}
+                override_tracker.record_decision(
+                    event_data.get('event_id'), event_data.get('action_name'), metadata.get('resolution_path')
+                )
+
     except Exception as e:
         logger.error(f"Failed to isolate BigQuery log logic: {str(e)}")
 
+def idempotent(view):
+    """
+    Honors an Idempotency-Key header: the first request with a key runs and
+    its response (anything below 500) is stored; repeats get that response
+    back (with `Idempotent-Replayed: true`) instead of running again, waiting
+    for it if the first request is still in flight. Requests without the
+    header run as usual.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({"status": "error", "message": "Idempotency-Key must be at most 255 characters"}), 400
+
+        # Keys are scoped per route; simulation calls never share responses with real ones
+        scope = (request.path, request.headers.get('X-Simulation-Mode') == 'true', key)
+        outcome, stored = idempotency_store.claim(scope, fingerprint(request.get_data()))
+        if outcome == REPLAY:
+            body, status, mimetype = stored
+            logger.info(f"Replaying {request.path} response for Idempotency-Key {key}")
+            return Response(body, status=status, mimetype=mimetype, headers={'Idempotent-Replayed': 'true'})
+        if outcome == CONFLICT:
+            return jsonify({"status": "error", "message": "Idempotency-Key was already used with a different request body"}), 422
+        if outcome == IN_PROGRESS:
+            response = jsonify({"status": "error", "message": "A request with this Idempotency-Key is still in progress"})
+            return response, 409, {'Retry-After': '1'}
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency_store.abandon(scope)
+            raise
+        if response.status_code >= 500:
+            idempotency_store.abandon(scope)
+        else:
+            idempotency_store.complete(scope, (response.get_data(), response.status_code, response.mimetype))
+        return response
+    return wrapper
+
+def tool_results_response(results, query, text_field, budget, **extra):
+    """Success response for a retrieval tool, compacted to `budget` characters when one was requested."""
+    body = {"status": "success", "results": results, **extra}
+    if budget is not None:
+        body["results"], body["compaction"] = compact_results(results, query, budget, text_field)
+    return jsonify(body), 200
+
+def requested_budget(data):
+    """Returns (budget, error response); the error is set when the budget fields are invalid."""
+    try:
+        return parse_budget(data, COMPACTION_DEFAULT_MAX_TOKENS), None
+    except (TypeError, ValueError):
+        return None, (jsonify({"status": "error", "message": "'max_tokens' / 'max_chars' must be non-negative integers", "results": []}), 400)
+
 @app.route('/', methods=['GET'])
 def health_check():
     return jsonify({"status": "serving"}), 200
 
-# --- TOOL 1: UPDATE ETA ---
-@app.route('/update_eta', methods=['POST'])
-def update_eta():
-    start_time = time.time()
-    data = request.get_json()
-    
+@app.route('/decision_log/stats', methods=['GET'])
+def decision_log_stats():
+    return jsonify(decision_log_writer.stats()), 200
+
+@app.route('/discovery/stats', methods=['GET'])
+def discovery_stats():
+    return jsonify(discovery_pool.stats()), 200
+
+@app.route('/precedents/stats', methods=['GET'])
+def precedent_stats():
+    if precedent_store is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify(precedent_store.stats()), 200
+
+@app.route('/idempotency/stats', methods=['GET'])
+def idempotency_stats():
+    return jsonify(idempotency_store.stats()), 200
+
+@app.route('/decisions/overrides', methods=['GET'])
+def decision_override_stats():
+    return jsonify(override_tracker.stats()), 200
+
+@app.route('/kb/version', methods=['GET'])
+def get_kb_version():
+    return jsonify({"version": kb_version}), 200
+
+@app.route('/search/backend', methods=['GET'])
+def search_backend_stats():
+    return jsonify(search_backend.stats()), 200
+
+@app.route('/search/cache', methods=['GET'])
+def search_cache_stats():
+    return jsonify(search_cache.stats()), 200
+
+@app.route('/search/cache', methods=['DELETE'])
+def search_cache_invalidate():
+    search_cache.invalidate()
+    return jsonify({"status": "invalidated"}), 200
+
+# --- ACTION TOOLS ---
+# Each action runs one operation and returns (response body, decision log event).
+# The single-operation routes log one row each; /batch logs all of its rows in one insert.
+
+def update_eta_action(data, start_time):
     # 1. Execute Logic
     shipment_id = data.get('shipment_id')
     new_eta = data.get('new_eta')
@@ -91,8 +343,8 @@ def update_eta():
     
     logger.info(f"Updating ETA for {shipment_id} to {new_eta} due to {reason}")
     
-    # 2. Log Observability Data
-    log_to_bigquery({
+    # 2. Observability Data
+    log_event = {
         "event_id": data.get('metadata', {}).get('event_id'),
         "trigger_type": "LATE_SHIPMENT_HANDLER",
         "action_name": "update_eta",
@@ -102,16 +354,11 @@ def update_eta():
         "confidence": 0.95,
         "status": "SUCCESS",
         "latency": int((time.time() - start_time) * 1000)
-    })
+    }
 
-    return jsonify({"status": "success", "updated_eta": new_eta}), 200
+    return {"status": "success", "updated_eta": new_eta}, log_event
 
-# --- TOOL 2: REQUEST RESHIPMENT ---
-@app.route('/request_reshipment', methods=['POST'])
-def request_reshipment():
-    start_time = time.time()
-    data = request.get_json()
-    
+def request_reshipment_action(data, start_time):
     original_shipment_id = data.get('original_shipment_id')
     priority = data.get('priority', 'STANDARD')
     
@@ -121,8 +368,8 @@ def request_reshipment():
     tracking_id = f"TRK-{uuid.uuid4().hex[:10].upper()}"
     carrier = "FedEx Priority"
 
-    # Log Observability Data
-    log_to_bigquery({
+    # Observability Data
+    log_event = {
         "event_id": data.get('metadata', {}).get('event_id'),
         "trigger_type": "RESHIPMENT_HANDLER",
         "action_name": "request_reshipment",
@@ -132,23 +379,17 @@ def request_reshipment():
         "confidence": 0.98,
         "status": "SUCCESS",
         "latency": int((time.time() - start_time) * 1000)
-    })
-    
+    }
 
-    return jsonify({
+    return {
         "status": "success", 
         "new_order_id": new_order_id,
         "tracking_id": tracking_id,
         "carrier": carrier,
         "priority": priority
-    }), 200
+    }, log_event
 
-# --- TOOL 3: ESCALATE TO HUMAN ---
-@app.route('/escalate_to_human', methods=['POST'])
-def escalate_to_human():
-    start_time = time.time()
-    data = request.get_json()
-    
+def escalate_to_human_action(data, start_time):
     shipment_id = data.get('shipment_id')
     reason = data.get('reason')
     
@@ -156,8 +397,8 @@ def escalate_to_human():
     
     ticket_id = f"TKT-{uuid.uuid4().hex[:8]}"
 
-    # Log Observability Data
-    log_to_bigquery({
+    # Observability Data
+    log_event = {
         "event_id": data.get('metadata', {}).get('event_id'),
         "trigger_type": "EXCEPTION_ESCALATION",
         "action_name": "escalate_to_human",
@@ -166,137 +407,164 @@ def escalate_to_human():
         "reasoning": data.get('reasoning', reason),
         "status": "SUCCESS",
         "latency": int((time.time() - start_time) * 1000)
-    })
+    }
+
+    return {"status": "escalated", "ticket_id": ticket_id}, log_event
+
+# action name -> (handler, required params); the names match the single-operation routes
+BATCH_ACTIONS = {
+    "update_eta": (update_eta_action, ("shipment_id", "new_eta")),
+    "request_reshipment": (request_reshipment_action, ("original_shipment_id",)),
+    "escalate_to_human": (escalate_to_human_action, ("shipment_id", "reason")),
+}
+
+def validate_operation(operation):
+    """Returns an error message for a /batch operation, or None if it can run."""
+    if not isinstance(operation, dict):
+        return "operation must be an object"
+    action = operation.get('action')
+    if action not in BATCH_ACTIONS:
+        return f"unknown action {action!r}; expected one of {sorted(BATCH_ACTIONS)}"
+    params = operation.get('params')
+    if not isinstance(params, dict):
+        return "'params' must be an object"
+    if 'metadata' in params and not isinstance(params['metadata'], dict):
+        return "'params.metadata' must be an object"
+    missing = [name for name in BATCH_ACTIONS[action][1] if not params.get(name)]
+    if missing:
+        return f"missing param(s): {', '.join(missing)}"
+    return None
+
+# --- TOOL 1: UPDATE ETA ---
+@app.route('/update_eta', methods=['POST'])
+@idempotent
+def update_eta():
+    start_time = time.time()
+    result, log_event = update_eta_action(request.get_json(), start_time)
+    log_to_bigquery(log_event)
+    return jsonify(result), 200
 
-    return jsonify({"status": "escalated", "ticket_id": ticket_id}), 200
+# --- TOOL 2: REQUEST RESHIPMENT ---
+@app.route('/request_reshipment', methods=['POST'])
+@idempotent
+def request_reshipment():
+    start_time = time.time()
+    result, log_event = request_reshipment_action(request.get_json(), start_time)
+    log_to_bigquery(log_event)
+    return jsonify(result), 200
+
+# --- TOOL 3: ESCALATE TO HUMAN ---
+@app.route('/escalate_to_human', methods=['POST'])
+@idempotent
+def escalate_to_human():
+    start_time = time.time()
+    result, log_event = escalate_to_human_action(request.get_json(), start_time)
+    log_to_bigquery(log_event)
+    return jsonify(result), 200
+
+# --- BATCH: SEVERAL ACTIONS IN ONE REQUEST ---
+@app.route('/batch', methods=['POST'])
+@idempotent
+def batch_actions():
+    """
+    Runs a list of update_eta / request_reshipment / escalate_to_human
+    operations, e.g. {"operations": [{"action": "update_eta", "params": {...}}]}.
+    Every operation is validated before any runs (one invalid operation
+    rejects the whole batch with 400). Results come back in request order,
+    each with its own status, and all decision-log rows go in one insert.
+    """
+    start_time = time.time()
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"status": "error", "message": "'operations' must be a non-empty list"}), 400
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({"status": "error", "message": f"At most {BATCH_MAX_OPERATIONS} operations per batch"}), 400
+
+    errors = []
+    for index, operation in enumerate(operations):
+        error = validate_operation(operation)
+        if error:
+            errors.append({"index": index, "error": error})
+    if errors:
+        return jsonify({"status": "error", "message": "Batch rejected; no operations were run", "errors": errors}), 400
+
+    results = []
+    log_events = []
+    for index, operation in enumerate(operations):
+        action = operation['action']
+        handler = BATCH_ACTIONS[action][0]
+        op_start = time.time()
+        try:
+            result, log_event = handler(operation['params'], op_start)
+        except Exception as e:
+            logger.error(f"Batch operation {index} ({action}) failed: {e}")
+            result = {"status": "error", "message": str(e)}
+            log_event = {
+                "event_id": (operation['params'].get('metadata') or {}).get('event_id'),
+                "trigger_type": "BATCH",
+                "action_name": action,
+                "params": operation['params'],
+                "reasoning": operation['params'].get('reasoning'),
+                "status": "FAILED",
+                "latency": int((time.time() - op_start) * 1000)
+            }
+        results.append({"index": index, "action": action, **result})
+        log_events.append(log_event)
+
+    log_batch_to_bigquery(log_events)
+
+    failed = sum(1 for result in results if result["status"] == "error")
+    return jsonify({
+        "status": "success" if not failed else "partial",
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results,
+        "latency_ms": int((time.time() - start_time) * 1000)
+    }), 200
 
-# --- TOOL 4: VERTEX AI SEARCH ---
+# --- TOOL 4: KNOWLEDGE BASE SEARCH ---
 @app.route('/search', methods=['POST'])
 def search_knowledge_base():
     """
-    Semantic Search via Vertex AI Search.
+    Knowledge base search via the configured SEARCH_BACKEND
+    (Vertex AI Search, the embedded BM25 index, or both with fallback).
     
     Accepts:
-        {"query": "string"}
+        {"query": "string", "max_tokens": int (optional), "max_chars": int (optional)}
         
     Returns:
         {"status": "success", "results": [{"id":..., "title":..., "content":...}]}
+        plus a "compaction" summary when a budget was given.
     """
     try:
         data = request.get_json()
         query = data.get('query')
+        budget, error = requested_budget(data)
+        if error:
+            return error
         
         # --- POST-SEARCH FILTERING SETUP ---
-        KNOWN_CUSTOMERS = ["HealthPlus", "TechGiant", "Global Mart", "Global Retail", "FreshMarket", "Detroit Motors", "MediLife"]
-        active_customer = next((c for c in KNOWN_CUSTOMERS if c.lower() in query.lower()), None)
+        active_customer = customer_matcher.detect(query)
+
+        # --- RESULT CACHE ---
+        is_simulation = request.headers.get('X-Simulation-Mode') == 'true'
+        cache_key = search_cache.make_key(query, active_customer, mode="simulation" if is_simulation else search_backend.name)
+        cached_results = search_cache.get(cache_key)
+        if cached_results is not None:
+            return tool_results_response(cached_results, query, "content", budget, cached=True)
+        cache_generation = search_cache.generation()
         
         # Randomize result count (2-5)
         limit = random.randint(2, 5)
 
         
-        raw_results = []
-
         # SIMULATION MODE CHECK
-        if request.headers.get('X-Simulation-Mode') == 'true':
+        if is_simulation:
             logger.info(f"SIMULATION MODE: Returning mock search results for '{query}'")
-            mock_docs = [
-                    {
-                        "id": "doc-vip-900",
-                        "title": "MSA - Global Retail VIP",
-                        "content": "SERVICE LEVEL AGREEMENT (SLA)\nProvider guarantees 98% on-time delivery for all shipments.\nFor VIP Platinum tier, any LATE SHIPMENT exceeding 24 hours requires immediate remediation via expedited replacement.\nDelayed shipments trigger a 5% penalty clause.",
-                        "keywords": ["vip", "retail", "techgiant", "late", "shipment"]
-                    },
-                    {
-                        "id": "doc-sla-001",
-                        "title": "SOP - HealthPlus Pharma",
-                        "content": "TEMPERATURE CONTROL\nAll shipments must be maintained between 2°C and 8°C. Any excursion above 8°C for more than 4 hours renders the product 'Adulterated'.",
-                        "keywords": ["pharma", "health", "temperature", "vaccine", "insulin"]
-                    },
-                    {
-                         "id": "doc-ops-202",
-                         "title": "SOP - Inventory Shortage Resolution",
-                         "content": "INVENTORY ALLOCATION\nWhen stock < demand:\n1. Search alternate DCs within 500 miles.\n2. If not available, offer similar SKU substitution (requires customer consent).\n3. Cancel order if no resolution within 48h.",
-                         "keywords": ["inventory", "shortage", "stock", "retail", "techgiant"]
-                    }
-                ]
-            
-            # Simple keyword matching
-            query_lower = query.lower()
-            raw_results = [
-                d for d in mock_docs 
-                if any(k in query_lower for k in d['keywords']) or query_lower == ""
-            ][:limit]
-            
-            # Fallback if no match
-            if not raw_results:
-                raw_results = mock_docs
-        
+            raw_results, degraded = simulation_backend.search(query, limit), False
         else:
-            # Discovery Engine Search
-            client = discoveryengine.SearchServiceClient()
-            serving_config = client.serving_config_path(
-                project=GCP_PROJECT_ID,
-                location="global",
-                data_store=VERTEX_SEARCH_DATA_STORE_ID,
-                serving_config="default_search",
-            )
-            
-            req = discoveryengine.SearchRequest(
-                serving_config=serving_config,
-                query=query,
-                page_size=limit,
-                content_search_spec={"snippet_spec": {"return_snippet": True}, "extractive_content_spec": {"max_extractive_answer_count": 1}}
-            )
-            
-            search_results = client.search(req)
-            
-            for result in search_results.results:
-                content = ""
-                if result.document.derived_struct_data:
-                     snippets = result.document.derived_struct_data.get('snippets', [])
-                     content_parts = []
-                     for snippet in snippets:
-                         # Handle MapComposite/Struct by trying to access 'snippet' or defaulting to str
-                         if hasattr(snippet, 'get'):
-                             content_parts.append(snippet.get('snippet', ''))
-                         else:
-                             content_parts.append(str(snippet))
-                     content = "\n...\n".join([c for c in content_parts if c])
-                
-                # Extract URI and Title
-                uri = ""
-                title = "Unknown"
-                
-                # Try to find URI in derived data first (often better populated)
-                if result.document.derived_struct_data:
-                     link = result.document.derived_struct_data.get('link', '')
-                     if link: 
-                         uri = link
-                
-                # Fallback to direct content uri
-                if not uri and result.document.content and result.document.content.uri:
-                    uri = result.document.content.uri
-                    
-                # Determine Title from URI if not in struct_data
-                if result.document.struct_data:
-                    title = result.document.struct_data.get('title', 'Unknown')
-                
-                if title == "Unknown" and uri:
-                    title = uri.split('/')[-1]
-                    
-                # Generate Public/Console URL
-                url = uri
-                if uri.startswith("gs://"):
-                    # Convert gs://bucket/path -> https://storage.googleapis.com/bucket/path (Public)
-                    url = uri.replace("gs://", "https://storage.googleapis.com/")
-
-                raw_results.append({
-                    "id": result.document.id,
-                    "title": title,
-                    "content": content or "No content snippet.",
-                    "url": url,
-                    "uri": uri
-                })
+            raw_results, degraded = search_backend.search_with_status(query, limit)
 
         # --- APPLY FILTERING ---
         
@@ -310,20 +578,17 @@ def search_knowledge_base():
         final_results = []
         if active_customer:
             for doc in filtered_by_quality:
-                doc_text = (doc.get('title', '') + " " + doc.get('content', '')).lower()
-                is_competitor = False
-                for c in KNOWN_CUSTOMERS:
-                    if c.lower() != active_customer.lower() and c.lower() in doc_text:
-                        # Found a DIFFERENT customer name in the doc -> Exclude it
-                        is_competitor = True
-                        break
-                
-                if not is_competitor:
+                doc_text = doc.get('title', '') + " " + doc.get('content', '')
+                # Found a DIFFERENT customer name in the doc -> Exclude it
+                if not customer_matcher.mentions_other(doc_text, active_customer):
                     final_results.append(doc)
         else:
             final_results = filtered_by_quality
 
-        return jsonify({"status": "success", "results": final_results}), 200
+        # A fallback answer stands in for a slow or failing primary; don't pin it for the TTL
+        if not degraded:
+            search_cache.put(cache_key, final_results, generation=cache_generation)
+        return tool_results_response(final_results, query, "content", budget)
 
     except Exception as e:
         logger.error(f"Search failed: {e}")
@@ -336,13 +601,16 @@ def get_similar_events():
         data = request.get_json()
         event_type = data.get('event_type') # e.g. "LATE_SHIPMENT"
         limit = data.get('limit', 3)
+        budget, error = requested_budget(data)
+        if error:
+            return error
+        # Precedent reasoning is ranked against the event type ("LATE_SHIPMENT" -> "late shipment")
+        budget_query = (event_type or "").replace("_", " ")
         
         # SIMULATION MODE CHECK
         if request.headers.get('X-Simulation-Mode') == 'true':
              logger.info(f"SIMULATION MODE: Returning mock history for '{event_type}'")
-             return jsonify({
-                "status": "success", 
-                "results": [
+             return tool_results_response([
                     {
                         "event_id": "EVT-SIM-001",
                         "event_type": event_type or "LATE_SHIPMENT",
@@ -357,8 +625,15 @@ def get_similar_events():
                         "reasoning": "Shipment lost in transit (>72h no scan). Triggering reshipment for VIP customer.",
                         "outcome": "SUCCESS"
                     }
-                ]
-            }), 200
+                ], budget_query, "reasoning", budget)
+
+        limit = int(limit)
+
+        # Served from memory while the precedent store is fresh
+        if precedent_store is not None:
+            results = precedent_store.lookup(event_type, limit)
+            if results is not None:
+                return tool_results_response(results, budget_query, "reasoning", budget)
 
         query = f"""
             SELECT 
@@ -388,22 +663,32 @@ def get_similar_events():
                 "outcome": row.execution_status
             })
             
-        return jsonify({"status": "success", "results": results}), 200
+        return tool_results_response(results, budget_query, "reasoning", budget)
     except Exception as e:
         logger.error(f"History fetch failed: {e}")
         return jsonify({"status": "error", "message": str(e), "results": []}), 200
 
 # --- ADMIN TOOL: IMPORT DOCUMENTS ---
+def on_import_done(operation):
+    """
+    Runs (on the operation's polling thread) once an import has finished:
+    only now do searches see the new documents, so cached search results and
+    agent decisions made against the old knowledge base are dropped here.
+    """
+    global kb_version
+    error = operation.exception()
+    if error is not None:
+        # A failed import may still have changed some documents
+        logger.error(f"Import {operation.operation.name} failed: {error}")
+    search_cache.invalidate()
+    kb_version = operation.operation.name
+    logger.info(f"Import {operation.operation.name} finished; knowledge base version is now {kb_version}")
+
 @app.route('/import_documents', methods=['POST'])
 def import_documents():
     try:
-        client = discoveryengine.DocumentServiceClient()
-        parent = client.branch_path(
-            project=GCP_PROJECT_ID,
-            location="global",
-            data_store=VERTEX_SEARCH_DATA_STORE_ID,
-            branch="default_branch",
-        )
+        client = discovery_pool.document_client()
+        parent = discovery_pool.branch
         
         request = discoveryengine.ImportDocumentsRequest(
             parent=parent,
@@ -415,6 +700,8 @@ def import_documents():
         )
         
         operation = client.import_documents(request=request)
+        # The import is long-running; invalidating now would let searches re-cache pre-import results
+        operation.add_done_callback(on_import_done)
         return jsonify({"status": "started", "operation": operation.operation.name}), 200
     except Exception as e:
         logger.error(f"Import failed: {e}")
@@ -423,13 +710,8 @@ def import_documents():
 @app.route('/list_docs', methods=['GET'])
 def list_documents():
     try:
-        client = discoveryengine.DocumentServiceClient()
-        parent = client.branch_path(
-            project=GCP_PROJECT_ID,
-            location="global",
-            data_store=VERTEX_SEARCH_DATA_STORE_ID,
-            branch="default_branch",
-        )
+        client = discovery_pool.document_client()
+        parent = discovery_pool.branch
         response = client.list_documents(parent=parent)
         docs = []
         for doc in response:
@@ -448,19 +730,38 @@ def list_documents():
 # --- DASHBOARD STATS ---
 @app.route('/dashboard/stats', methods=['GET'])
 def get_dashboard_stats():
+    # Parsed by hand: request.args.get(type=int) silently falls back to the default on bad input
+    raw_days = request.args.get('days', '7').strip()
+    try:
+        days = int(raw_days)
+    except ValueError:
+        days = None
+    if days is None or not 1 <= days <= DASHBOARD_MAX_DAYS:
+        return jsonify({"status": "error", "message": f"'days' must be an integer between 1 and {DASHBOARD_MAX_DAYS}"}), 400
+
+    try:
+        # Answered from in-memory daily buckets when the window is within retention
+        if days <= DASHBOARD_ROLLUP_RETENTION_DAYS:
+            return jsonify(dashboard_rollup.query(days)), 200
+    except Exception as e:
+        logger.warning(f"Stats rollup unavailable, using live query: {e}")
+
     try:
-        days = request.args.get('days', 7)
         query = f"""
             SELECT 
                 FORMAT_TIMESTAMP('%Y-%m-%d', timestamp) as date,
                 action_name,
                 COUNT(*) as count
             FROM `{BQ_AGENT_DECISIONS_TABLE}`
-            WHERE timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {days} DAY)
+            WHERE timestamp >= TIMESTAMP(DATE_SUB(CURRENT_DATE(), INTERVAL @offset_days DAY))
             GROUP BY 1, 2
             ORDER BY 1
         """
-        query_job = bq_client.query(query)
+        job_config = bigquery.QueryJobConfig(
+            # Calendar days, today included (same window as the rollup)
+            query_parameters=[bigquery.ScalarQueryParameter("offset_days", "INT64", days - 1)]
+        )
+        query_job = bq_client.query(query, job_config=job_config)
         results = []
         for row in query_job:
             results.append({
@@ -473,7 +774,12 @@ def get_dashboard_stats():
         logger.error(f"Stats failed: {e}")
         return jsonify([]), 200
 
+@app.route('/dashboard/stats/rollup', methods=['GET'])
+def dashboard_rollup_stats():
+    return jsonify(dashboard_rollup.stats()), 200
+
 @app.route('/resolve_human_task', methods=['POST'])
+@idempotent
 def resolve_human_task():
     start_time = time.time()
     data = request.get_json()
@@ -483,6 +789,8 @@ def resolve_human_task():
     reason = data.get('reason')
     
     logger.info(f"Human resolved {event_id} with {action}")
+    if override_tracker.record_human_resolution(event_id, action):
+        logger.info(f"Human overrode the agent decision for {event_id}")
     
     # Log Observability Data (Human Action)
     log_to_bigquery({
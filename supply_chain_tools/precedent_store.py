@@ -0,0 +1,182 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+import datetime
+import logging
+import threading
+import time
+from collections import deque
+
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+
+class PrecedentStore:
+    """
+    In-memory index of the most recent successful resolutions per event type.
+
+    The first refresh loads the newest `per_type` resolutions of every event
+    type; later refreshes only pull rows from `lookback` seconds before the
+    watermark (the largest resolution timestamp seen so far) onwards, so rows
+    that land late (batched or replayed from the decision log spool) are still
+    picked up; rows already loaded are skipped by event id. A background
+    thread refreshes every `refresh_interval` seconds. Lookups are served from
+    memory as long as the last successful refresh is within `max_staleness`
+    seconds; otherwise `lookup` returns None and the caller should run the
+    live query.
+    """
+
+    def __init__(self, client, resolutions_table, exceptions_table, per_type=50,
+                 refresh_interval=30.0, max_staleness=300.0, lookback=3600.0):
+        self.client = client
+        self.resolutions_table = resolutions_table
+        self.exceptions_table = exceptions_table
+        self.per_type = per_type
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.lookback = lookback
+
+        self._by_type = {}              # event type -> deque of precedents, newest first
+        self._watermark = None          # newest resolution timestamp loaded
+        self._loaded = {}               # event id -> timestamp, for rows inside the lookback window
+        self._last_refresh = None       # monotonic time of the last successful refresh
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        self._hits = 0
+        self._stale_misses = 0
+        self._refreshes = 0
+        self._refresh_errors = 0
+        self._last_refresh_ms = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="precedent-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def lookup(self, event_type, limit):
+        """
+        Returns up to `limit` precedents whose type contains `event_type`
+        (same semantics as the live `LIKE '%x%'` query), newest first, or None
+        if the store is too stale to answer.
+        """
+        with self._lock:
+            if self._last_refresh is None or time.monotonic() - self._last_refresh > self.max_staleness:
+                self._stale_misses += 1
+                return None
+            needle = (event_type or "").upper()
+            candidates = []
+            for type_name, precedents in self._by_type.items():
+                if needle in type_name.upper():
+                    candidates.extend(precedents)
+            self._hits += 1
+
+        candidates.sort(key=lambda p: p["timestamp"], reverse=True)
+        return [
+            {
+                "event id": p["event_id"],
+                "action": p["action"],
+                "reasoning": p["reasoning"],
+                "outcome": p["outcome"],
+            }
+            for p in candidates[:limit]
+        ]
+
+    def refresh(self):
+        start_time = time.time()
+        with self._lock:
+            watermark = self._watermark
+
+        if watermark is None:
+            query = f"""
+                SELECT
+                    e.type AS event_type, e.event_id, r.reasoning, r.action_name, r.execution_status, r.timestamp
+                FROM `{self.resolutions_table}` r
+                JOIN `{self.exceptions_table}` e ON r.event_id = e.event_id
+                WHERE r.execution_status = 'SUCCESS'
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY e.type ORDER BY r.timestamp DESC) <= @per_type
+            """
+            params = [bigquery.ScalarQueryParameter("per_type", "INT64", self.per_type)]
+        else:
+            query = f"""
+                SELECT
+                    e.type AS event_type, e.event_id, r.reasoning, r.action_name, r.execution_status, r.timestamp
+                FROM `{self.resolutions_table}` r
+                JOIN `{self.exceptions_table}` e ON r.event_id = e.event_id
+                WHERE r.execution_status = 'SUCCESS'
+                AND r.timestamp >= @since
+                ORDER BY r.timestamp ASC
+            """
+            since = watermark - datetime.timedelta(seconds=self.lookback)
+            params = [bigquery.ScalarQueryParameter("since", "TIMESTAMP", since)]
+
+        rows = list(self.client.query(query, job_config=bigquery.QueryJobConfig(query_parameters=params)))
+        rows.sort(key=lambda row: row.timestamp)
+
+        with self._lock:
+            added = 0
+            for row in rows:
+                if row.event_id in self._loaded:
+                    continue
+                precedents = self._by_type.setdefault(row.event_type, deque(maxlen=self.per_type))
+                precedent = {
+                    "event_id": row.event_id,
+                    "action": row.action_name,
+                    "reasoning": row.reasoning,
+                    "outcome": row.execution_status,
+                    "timestamp": row.timestamp,
+                }
+                if precedents and row.timestamp < precedents[0]["timestamp"]:
+                    # Landed late: keep the deque newest first so the oldest is the one evicted
+                    ordered = sorted([*precedents, precedent], key=lambda p: p["timestamp"], reverse=True)
+                    precedents.clear()
+                    precedents.extend(ordered[:self.per_type])
+                else:
+                    precedents.appendleft(precedent)
+                self._loaded[row.event_id] = row.timestamp
+                if self._watermark is None or row.timestamp > self._watermark:
+                    self._watermark = row.timestamp
+                added += 1
+
+            if self._watermark is not None:
+                # Ids older than the next refresh's window can no longer come back
+                horizon = self._watermark - datetime.timedelta(seconds=self.lookback)
+                self._loaded = {event_id: ts for event_id, ts in self._loaded.items() if ts >= horizon}
+
+            self._last_refresh = time.monotonic()
+            self._refreshes += 1
+            self._last_refresh_ms = int((time.time() - start_time) * 1000)
+
+        if added:
+            logger.info(f"Precedent store loaded {added} resolution(s) in {self._last_refresh_ms}ms")
+        return added
+
+    def stats(self):
+        with self._lock:
+            age = None if self._last_refresh is None else round(time.monotonic() - self._last_refresh, 1)
+            return {
+                "event_types": len(self._by_type),
+                "precedents": sum(len(p) for p in self._by_type.values()),
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+                "seconds_since_refresh": age,
+                "max_staleness_seconds": self.max_staleness,
+                "hits": self._hits,
+                "stale_misses": self._stale_misses,
+                "refreshes": self._refreshes,
+                "refresh_errors": self._refresh_errors,
+                "last_refresh_ms": self._last_refresh_ms,
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                with self._lock:
+                    self._refresh_errors += 1
+                logger.warning(f"Precedent store refresh failed: {e}")
+            self._stop.wait(self.refresh_interval)
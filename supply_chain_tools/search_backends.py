@@ -0,0 +1,251 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+"""
+Pluggable search backends for the /search tool.
+
+Every backend implements `search(query, limit)` and returns a list of
+{"id", "title", "content", "url", "uri"} dicts, so the route can apply the
+same quality / customer filters regardless of where results came from.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from google.cloud import discoveryengine
+
+from kb_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+
+class SearchBackend:
+    name = "base"
+
+    def search(self, query, limit):
+        raise NotImplementedError
+
+    def search_with_status(self, query, limit):
+        """Returns (results, degraded); degraded is True when a fallback answered instead of the backend."""
+        return self.search(query, limit), False
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+# --- DISCOVERY ENGINE (VERTEX AI SEARCH) ---
+class DiscoveryEngineBackend(SearchBackend):
+    name = "discovery"
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def search(self, query, limit):
+        client = self.pool.search_client()
+
+        req = discoveryengine.SearchRequest(
+            serving_config=self.pool.serving_config,
+            query=query,
+            page_size=limit,
+            content_search_spec={"snippet_spec": {"return_snippet": True}, "extractive_content_spec": {"max_extractive_answer_count": 1}}
+        )
+
+        search_results = client.search(req)
+
+        results = []
+        for result in search_results.results:
+            content = ""
+            if result.document.derived_struct_data:
+                 snippets = result.document.derived_struct_data.get('snippets', [])
+                 content_parts = []
+                 for snippet in snippets:
+                     # Handle MapComposite/Struct by trying to access 'snippet' or defaulting to str
+                     if hasattr(snippet, 'get'):
+                         content_parts.append(snippet.get('snippet', ''))
+                     else:
+                         content_parts.append(str(snippet))
+                 content = "\n...\n".join([c for c in content_parts if c])
+
+            # Extract URI and Title
+            uri = ""
+            title = "Unknown"
+
+            # Try to find URI in derived data first (often better populated)
+            if result.document.derived_struct_data:
+                 link = result.document.derived_struct_data.get('link', '')
+                 if link:
+                     uri = link
+
+            # Fallback to direct content uri
+            if not uri and result.document.content and result.document.content.uri:
+                uri = result.document.content.uri
+
+            # Determine Title from URI if not in struct_data
+            if result.document.struct_data:
+                title = result.document.struct_data.get('title', 'Unknown')
+
+            if title == "Unknown" and uri:
+                title = uri.split('/')[-1]
+
+            # Generate Public/Console URL
+            url = uri
+            if uri.startswith("gs://"):
+                # Convert gs://bucket/path -> https://storage.googleapis.com/bucket/path (Public)
+                url = uri.replace("gs://", "https://storage.googleapis.com/")
+
+            results.append({
+                "id": result.document.id,
+                "title": title,
+                "content": content or "No content snippet.",
+                "url": url,
+                "uri": uri
+            })
+        return results
+
+
+# --- SIMULATION (MOCK DOCS) ---
+class SimulationBackend(SearchBackend):
+    name = "simulation"
+
+    MOCK_DOCS = [
+            {
+                "id": "doc-vip-900",
+                "title": "MSA - Global Retail VIP",
+                "content": "SERVICE LEVEL AGREEMENT (SLA)\nProvider guarantees 98% on-time delivery for all shipments.\nFor VIP Platinum tier, any LATE SHIPMENT exceeding 24 hours requires immediate remediation via expedited replacement.\nDelayed shipments trigger a 5% penalty clause.",
+                "keywords": ["vip", "retail", "techgiant", "late", "shipment"]
+            },
+            {
+                "id": "doc-sla-001",
+                "title": "SOP - HealthPlus Pharma",
+                "content": "TEMPERATURE CONTROL\nAll shipments must be maintained between 2°C and 8°C. Any excursion above 8°C for more than 4 hours renders the product 'Adulterated'.",
+                "keywords": ["pharma", "health", "temperature", "vaccine", "insulin"]
+            },
+            {
+                 "id": "doc-ops-202",
+                 "title": "SOP - Inventory Shortage Resolution",
+                 "content": "INVENTORY ALLOCATION\nWhen stock < demand:\n1. Search alternate DCs within 500 miles.\n2. If not available, offer similar SKU substitution (requires customer consent).\n3. Cancel order if no resolution within 48h.",
+                 "keywords": ["inventory", "shortage", "stock", "retail", "techgiant"]
+            }
+        ]
+
+    def search(self, query, limit):
+        # Simple keyword matching
+        query_lower = query.lower()
+        results = [
+            d for d in self.MOCK_DOCS
+            if any(k in query_lower for k in d['keywords']) or query_lower == ""
+        ][:limit]
+
+        # Fallback if no match
+        return results or list(self.MOCK_DOCS)
+
+
+# --- EMBEDDED BM25 INDEX ---
+class BM25Backend(SearchBackend):
+    """
+    Local knowledge-base search. Loads `snapshot_path` if it exists, otherwise
+    builds the index from `docs_dir` (and writes the snapshot for next time).
+    """
+    name = "bm25"
+
+    def __init__(self, docs_dir=None, snapshot_path=None):
+        self.docs_dir = docs_dir
+        self.snapshot_path = snapshot_path
+        self.index = BM25Index()
+        self.load_ms = 0
+
+        start_time = time.time()
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.index = BM25Index.load(snapshot_path)
+        elif docs_dir and os.path.isdir(docs_dir):
+            self.index = BM25Index.from_directory(docs_dir)
+            if snapshot_path:
+                try:
+                    self.index.save(snapshot_path)
+                except OSError as e:
+                    logger.warning(f"Could not write BM25 snapshot to {snapshot_path}: {e}")
+        else:
+            logger.warning(f"BM25 backend has no documents (KB_DOCS_DIR={docs_dir}, KB_INDEX_SNAPSHOT={snapshot_path})")
+        self.load_ms = int((time.time() - start_time) * 1000)
+
+    def search(self, query, limit):
+        results = self.index.search(query, limit=limit)
+        for doc in results:
+            doc.pop("score", None)
+        return results
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "documents": len(self.index),
+            "terms": len(self.index.postings),
+            "load_ms": self.load_ms,
+        }
+
+
+# --- PRIMARY WITH LOCAL FALLBACK ---
+class FallbackBackend(SearchBackend):
+    """
+    Queries `primary` with a deadline; if it errors or is slower than
+    `timeout` seconds, answers from `fallback` instead (reported as degraded
+    by `search_with_status`, so callers can avoid caching it).
+    """
+    name = "fallback"
+
+    def __init__(self, primary, fallback, timeout=1.5, max_workers=8):
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-primary")
+        self._lock = threading.Lock()
+        self._fallbacks = 0
+        self._primary_ok = 0
+
+    def search(self, query, limit):
+        return self.search_with_status(query, limit)[0]
+
+    def search_with_status(self, query, limit):
+        future = self._executor.submit(self.primary.search, query, limit)
+        try:
+            results = future.result(timeout=self.timeout)
+            with self._lock:
+                self._primary_ok += 1
+            return results, False
+        except FutureTimeoutError:
+            logger.warning(f"{self.primary.name} search exceeded {self.timeout}s; using {self.fallback.name}")
+        except Exception as e:
+            logger.warning(f"{self.primary.name} search failed ({e}); using {self.fallback.name}")
+        with self._lock:
+            self._fallbacks += 1
+        return self.fallback.search(query, limit), True
+
+    def stats(self):
+        with self._lock:
+            primary_ok, fallbacks = self._primary_ok, self._fallbacks
+        return {
+            "backend": f"{self.primary.name}+{self.fallback.name}",
+            "timeout_seconds": self.timeout,
+            "primary_ok": primary_ok,
+            "fallbacks": fallbacks,
+            "primary": self.primary.stats(),
+            "fallback": self.fallback.stats(),
+        }
+
+
+def build_search_backend(name, discovery_pool, docs_dir=None, snapshot_path=None, fallback_timeout=1.5):
+    """
+    name: "discovery" (default), "bm25", or "discovery+bm25" (Discovery Engine
+    with the local index as a fallback when it is slow or failing).
+    """
+    if name == "bm25":
+        return BM25Backend(docs_dir, snapshot_path)
+    if name == "discovery+bm25":
+        return FallbackBackend(
+            DiscoveryEngineBackend(discovery_pool),
+            BM25Backend(docs_dir, snapshot_path),
+            timeout=fallback_timeout,
+        )
+    if name != "discovery":
+        logger.warning(f"Unknown SEARCH_BACKEND '{name}', using discovery")
+    return DiscoveryEngineBackend(discovery_pool)
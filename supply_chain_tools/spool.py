@@ -0,0 +1,256 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+import json
+import logging
+import os
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+OFFSET_SUFFIX = ".offset"
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+
+
+class DecisionLogSpool:
+    """
+    Disk-backed, append-only spool for decision log rows that could not be
+    written to BigQuery.
+
+    Rows are appended to numbered segment files, one record per line in the
+    form `<crc32-hex>\\t<json>`. Segments are replayed oldest-first and deleted
+    once every record in them has been accepted; a `.offset` sidecar records
+    progress inside the segment being replayed so a crash mid-replay does not
+    resend rows that were already written.
+
+    Disk usage is capped at `max_bytes`. When the cap is hit the overflow
+    policy decides what is lost:
+        drop_oldest - delete the oldest segments to make room (default)
+        drop_newest - reject the incoming rows
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, segment_max_bytes=8 * 1024 * 1024,
+                 overflow_policy=OVERFLOW_DROP_OLDEST):
+        if overflow_policy not in (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST):
+            raise ValueError(f"Unknown spool overflow policy: {overflow_policy}")
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_max_bytes = segment_max_bytes
+        self.overflow_policy = overflow_policy
+
+        self._lock = threading.Lock()
+        self._active = None  # (seq, file handle)
+        self._rows_spooled = 0
+        self._rows_replayed = 0
+        self._rows_dropped = 0
+        self._corrupt_records = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._next_seq = max(self._segment_seqs(), default=0) + 1
+        pending = self._segment_seqs()
+        if pending:
+            logger.info(f"Decision log spool found {len(pending)} segment(s) from a previous run in {self.directory}")
+
+    # --- WRITE PATH ---
+
+    def append(self, rows):
+        """
+        Appends rows to the active segment. Returns the number of rows accepted.
+        """
+        if not rows:
+            return 0
+        records = [self._encode(row) for row in rows]
+        size = sum(len(r) for r in records)
+
+        with self._lock:
+            if not self._make_room(size):
+                self._rows_dropped += len(rows)
+                logger.error(f"Decision log spool full ({self.max_bytes} bytes). Dropping {len(rows)} new row(s).")
+                return 0
+
+            seq, handle = self._active_segment()
+            handle.write(b"".join(records))
+            handle.flush()
+            os.fsync(handle.fileno())
+            self._rows_spooled += len(rows)
+
+            if handle.tell() >= self.segment_max_bytes:
+                self._seal_active()
+        return len(rows)
+
+    def has_pending(self):
+        with self._lock:
+            return bool(self._segment_seqs())
+
+    # --- REPLAY PATH ---
+
+    def replay(self, insert_batch, batch_size=500):
+        """
+        Sends spooled rows, in order, through `insert_batch(rows)`.
+
+        `insert_batch` must raise on a transient failure; replay then stops and
+        the remaining rows stay on disk for the next attempt. Returns the
+        number of rows replayed.
+        """
+        replayed = 0
+        while True:
+            with self._lock:
+                seqs = self._segment_seqs()
+                if not seqs:
+                    return replayed
+                seq = seqs[0]
+                if self._active and self._active[0] == seq:
+                    self._seal_active()
+
+            path = self._segment_path(seq)
+            offset = self._read_offset(seq)
+            batch, batch_end = [], offset
+
+            with open(path, "rb") as handle:
+                handle.seek(offset)
+                for line in handle:
+                    row = self._decode(line)
+                    batch_end += len(line)
+                    if row is None:
+                        continue
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        insert_batch(batch)
+                        replayed += len(batch)
+                        self._commit_progress(seq, batch_end, len(batch))
+                        batch = []
+
+            if batch:
+                insert_batch(batch)
+                replayed += len(batch)
+                self._commit_progress(seq, batch_end, len(batch))
+
+            with self._lock:
+                self._remove_segment(seq)
+
+    def stats(self):
+        with self._lock:
+            seqs = self._segment_seqs()
+            return {
+                "directory": self.directory,
+                "pending_segments": len(seqs),
+                "disk_bytes": self._disk_bytes(seqs),
+                "max_bytes": self.max_bytes,
+                "overflow_policy": self.overflow_policy,
+                "rows_spooled": self._rows_spooled,
+                "rows_replayed": self._rows_replayed,
+                "rows_dropped": self._rows_dropped,
+                "corrupt_records": self._corrupt_records,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._active:
+                self._active[1].close()
+                self._active = None
+
+    # --- INTERNALS (callers hold self._lock unless noted) ---
+
+    @staticmethod
+    def _encode(row):
+        payload = json.dumps(row, separators=(",", ":"), default=str).encode("utf-8")
+        return b"%08x\t%s\n" % (zlib.crc32(payload), payload)
+
+    def _decode(self, line):
+        """Returns the row, or None if the record fails its checksum (torn write)."""
+        try:
+            checksum, payload = line.rstrip(b"\n").split(b"\t", 1)
+            if int(checksum, 16) != zlib.crc32(payload):
+                raise ValueError("checksum mismatch")
+            return json.loads(payload)
+        except ValueError as e:
+            with self._lock:
+                self._corrupt_records += 1
+            logger.error(f"Skipping corrupt decision log spool record: {e}")
+            return None
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{seq:012d}{SEGMENT_SUFFIX}")
+
+    def _segment_seqs(self):
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    seqs.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(seqs)
+
+    def _disk_bytes(self, seqs):
+        total = 0
+        for seq in seqs:
+            try:
+                total += os.path.getsize(self._segment_path(seq))
+            except OSError:
+                pass
+        return total
+
+    def _active_segment(self):
+        if self._active is None:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._active = (seq, open(self._segment_path(seq), "ab"))
+        return self._active
+
+    def _seal_active(self):
+        if self._active:
+            self._active[1].close()
+            self._active = None
+
+    def _make_room(self, incoming):
+        seqs = self._segment_seqs()
+        used = self._disk_bytes(seqs)
+        if used + incoming <= self.max_bytes:
+            return True
+        if self.overflow_policy == OVERFLOW_DROP_NEWEST:
+            return False
+
+        for seq in seqs:
+            if used + incoming <= self.max_bytes:
+                break
+            if self._active and self._active[0] == seq:
+                self._seal_active()
+            path = self._segment_path(seq)
+            size = os.path.getsize(path)
+            with open(path, "rb") as handle:
+                dropped = sum(1 for _ in handle)
+            self._remove_segment(seq)
+            self._rows_dropped += dropped
+            used -= size
+            logger.error(f"Decision log spool full. Dropped oldest segment {seq} ({dropped} row(s)).")
+        return used + incoming <= self.max_bytes
+
+    def _remove_segment(self, seq):
+        for path in (self._segment_path(seq), self._segment_path(seq) + OFFSET_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _read_offset(self, seq):
+        try:
+            with open(self._segment_path(seq) + OFFSET_SUFFIX) as handle:
+                return int(handle.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _commit_progress(self, seq, offset, rows):
+        """Called without the lock held; the offset file is replaced atomically."""
+        path = self._segment_path(seq) + OFFSET_SUFFIX
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as handle:
+            handle.write(str(offset))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._rows_replayed += rows
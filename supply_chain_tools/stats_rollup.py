@@ -0,0 +1,178 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+import datetime
+import logging
+import threading
+import time
+from collections import Counter
+
+from google.cloud import bigquery
+
+logger = logging.getLogger(__name__)
+
+
+def _utc_today():
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+class DashboardRollup:
+    """
+    Daily per-action decision counters behind /dashboard/stats.
+
+    Past days are loaded from BigQuery once (a single GROUP BY over the
+    retention window). Today's bucket starts from a BigQuery baseline and is
+    then incremented by `record()` for every row this service logs; it is
+    re-synced every `resync_interval` seconds so rows written by other
+    instances show up too. After UTC midnight the previous day is re-synced
+    along with today until a resync runs at least `resync_interval` into the
+    new day, so its late rows from other instances are counted before it is
+    frozen. A resync keeps the larger of the local and BigQuery count per
+    action, because rows this service logged may not have landed yet. Any
+    `days` window is answered by summing buckets, without a BigQuery job.
+    """
+
+    def __init__(self, client, table_id, retention_days=90, resync_interval=300.0):
+        self.client = client
+        self.table_id = table_id
+        self.retention_days = retention_days
+        self.resync_interval = resync_interval
+
+        self._buckets = {}   # date -> Counter(action_name -> count)
+        self._today = None
+        self._unsettled = None  # previous day, re-synced with today until it has settled
+        self._loaded = False
+        self._last_resync = 0.0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+        self._queries_served = 0
+        self._bq_jobs = 0
+
+    # --- WRITE PATH ---
+
+    def record(self, row):
+        """Counts a decision row logged by this service (rows carry an ISO timestamp)."""
+        try:
+            day = datetime.datetime.fromisoformat(row["timestamp"]).astimezone(datetime.timezone.utc).date()
+        except (KeyError, TypeError, ValueError):
+            day = _utc_today()
+        with self._lock:
+            if not self._loaded:
+                # The initial load will pick this row up from BigQuery
+                return
+            self._roll_over()
+            self._buckets.setdefault(day, Counter())[row.get("action_name")] += 1
+
+    # --- READ PATH ---
+
+    def query(self, days):
+        """
+        Returns [{"date", "action", "count"}] for the last `days` calendar
+        days (UTC, today included), oldest first.
+        """
+        self._ensure_fresh()
+        cutoff = _utc_today() - datetime.timedelta(days=days - 1)
+        with self._lock:
+            self._roll_over()
+            self._queries_served += 1
+            results = []
+            for day in sorted(d for d in self._buckets if d >= cutoff):
+                for action, count in sorted(self._buckets[day].items(), key=lambda item: str(item[0])):
+                    results.append({"date": day.isoformat(), "action": action, "count": count})
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "days": len(self._buckets),
+                "retention_days": self.retention_days,
+                "seconds_since_resync": round(time.monotonic() - self._last_resync, 1) if self._loaded else None,
+                "queries_served": self._queries_served,
+                "bigquery_jobs": self._bq_jobs,
+            }
+
+    # --- INTERNALS ---
+
+    def _roll_over(self):
+        """Caller holds self._lock. Starts a new bucket at UTC midnight and trims old ones."""
+        today = _utc_today()
+        if today != self._today:
+            if self._today is not None:
+                self._unsettled = self._today
+            self._today = today
+            self._buckets.setdefault(today, Counter())
+            oldest = today - datetime.timedelta(days=self.retention_days)
+            for day in [d for d in self._buckets if d < oldest]:
+                del self._buckets[day]
+
+    def _needs_resync(self):
+        return _utc_today() != self._today or time.monotonic() - self._last_resync >= self.resync_interval
+
+    def _ensure_fresh(self):
+        if self._loaded and not self._needs_resync():
+            return
+        # One loader at a time; concurrent dashboard refreshes wait for its result
+        with self._load_lock:
+            if not self._loaded:
+                self._load_history()
+            elif self._needs_resync():
+                self._resync_recent()
+
+    def _run_counts(self, where_clause, params):
+        query = f"""
+            SELECT
+                DATE(timestamp) as date,
+                action_name,
+                COUNT(*) as count
+            FROM `{self.table_id}`
+            WHERE {where_clause}
+            GROUP BY 1, 2
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=params)
+        self._bq_jobs += 1
+        buckets = {}
+        for row in self.client.query(query, job_config=job_config):
+            buckets.setdefault(row.date, Counter())[row.action_name] += row.count
+        return buckets
+
+    def _load_history(self):
+        start_time = time.time()
+        buckets = self._run_counts(
+            "timestamp >= TIMESTAMP(DATE_SUB(CURRENT_DATE(), INTERVAL @days DAY))",
+            [bigquery.ScalarQueryParameter("days", "INT64", self.retention_days)],
+        )
+        with self._lock:
+            self._buckets = buckets
+            self._today = None
+            self._roll_over()
+            self._loaded = True
+            self._last_resync = time.monotonic()
+        logger.info(f"Loaded {len(buckets)} day(s) of decision rollups in {int((time.time() - start_time) * 1000)}ms")
+
+    def _resync_recent(self):
+        """Re-counts today, and the previous day while it is unsettled, from BigQuery."""
+        with self._lock:
+            self._roll_over()
+            today = self._today
+            first_day = self._unsettled or today
+        started = datetime.datetime.now(datetime.timezone.utc)
+        buckets = self._run_counts(
+            "timestamp >= TIMESTAMP(@first_day)",
+            [bigquery.ScalarQueryParameter("first_day", "DATE", first_day)],
+        )
+        with self._lock:
+            day = first_day
+            while day <= today:
+                # Rows already counted by record() may still be queued in the decision log
+                # writer or its spool; keeping the larger count stops totals going backwards
+                local = self._buckets.get(day, Counter())
+                remote = buckets.get(day, Counter())
+                self._buckets[day] = Counter({
+                    action: max(local[action], remote[action]) for action in set(local) | set(remote)
+                })
+                day += datetime.timedelta(days=1)
+            self._last_resync = time.monotonic()
+            midnight = datetime.datetime.combine(today, datetime.time(), tzinfo=datetime.timezone.utc)
+            if self._unsettled == first_day and (started - midnight).total_seconds() >= self.resync_interval:
+                self._unsettled = None
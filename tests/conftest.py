@@ -0,0 +1,14 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each service imports its modules as top-level modules (see the ImportError
+# fallback in controltower/agent.py and the flat imports in the backends), so
+# the tests do too. That also keeps the controltower package __init__, which
+# needs Vertex AI, from loading.
+for service_dir in ("controltower", os.path.join("scct_unified", "backend"), "supply_chain_tools"):
+    sys.path.insert(0, os.path.join(ROOT, service_dir))
@@ -0,0 +1,90 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, priority_of
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_priority_orders_tier_before_severity():
+    vip_low, _ = priority_of({"customer": {"tier": "VIP"}, "severity": "LOW"})
+    standard_critical, _ = priority_of({"customer": {"tier": "STANDARD"}, "severity": "CRITICAL"})
+    unknown, label = priority_of({})
+    assert vip_low < standard_critical < unknown
+    assert label == "UNKNOWN"
+
+
+def test_waiters_are_admitted_in_priority_order():
+    controller = AdmissionController(max_concurrency=1, max_queue=10, queue_deadline=5)
+    running = controller.acquire(5)
+    admitted = []
+
+    def wait(priority):
+        ticket = controller.acquire(priority)
+        admitted.append(priority)
+        controller.release(ticket)
+
+    threads = []
+    for priority in (9, 1, 5):
+        thread = threading.Thread(target=wait, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        _wait_until(lambda: controller.stats()["queued"] == len(threads))
+    controller.release(running)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert admitted == [1, 5, 9]
+
+
+def test_full_queue_rejects_a_request_that_does_not_outrank_the_worst_waiter():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_deadline=5)
+    running = controller.acquire(0)
+    waiter = threading.Thread(target=lambda: controller.release(controller.acquire(3)))
+    waiter.start()
+    _wait_until(lambda: controller.stats()["queued"] == 1)
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire(7)
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+    controller.release(running)
+    waiter.join(timeout=5)
+
+
+def test_higher_priority_request_displaces_the_worst_waiter():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_deadline=5)
+    running = controller.acquire(0)
+    outcome = {}
+
+    def low_priority():
+        try:
+            controller.acquire(9)
+        except AdmissionRejected as e:
+            outcome["reason"] = e.reason
+
+    thread = threading.Thread(target=low_priority)
+    thread.start()
+    _wait_until(lambda: controller.stats()["queued"] == 1)
+    threading.Timer(0.2, controller.release, args=(running,)).start()
+    ticket = controller.acquire(1)
+    thread.join(timeout=5)
+    assert outcome["reason"] == "displaced"
+    assert ticket.state == "admitted"
+
+
+def test_waiter_gives_up_at_its_deadline():
+    controller = AdmissionController(max_concurrency=1, queue_deadline=0.1)
+    controller.acquire(0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire(1)
+    assert rejected.value.reason == "deadline"
+    assert controller.stats()["queued"] == 0
@@ -0,0 +1,55 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import threading
+
+import pytest
+
+pytest.importorskip("vertexai")
+
+from agent_sessions import SessionRegistry  # noqa: E402
+
+
+class FakeAgent:
+    def __init__(self):
+        self.created = 0
+        self.deleted = []
+        self.deleted_event = threading.Event()
+
+    def create_session(self, user_id):
+        self.created += 1
+        return {"id": f"session-{self.created}"}
+
+    def delete_session(self, user_id, session_id):
+        self.deleted.append(session_id)
+        self.deleted_event.set()
+
+
+class FakeHandle:
+    def __init__(self):
+        self.agent = FakeAgent()
+
+    def get(self):
+        return self.agent
+
+
+def test_keyed_session_is_reused_and_kept():
+    handle = FakeHandle()
+    registry = SessionRegistry(handle)
+    session_id, reused = registry.acquire("u", "incident-1")
+    registry.release("u", "incident-1", session_id)
+    assert registry.acquire("u", "incident-1") == (session_id, True)
+    assert handle.agent.deleted == []
+
+
+def test_one_off_session_for_a_busy_key_is_deleted_on_release():
+    handle = FakeHandle()
+    registry = SessionRegistry(handle)
+    keyed, _ = registry.acquire("u", "incident-1")
+    one_off, reused = registry.acquire("u", "incident-1")
+    assert not reused and one_off != keyed
+
+    registry.release("u", "incident-1", one_off)
+    assert handle.agent.deleted_event.wait(2)
+    assert handle.agent.deleted == [one_off]
+    assert registry.stats()["sessions"] == 1
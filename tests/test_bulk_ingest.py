@@ -0,0 +1,51 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import threading
+
+from bulk_ingest import FairQueue
+
+
+def _drain(queue):
+    queue.close()
+    groups = []
+    while (group := queue.get()) is not None:
+        groups.append(group)
+    return groups
+
+
+def test_customers_are_served_round_robin():
+    queue = FairQueue(max_items=100)
+    for n in range(3):
+        queue.put("burst", [f"burst-{n}"])
+    queue.put("quiet", ["quiet-0"])
+    assert [g[0] for g in _drain(queue)] == ["burst-0", "quiet-0", "burst-1", "burst-2"]
+
+
+def test_size_counts_records_not_groups():
+    queue = FairQueue(max_items=5)
+    queue.put("a", ["r1", "r2", "r3"])
+    queue.put("b", ["r4"])
+    assert len(queue) == 4
+
+    blocked = threading.Event()
+    done = threading.Event()
+
+    def put_group():
+        blocked.set()
+        queue.put("c", ["r5", "r6"])
+        done.set()
+
+    threading.Thread(target=put_group, daemon=True).start()
+    blocked.wait()
+    # 4 + 2 records would exceed max_items, so the producer waits
+    assert not done.wait(0.2)
+    assert queue.get() == ["r1", "r2", "r3"]
+    assert done.wait(2)
+    assert len(queue) == 3
+
+
+def test_oversized_group_is_accepted_into_an_empty_queue():
+    queue = FairQueue(max_items=2)
+    queue.put("a", ["r1", "r2", "r3"])
+    assert len(queue) == 3
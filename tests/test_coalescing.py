@@ -0,0 +1,76 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import threading
+import time
+
+from coalescing import Coalescer, merge_events
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.groups = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, items):
+        time.sleep(self.delay)
+        with self.lock:
+            self.groups.append(list(items))
+
+
+def test_items_for_a_key_are_flushed_together_after_the_window():
+    flushed = Recorder()
+    coalescer = Coalescer(flushed, window=0.1, max_wait=5)
+    coalescer.add("SHP-1", "late")
+    coalescer.add("SHP-2", "weather")
+    coalescer.add("SHP-1", "late again")
+    time.sleep(0.4)
+    assert sorted(flushed.groups) == [["late", "late again"], ["weather"]]
+    coalescer.close()
+
+
+def test_a_key_that_keeps_reporting_is_flushed_at_max_wait():
+    flushed = Recorder()
+    coalescer = Coalescer(flushed, window=0.2, max_wait=0.3)
+    start = time.monotonic()
+    while time.monotonic() - start < 0.6 and not flushed.groups:
+        coalescer.add("SHP-1", "update")
+        time.sleep(0.05)
+    assert flushed.groups, "group was never flushed while reports kept arriving"
+    coalescer.close()
+
+
+def test_close_flushes_everything_still_held():
+    flushed = Recorder()
+    coalescer = Coalescer(flushed, window=60, max_wait=60)
+    coalescer.add("SHP-1", "a")
+    coalescer.close()
+    assert flushed.groups == [["a"]]
+
+
+def test_add_blocks_while_max_pending_items_are_held():
+    flushed = Recorder(delay=0.3)
+    coalescer = Coalescer(flushed, window=60, max_wait=60, max_pending=2)
+    coalescer.add("SHP-1", "a")
+    coalescer.add("SHP-2", "b")
+
+    added = threading.Event()
+    threading.Thread(target=lambda: (coalescer.add("SHP-3", "c"), added.set()), daemon=True).start()
+    # At capacity: the oldest group is released early, but add() waits until its flush returns
+    assert not added.wait(0.15)
+    assert added.wait(2)
+    assert flushed.groups[0] == ["a"]
+    coalescer.close()
+
+
+def test_merge_keeps_the_latest_report_and_highest_severity():
+    merged = merge_events([
+        {"id": "E1", "type": "LATE_SHIPMENT", "severity": "CRITICAL", "description": "first",
+         "timestamp": "2026-10-16T10:00:00Z"},
+        {"id": "E2", "type": "WEATHER_DELAY", "severity": "MEDIUM", "description": "second",
+         "timestamp": "2026-10-16T10:02:00Z"},
+    ])
+    assert merged["id"] == "E2"
+    assert merged["severity"] == "CRITICAL"
+    assert merged["coalesced_event_ids"] == ["E1", "E2"]
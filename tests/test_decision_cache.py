@@ -0,0 +1,39 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+from decision_cache import fingerprint
+from rules import extract_features
+
+
+def _event(severity, description):
+    return {
+        "id": "EVT-AUTO-1",
+        "type": "LATE_SHIPMENT",
+        "severity": severity,
+        "description": description,
+        "customer": {"name": "Detroit Motors", "tier": "VIP"},
+        "shipment": {"id": "SHP-1", "items": ["Brake calipers"], "value": 20000},
+    }
+
+
+def _key(event):
+    return fingerprint(event, extract_features(event))
+
+
+def test_line_down_threat_does_not_reuse_a_routine_delay_decision():
+    routine = _event("HIGH", "Carrier delayed by snow, new ETA tomorrow.")
+    line_down = _event("CRITICAL", "Line Down Threat: plant has 3 hours of parts left.")
+    assert _key(routine) != _key(line_down)
+
+
+def test_severity_alone_changes_the_fingerprint():
+    description = "Carrier delayed by snow, new ETA tomorrow."
+    assert _key(_event("MEDIUM", description)) != _key(_event("CRITICAL", description))
+
+
+def test_line_down_risk_alone_changes_the_fingerprint():
+    assert _key(_event("HIGH", "Carrier delayed.")) != _key(_event("HIGH", "Carrier delayed, line down risk."))
+
+
+def test_identical_events_share_a_fingerprint():
+    assert _key(_event("HIGH", "Carrier delayed.")) == _key(_event("HIGH", "Carrier delayed."))
@@ -0,0 +1,53 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import threading
+import time
+
+from idempotency import CONFLICT, IN_PROGRESS, OWNER, REPLAY, IdempotencyStore, fingerprint
+
+BODY = fingerprint(b'{"shipment_id": "SHP-1"}')
+
+
+def test_first_claim_owns_and_repeat_replays():
+    store = IdempotencyStore()
+    assert store.claim("k", BODY) == (OWNER, None)
+    store.complete("k", ("body", 200))
+    assert store.claim("k", BODY) == (REPLAY, ("body", 200))
+
+
+def test_key_reused_with_another_body_conflicts():
+    store = IdempotencyStore()
+    store.claim("k", BODY)
+    assert store.claim("k", fingerprint(b"{}"))[0] == CONFLICT
+
+
+def test_repeat_waits_for_the_in_flight_response():
+    store = IdempotencyStore(wait_timeout=5)
+    store.claim("k", BODY)
+    threading.Timer(0.1, store.complete, args=("k", ("body", 200))).start()
+    assert store.claim("k", BODY) == (REPLAY, ("body", 200))
+    assert store.stats()["waited"] == 1
+
+
+def test_repeat_gives_up_after_the_wait_timeout():
+    store = IdempotencyStore(wait_timeout=0.1)
+    store.claim("k", BODY)
+    start = time.monotonic()
+    assert store.claim("k", BODY) == (IN_PROGRESS, None)
+    assert time.monotonic() - start < 2
+
+
+def test_abandoned_claim_lets_a_waiting_repeat_run_for_real():
+    store = IdempotencyStore(wait_timeout=5)
+    store.claim("k", BODY)
+    threading.Timer(0.1, store.abandon, args=("k",)).start()
+    assert store.claim("k", BODY) == (OWNER, None)
+
+
+def test_expired_response_is_not_replayed():
+    store = IdempotencyStore(ttl_seconds=0.05)
+    store.claim("k", BODY)
+    store.complete("k", ("body", 200))
+    time.sleep(0.1)
+    assert store.claim("k", BODY) == (OWNER, None)
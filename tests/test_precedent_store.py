@@ -0,0 +1,61 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import datetime
+from collections import namedtuple
+
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+from precedent_store import PrecedentStore  # noqa: E402
+
+Row = namedtuple("Row", "event_type event_id reasoning action_name execution_status timestamp")
+T0 = datetime.datetime(2026, 10, 16, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+def _row(event_id, minutes, event_type="LATE_SHIPMENT"):
+    return Row(event_type, event_id, "", "update_eta", "SUCCESS", T0 + datetime.timedelta(minutes=minutes))
+
+
+class FakeClient:
+    """Answers each refresh with the next batch of rows."""
+
+    def __init__(self, *batches):
+        self.batches = list(batches)
+
+    def query(self, query, job_config=None):
+        return self.batches.pop(0)
+
+
+def _ids(store, limit=10):
+    return [p["event id"] for p in store.lookup("LATE", limit)]
+
+
+def test_row_landing_behind_the_watermark_is_picked_up():
+    store = PrecedentStore(FakeClient(
+        [_row("a", 0), _row("c", 10)],
+        # "b" was logged at minute 5 but only landed now (batched writer / spool replay)
+        [_row("a", 0), _row("b", 5), _row("c", 10)],
+    ), "r", "e")
+    store.refresh()
+    assert store.refresh() == 1
+    assert _ids(store) == ["c", "b", "a"]
+
+
+def test_rows_already_loaded_are_not_duplicated():
+    store = PrecedentStore(FakeClient([_row("a", 0)], [_row("a", 0)], [_row("a", 0)]), "r", "e")
+    store.refresh()
+    assert store.refresh() == 0
+    assert store.refresh() == 0
+    assert _ids(store) == ["a"]
+
+
+def test_late_row_does_not_evict_newer_precedents():
+    store = PrecedentStore(FakeClient(
+        [_row("b", 5), _row("c", 10)],
+        [_row("old", 1), _row("b", 5), _row("c", 10)],
+    ), "r", "e", per_type=2)
+    store.refresh()
+    store.refresh()
+    assert _ids(store) == ["c", "b"]
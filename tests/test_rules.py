@@ -0,0 +1,90 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import json
+
+import pytest
+
+from rules import PATH_FAST, PATH_LLM, FastPathResolver
+
+
+def _message(description, customer="MediLife Pharma", items=("Insulin",), event_type="LATE_SHIPMENT",
+             severity="MEDIUM", value=20000):
+    event = {
+        "id": "EVT-1",
+        "type": event_type,
+        "severity": severity,
+        "description": description,
+        "customer": {"name": customer, "tier": "STANDARD"},
+        "shipment": {"id": "SHP-1", "items": list(items), "value": value,
+                     "predictedDelivery": "2026-10-20T12:00:00Z"},
+    }
+    return f"Handle this Supply Chain Exception:\nEvent Data: {json.dumps(event)}"
+
+
+def _decide(*args, **kwargs):
+    return FastPathResolver().decide(_message(*args, **kwargs))
+
+
+@pytest.mark.parametrize("description", [
+    "Temperature logs normal, carrier late.",
+    "Cold chain shipment delayed by weather.",
+    "Reefer container held at port, unit running.",
+    "Thermal blankets applied; logger shows 5°C.",
+])
+def test_temperature_mentions_without_an_excursion_go_to_the_llm(description):
+    decision = _decide(description)
+    assert decision.path == PATH_LLM
+    assert decision.action is None
+
+
+@pytest.mark.parametrize("description", [
+    "Cold chain excursion detected. Logger shows 25°C for 60 mins.",
+    "Refrigeration unit failure in transit. Temp > 8°C for 4 hours.",
+    "Logger reading 12 °C at the cross-dock.",
+    "Product held at -5°C overnight.",
+    "Readings out of range since departure.",
+])
+def test_explicit_pharma_excursions_take_the_fast_path(description):
+    decision = _decide(description)
+    assert decision.path == PATH_FAST
+    assert decision.rule_id == "PHARMA-TEMP-EXCURSION"
+    assert decision.action == "request_reshipment"
+
+
+def test_temperature_event_type_is_an_excursion():
+    decision = _decide("Sensor alarm raised.", event_type="TEMPERATURE_EXCURSION")
+    assert decision.rule_id == "PHARMA-TEMP-EXCURSION"
+
+
+def test_retail_delay_with_normal_temperature_is_not_spoiled():
+    decision = _decide("Temperature logs normal, carrier late.", customer="FreshMarket Inc", items=("Fresh produce",))
+    assert decision.rule_id != "RETAIL-PERISHABLE-TEMP-EXCURSION"
+    assert decision.path == PATH_LLM
+
+
+def test_high_severity_retail_delay_goes_to_the_llm():
+    decision = _decide("Pallet rejected at DC. Replacement stock needed within 24h.", customer="Global Mart",
+                       items=("Paper towels",), severity="HIGH")
+    assert decision.path == PATH_LLM
+
+
+def test_routine_retail_delay_takes_the_fast_path():
+    decision = _decide("Carrier delayed one day.", customer="Global Mart", items=("Paper towels",), severity="LOW")
+    assert decision.rule_id == "RETAIL-NON-PERISHABLE-DELAY"
+    assert decision.action == "update_eta"
+
+
+@pytest.mark.parametrize("description", [
+    "Route deviation detected, possible theft.",
+    "Seal broken on arrival at the hub.",
+])
+def test_insecure_high_tech_delay_goes_to_the_llm(description):
+    decision = _decide(description, customer="TechGiant Corp", items=("GPU",))
+    assert decision.path == PATH_LLM
+
+
+def test_line_down_phrasing_goes_to_the_llm():
+    decision = _decide("Snow delay; plant has 3 hours of parts left.", customer="Detroit Motors",
+                       items=("Brake calipers",))
+    assert decision.path == PATH_LLM
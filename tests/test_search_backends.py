@@ -0,0 +1,41 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import time
+
+import pytest
+
+pytest.importorskip("google.cloud.discoveryengine")
+
+from search_backends import FallbackBackend, SearchBackend  # noqa: E402
+
+
+class StaticBackend(SearchBackend):
+    def __init__(self, name, results, delay=0.0, error=None):
+        self.name = name
+        self.results = results
+        self.delay = delay
+        self.error = error
+
+    def search(self, query, limit):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.results[:limit]
+
+
+def test_primary_answer_is_not_degraded():
+    backend = FallbackBackend(StaticBackend("primary", [{"id": "p"}]), StaticBackend("local", [{"id": "f"}]))
+    assert backend.search_with_status("q", 5) == ([{"id": "p"}], False)
+    assert backend.stats()["primary_ok"] == 1
+
+
+@pytest.mark.parametrize("primary", [
+    StaticBackend("primary", [{"id": "p"}], delay=0.5),
+    StaticBackend("primary", [], error=RuntimeError("unavailable")),
+])
+def test_fallback_answer_is_reported_as_degraded(primary):
+    backend = FallbackBackend(primary, StaticBackend("local", [{"id": "f"}]), timeout=0.1)
+    assert backend.search_with_status("q", 5) == ([{"id": "f"}], True)
+    assert backend.search("q", 5) == [{"id": "f"}]
+    assert backend.stats()["fallbacks"] == 2
@@ -0,0 +1,69 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import datetime
+from collections import namedtuple
+
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+import stats_rollup  # noqa: E402
+from stats_rollup import DashboardRollup  # noqa: E402
+
+Row = namedtuple("Row", "date action_name count")
+DAY_1 = datetime.date(2026, 10, 15)
+DAY_2 = datetime.date(2026, 10, 16)
+
+
+class FakeClient:
+    """Answers every rollup query from `counts` ({date: {action: count}})."""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.queries = 0
+
+    def query(self, query, job_config=None):
+        self.queries += 1
+        return [Row(day, action, n) for day, actions in self.counts.items() for action, n in actions.items()]
+
+
+@pytest.fixture
+def today(monkeypatch):
+    current = [DAY_1]
+    monkeypatch.setattr(stats_rollup, "_utc_today", lambda: current[0])
+    return current
+
+
+def _counts(rollup, days):
+    return {(r["date"], r["action"]): r["count"] for r in rollup.query(days)}
+
+
+def test_days_window_covers_that_many_calendar_days(today):
+    today[0] = DAY_2
+    client = FakeClient({DAY_1 - datetime.timedelta(days=1): {"update_eta": 4}, DAY_1: {"update_eta": 2},
+                         DAY_2: {"update_eta": 1}})
+    rollup = DashboardRollup(client, "t")
+    assert set(_counts(rollup, 2)) == {(DAY_1.isoformat(), "update_eta"), (DAY_2.isoformat(), "update_eta")}
+
+
+def test_rollover_recounts_the_previous_day(today):
+    client = FakeClient({DAY_1: {"update_eta": 5}})
+    rollup = DashboardRollup(client, "t", resync_interval=3600)
+    assert _counts(rollup, 1) == {(DAY_1.isoformat(), "update_eta"): 5}
+
+    # Another instance logged 4 more rows late on day 1, then the day changed
+    client.counts = {DAY_1: {"update_eta": 9}, DAY_2: {"update_eta": 1}}
+    today[0] = DAY_2
+    counts = _counts(rollup, 2)
+    assert counts[(DAY_1.isoformat(), "update_eta")] == 9
+    assert counts[(DAY_2.isoformat(), "update_eta")] == 1
+
+
+def test_resync_does_not_drop_locally_recorded_rows(today):
+    client = FakeClient({DAY_1: {"update_eta": 5}})
+    rollup = DashboardRollup(client, "t", resync_interval=0)
+    rollup.query(1)
+    # Still queued in the decision log writer: BigQuery does not have it yet
+    rollup.record({"timestamp": f"{DAY_1.isoformat()}T10:00:00+00:00", "action_name": "update_eta"})
+    assert _counts(rollup, 1) == {(DAY_1.isoformat(), "update_eta"): 6}
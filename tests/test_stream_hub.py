@@ -0,0 +1,90 @@
+# Copyright 2026 Sathya Narayanan Annamalai Geetha
+# Licensed under the MIT License.
+
+import json
+import threading
+
+from stream_hub import StreamHub, query_key
+
+EVENT_QUERY = (
+    "Handle this Supply Chain Exception:\n"
+    "Event ID: EVT-AUTO-202\n"
+    f"Event Data: {json.dumps({'id': 'EVT-AUTO-202', 'shipment': {'id': 'SHP-9'}})}\n"
+)
+
+
+def _run(hub, query, user_id, session_key, runs):
+    """What /stream does: join the hub and, as leader, produce the frames of one upstream run."""
+    broadcast, is_leader = hub.join(query_key(query, user_id, session_key))
+    if is_leader:
+        runs.append(session_key)
+    return broadcast, is_leader
+
+
+def test_same_event_from_two_sessions_shares_one_upstream_run():
+    hub, runs = StreamHub(), []
+    first, first_leads = _run(hub, EVENT_QUERY, "public-guest", "ui-a:incident-EVT-AUTO-202", runs)
+    second, second_leads = _run(hub, EVENT_QUERY, "demo-user", "ui-b:incident-EVT-AUTO-202", runs)
+
+    assert (first_leads, second_leads) == (True, False)
+    assert second is first
+    assert len(runs) == 1
+    assert hub.stats()["upstream_runs"] == 1
+
+
+def test_both_subscribers_receive_every_frame():
+    hub, runs = StreamHub(), []
+    broadcast, _ = _run(hub, EVENT_QUERY, "u1", "s1", runs)
+    joined, _ = _run(hub, EVENT_QUERY, "u2", "s2", runs)
+    received = {}
+
+    def read(name, b):
+        received[name] = list(b.frames())
+
+    readers = [threading.Thread(target=read, args=(name, b)) for name, b in (("a", broadcast), ("b", joined))]
+    for reader in readers:
+        reader.start()
+    for n in range(3):
+        broadcast.append(f"data: {n}\n\n")
+    hub.finish(broadcast)
+    for reader in readers:
+        reader.join(timeout=5)
+
+    assert received["a"] == received["b"]
+    assert len(received["a"]) == 3
+
+
+def test_conversational_follow_ups_are_not_shared_across_sessions():
+    hub, runs = StreamHub(), []
+    _run(hub, "explain that", "public-guest", "ui-a:incident-1", runs)
+    _, second_leads = _run(hub, "explain that", "public-guest", "ui-b:incident-1", runs)
+    assert second_leads
+    assert len(runs) == 2
+
+
+def test_follow_up_is_shared_within_the_same_session():
+    assert query_key("Explain  that", "u", "s") == query_key("explain that", "u", "s")
+
+
+def test_finished_run_is_not_joined():
+    hub, runs = StreamHub(), []
+    broadcast, _ = _run(hub, EVENT_QUERY, "u1", "s1", runs)
+    hub.finish(broadcast)
+    _, leads = _run(hub, EVENT_QUERY, "u2", "s2", runs)
+    assert leads
+
+
+def test_resume_replays_frames_after_last_event_id():
+    hub, runs = StreamHub(), []
+    broadcast, _ = _run(hub, EVENT_QUERY, "u1", "s1", runs)
+    for n in range(3):
+        broadcast.append(f"data: {n}\n\n")
+    hub.finish(broadcast)
+
+    resumed, start = hub.resume(f"{broadcast.id}:0")
+    assert resumed is broadcast
+    assert list(resumed.frames(start)) == [
+        f"id: {broadcast.id}:1\ndata: 1\n\n",
+        f"id: {broadcast.id}:2\ndata: 2\n\n",
+    ]
+    assert hub.resume("unknown:0") is None